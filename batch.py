@@ -0,0 +1,4 @@
+from src.batch_runner import main
+
+if __name__ == "__main__":
+    main()
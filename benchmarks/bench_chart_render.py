@@ -0,0 +1,115 @@
+"""Chart render time and HTML size versus row count.
+
+Times the path the CLI takes for line (LTTB/min-max) and scatter
+(WebGL/density) charts over a synthetic time series: fetch_chart_data runs
+the rewritten chart query, then prepare_chart_data + build_figure + HTML
+serialization. The series sits in an in-memory SQLite table standing in for
+MySQL, so the database time is indicative only. Next to it: the same charts
+built client-side from every fetched row, plotting every row, and the old
+first-1000-rows cap. "db rows" is what the chart query returned; "peak" is
+the highest plotted value as a share of the true maximum, which averaging
+buckets or a row cap would lose. Sizes exclude the plotly.js bundle, which
+is the same for every chart.
+
+Run from the repo root (no database needed):
+    python -m benchmarks.bench_chart_render --rows 10000 100000 1000000
+"""
+import argparse
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from src import chart_query
+from src.chart_generator import prepare_chart_data, build_figure
+
+QUERY = "SELECT ts, value, other FROM series"
+
+
+def make_series(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    trend = np.sin(np.arange(rows) / max(rows / 20, 1)) * 10
+    value = trend + rng.normal(0, 1, rows)
+    # Occasional spikes: the kind of detail a first-N cap or naive stride sampling loses.
+    value[rng.random(rows) < 0.0005] += 25
+    return pd.DataFrame({
+        "ts": pd.date_range("2020-01-01", periods=rows, freq="min"),
+        "value": value,
+        "other": value * 0.5 + rng.normal(0, 2, rows)
+    })
+
+def use_sqlite(df):
+    """Point chart_query at an in-memory SQLite copy of df; returns the per-query row counts"""
+    connection = sqlite3.connect(":memory:")
+    # MySQL's two-argument LEAST is SQLite's scalar MIN.
+    connection.create_function("LEAST", 2, min, deterministic=True)
+    df.to_sql("series", connection, index=False)
+    fetched = []
+
+    def fetch_dataframe(sql):
+        result = pd.read_sql_query(sql, connection)
+        fetched.append(len(result))
+        return result
+
+    chart_query.fetch_dataframe = fetch_dataframe
+    return fetched
+
+def render(build):
+    started = time.perf_counter()
+    fig = build()
+    html = fig.to_html(include_plotlyjs=False, full_html=False)
+    return time.perf_counter() - started, len(html.encode("utf-8")), fig
+
+def pipeline(df, config):
+    return lambda: build_figure(prepare_chart_data(df, config), config)
+
+def cli_path(df, config):
+    """main.render_chart: aggregate in the database, then render what comes back"""
+    def build():
+        chart_df, chart_config = chart_query.fetch_chart_data(QUERY, config, df) or (df, config)
+        return build_figure(prepare_chart_data(chart_df, chart_config), chart_config)
+    return build
+
+def peak_share(fig, true_max):
+    trace = fig.data[0]
+    if trace.type not in ("scatter", "scattergl") or trace.mode not in (None, "lines"):
+        return "-"
+    return f"{np.nanmax(np.asarray(trace.y, dtype=float)) / true_max:.0%}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--naive-max", type=int, default=200000, help="skip plotting every row above this many rows")
+    args = parser.parse_args()
+
+    line = {"chart_type": "line", "x_axis": "ts", "y_axis": "value", "title": "line"}
+    scatter = {"chart_type": "scatter", "x_axis": "value", "y_axis": "other", "title": "scatter"}
+
+    print(f"{'rows':>9}  {'chart':<26}{'time (ms)':>11}{'html (KB)':>11}{'db rows':>10}{'peak':>7}")
+    for rows in args.rows:
+        df = make_series(rows)
+        fetched = use_sqlite(df)
+        true_max = df["value"].max()
+        cases = [
+            ("line, first 1000 rows", lambda: px.line(df.head(1000), x="ts", y="value")),
+            ("line, sql + lttb", cli_path(df, line)),
+            ("line, sql + minmax", cli_path(df, dict(line, downsample="minmax"))),
+            ("line, client lttb", pipeline(df, line)),
+            ("scatter, sql", cli_path(df, scatter)),
+            ("scatter, client", pipeline(df, scatter)),
+        ]
+        if rows <= args.naive_max:
+            cases.insert(0, ("line, every row", lambda: px.line(df, x="ts", y="value")))
+            cases.append(("scatter, every row svg", lambda: px.scatter(df, x="value", y="other", render_mode="svg")))
+        for name, build in cases:
+            fetched.clear()
+            seconds, size, fig = render(build)
+            db_rows = fetched[-1] if fetched else "-"
+            print(f"{rows:>9}  {name:<26}{seconds * 1000:>11.1f}{size / 1024:>11.1f}{db_rows:>10}{peak_share(fig, true_max):>7}")
+
+
+if __name__ == "__main__":
+    main()
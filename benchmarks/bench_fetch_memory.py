@@ -0,0 +1,54 @@
+"""Peak memory and time of fetchall-into-dicts versus batched DataFrame fetching.
+
+Rows come from a synthetic cursor so no database is needed:
+    python -m benchmarks.bench_fetch_memory --rows 1000000
+"""
+import argparse
+import time
+import tracemalloc
+
+import pandas as pd
+
+from src import db_manager
+from src.db_pool import ConnectionPool
+from benchmarks.synthetic import SyntheticConnection
+
+QUERY = "SELECT id, region, amount, quantity, created_at FROM sales"
+
+
+def legacy_fetch():
+    # What execute_query + pd.DataFrame(results) did before streaming
+    results = db_manager.execute_query(QUERY, fetch_results=True)
+    return pd.DataFrame(results)
+
+def batched_fetch():
+    return db_manager.fetch_dataframe(QUERY)
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    SyntheticConnection.row_count = args.rows
+    db_manager._pool = ConnectionPool(SyntheticConnection, size=1)
+
+    print(f"Rows: {args.rows}, batch size: {db_manager.QUERY_FETCH_BATCH_SIZE}")
+    print(f"{'path':<28}{'time (s)':>10}{'peak (MB)':>12}")
+    for label, func in [("fetchall + dict per row", legacy_fetch), ("fetch_dataframe (batched)", batched_fetch)]:
+        df, elapsed, peak = measure(func)
+        print(f"{label:<28}{elapsed:>10.2f}{peak / 1024 / 1024:>12.1f}")
+        del df
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Load test for the HTTP service: concurrent clients asking overlapping questions.
+
+By default the service runs in-process on a free port over the synthetic
+database stand-in and the stub LLM, once with single-flight coalescing and
+once without, and reports LLM calls and statement executions for each.
+--url points it at a running service (python service.py) instead.
+    python -m benchmarks.bench_http_service --clients 32 --waves 10 --distinct 4 --latency-ms 300
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from src import db_manager, nl_to_sql
+from src.batch_runner import percentile
+from src.db_pool import ConnectionPool
+from src.http_service import NL2SQLService, create_server
+from src.llm_backends import StubBackend
+from src.schema_cache import schema_cache
+from benchmarks.synthetic import make_schema_structure, SyntheticConnection, SyntheticCursor
+
+
+class CountingBackend(StubBackend):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+        self._count_lock = threading.Lock()
+
+    def _delay(self):
+        with self._count_lock:
+            self.calls += 1
+        return super()._delay()
+
+
+class CountingCursor(SyntheticCursor):
+    executions = 0
+    _count_lock = threading.Lock()
+
+    def execute(self, query, params=None):
+        if query.lstrip().upper().startswith("SELECT") and "information_schema" not in query:
+            with CountingCursor._count_lock:
+                CountingCursor.executions += 1
+        super().execute(query, params)
+
+
+class CountingConnection(SyntheticConnection):
+    def cursor(self, buffered=None, prepared=False):
+        return CountingCursor(self.row_count, self.latency_ms, self.schema_rows)
+
+
+def post(url, payload, timeout=60):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"), headers={"Content-Type": "application/json"})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, time.perf_counter() - started
+
+def run_load(base_url, endpoint, clients, waves, distinct, tables, tag):
+    """Each wave sends `distinct` new questions, each asked by clients/distinct clients at once"""
+    latencies, statuses = [], {}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        for wave in range(waves):
+            questions = [
+                f"top {wave * distinct + i + 1} {tables[(wave * distinct + i) % len(tables)]} by amount {tag}"
+                for i in range(distinct)
+            ]
+            futures = [
+                executor.submit(post, f"{base_url}/{endpoint}", {"question": questions[i % distinct], "max_rows": 100})
+                for i in range(clients)
+            ]
+            for future in futures:
+                status, elapsed = future.result()
+                statuses[status] = statuses.get(status, 0) + 1
+                latencies.append(elapsed)
+    return latencies, statuses, time.perf_counter() - started
+
+def fetch_health(base_url):
+    with urllib.request.urlopen(f"{base_url}/health", timeout=10) as response:
+        return json.loads(response.read())["service"]
+
+def report(label, latencies, statuses, wall, llm_calls="-", executions="-"):
+    ok = statuses.get(200, 0)
+    errors = ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items()) if status != 200) or "-"
+    print(
+        f"{label:<14}{len(latencies) / wall:>9.1f}{percentile(latencies, 50) * 1000:>11.1f}{percentile(latencies, 95) * 1000:>11.1f}"
+        f"{ok:>8}{str(llm_calls):>11}{str(executions):>12}   {errors}"
+    )
+
+def run_in_process(args, structure, coalesce):
+    backend = CountingBackend(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+    nl_to_sql.llm_backend = backend
+    CountingCursor.executions = 0
+    app = NL2SQLService(max_concurrency=args.clients, coalesce=coalesce)
+    app.warm()
+    server = create_server(app, "127.0.0.1", 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        tag = "coalesced" if coalesce else "uncoalesced"
+        latencies, statuses, wall = run_load(base_url, args.endpoint, args.clients, args.waves, args.distinct, list(structure), tag)
+        report("single-flight" if coalesce else "no coalescing", latencies, statuses, wall, backend.calls, CountingCursor.executions)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running service; omit to start one in-process")
+    parser.add_argument("--endpoint", choices=["sql", "execute"], default="execute")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--waves", type=int, default=10)
+    parser.add_argument("--distinct", type=int, default=4, help="Distinct questions per wave")
+    parser.add_argument("--tables", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=300, help="Stub LLM latency")
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--db-latency-ms", type=float, default=50, help="Stand-in database latency per statement")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--no-coalesce", action="store_true", help="In-process: only run without single-flight")
+    args = parser.parse_args()
+
+    structure = make_schema_structure(args.tables)
+    print(f"Clients: {args.clients}, waves: {args.waves}, distinct questions per wave: {args.distinct}, endpoint: /{args.endpoint}")
+    print(f"{'mode':<14}{'req/s':>9}{'p50 (ms)':>11}{'p95 (ms)':>11}{'ok':>8}{'LLM calls':>11}{'executions':>12}   errors")
+
+    if args.url:
+        base_url = args.url.rstrip("/")
+        before = fetch_health(base_url)
+        latencies, statuses, wall = run_load(base_url, args.endpoint, args.clients, args.waves, args.distinct, list(structure), str(time.time_ns()))
+        after = fetch_health(base_url)
+        report("remote", latencies, statuses, wall)
+        print(f"Coalesced by the service: {after['single_flight_coalesced'] - before['single_flight_coalesced']}")
+        return
+
+    # Every question is new, so only single-flight can save work; the NL cache would hide it.
+    nl_to_sql.NL_CACHE_ENABLED = False
+    schema_cache.prime(structure, "synthetic")
+    CountingConnection.row_count = args.rows
+    CountingConnection.latency_ms = args.db_latency_ms
+    db_manager._pool = ConnectionPool(CountingConnection, size=args.clients)
+
+    for coalesce in ([False] if args.no_coalesce else [True, False]):
+        run_in_process(args, structure, coalesce)
+    db_manager.close_pool()
+
+
+if __name__ == "__main__":
+    main()
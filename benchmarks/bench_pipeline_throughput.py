@@ -0,0 +1,73 @@
+"""Hermetic end-to-end NL→SQL throughput with the stub LLM backend.
+
+No network or database: the schema is synthetic and the LLM is the
+rule-based stub with configurable latency.
+    python -m benchmarks.bench_pipeline_throughput --questions 200 --latency-ms 200 --workers 16
+"""
+import argparse
+import asyncio
+import time
+
+from src import async_pipeline, nl_to_sql
+from src.batch_runner import run_batch, summarize, percentile
+from src.llm_backends import StubBackend
+from src.schema_cache import schema_cache
+from benchmarks.synthetic import make_schema_structure
+
+QUESTION_TEMPLATES = [
+    "how many {entity} records are there",
+    "top {n} {entity} by amount",
+    "average price of {entity} per city",
+    "list {entity} created this year with status open"
+]
+
+
+def make_questions(count, structure):
+    tables = list(structure)
+    return [
+        {"id": str(i), "question": QUESTION_TEMPLATES[i % len(QUESTION_TEMPLATES)].format(entity=tables[i % len(tables)], n=i % 20 + 1)}
+        for i in range(count)
+    ]
+
+async def run_async(questions):
+    started = time.perf_counter()
+    answers = await async_pipeline.answer_questions([item["question"] for item in questions], execute=False)
+    wall = time.perf_counter() - started
+    return answers, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--tables", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+
+    structure = make_schema_structure(args.tables)
+    schema_cache.prime(structure, "synthetic")
+    nl_to_sql.llm_backend = StubBackend(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+    nl_to_sql.NL_CACHE_ENABLED = False
+    questions = make_questions(args.questions, structure)
+
+    print(f"Questions: {args.questions}, tables: {args.tables}, stub latency: {args.latency_ms}±{args.jitter_ms} ms")
+    print(f"{'mode':<26}{'q/s':>9}{'p50 (ms)':>11}{'p95 (ms)':>11}")
+
+    started = time.perf_counter()
+    records = run_batch(questions[:max(1, args.questions // 10)], workers=1)
+    summary = summarize(records, time.perf_counter() - started)
+    print(f"{'sequential':<26}{summary['questions_per_second']:>9.1f}{summary['p50_seconds'] * 1000:>11.1f}{summary['p95_seconds'] * 1000:>11.1f}")
+
+    started = time.perf_counter()
+    records = run_batch(questions, workers=args.workers)
+    summary = summarize(records, time.perf_counter() - started)
+    print(f"{f'thread pool ({args.workers})':<26}{summary['questions_per_second']:>9.1f}{summary['p50_seconds'] * 1000:>11.1f}{summary['p95_seconds'] * 1000:>11.1f}")
+
+    answers, wall = asyncio.run(run_async(questions))
+    latencies = [answer["elapsed_seconds"] for answer in answers]
+    print(f"{f'asyncio ({async_pipeline.ASYNC_MAX_CONCURRENCY})':<26}{len(answers) / wall:>9.1f}{percentile(latencies, 50) * 1000:>11.1f}{percentile(latencies, 95) * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Compare per-table DESCRIBE introspection with the bulk information_schema path.
+
+Run from the repo root against the database configured in .env:
+    python -m benchmarks.bench_schema_introspection --runs 10
+"""
+import argparse
+import statistics
+import time
+
+from src.db_manager import get_all_table_names, get_table_schema, get_full_schema_for_gemini, pooled_connection
+
+
+def describe_loop_schema():
+    tables = get_all_table_names()
+    schema = ""
+    for table in tables:
+        columns = get_table_schema(table)
+        schema += f"Table: {table}\n"
+        for col_name, col_type in columns:
+            schema += f"  - {col_name}: {col_type}\n"
+        schema += "\n"
+    return schema.strip()
+
+
+def time_runs(func, runs):
+    timings = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with pooled_connection() as conn:
+        if conn is None:
+            print("Could not connect to the database")
+            return
+
+    legacy_schema, legacy_times = time_runs(describe_loop_schema, args.runs)
+    bulk_schema, bulk_times = time_runs(get_full_schema_for_gemini, args.runs)
+
+    table_count = legacy_schema.count("Table: ")
+    print(f"Tables: {table_count}, runs: {args.runs}")
+    print(f"{'path':<22}{'median (ms)':>14}{'min (ms)':>12}{'round trips':>14}")
+    print(f"{'SHOW + DESCRIBE loop':<22}{statistics.median(legacy_times) * 1000:>14.1f}{min(legacy_times) * 1000:>12.1f}{table_count + 1:>14}")
+    print(f"{'information_schema':<22}{statistics.median(bulk_times) * 1000:>14.1f}{min(bulk_times) * 1000:>12.1f}{2:>14}")
+    print(f"Speedup: {statistics.median(legacy_times) / statistics.median(bulk_times):.1f}x")
+    print(f"Outputs identical: {legacy_schema == bulk_schema}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Measure prompt-size reduction from relevance-pruned schema context.
+
+Uses a synthetic schema so it runs without a database:
+    python -m benchmarks.bench_schema_pruning --tables 400 --top-k 8
+"""
+import argparse
+import statistics
+import time
+
+from src.db_manager import format_schema_for_gemini
+from src.schema_retriever import SchemaIndex
+from benchmarks.synthetic import make_schema_structure
+
+QUESTIONS = [
+    "total payment amount by customer country",
+    "top 5 products by order item quantity",
+    "how many shipments left each warehouse last month",
+    "average review score per product category",
+    "employees per department and region",
+    "open tickets for accounts with active subscriptions"
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tables", type=int, default=400)
+    parser.add_argument("--top-k", type=int, default=8)
+    args = parser.parse_args()
+
+    structure = make_schema_structure(args.tables)
+    full_text = format_schema_for_gemini(structure)
+
+    start = time.perf_counter()
+    index = SchemaIndex(structure)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    print(f"Tables: {args.tables}, top-k: {args.top_k}, index build: {build_ms:.1f} ms")
+    print(f"Full schema: {len(full_text)} chars (~{len(full_text) // 4} tokens)")
+    print(f"{'question':<55}{'tables':>8}{'chars':>9}{'reduction':>11}{'select (ms)':>13}")
+
+    reductions = []
+    for question in QUESTIONS:
+        start = time.perf_counter()
+        tables = index.select_tables(question, args.top_k)
+        select_ms = (time.perf_counter() - start) * 1000
+        pruned_text = format_schema_for_gemini(structure, tables=tables, include_foreign_keys=True) if tables else full_text
+        reduction = 1 - len(pruned_text) / len(full_text)
+        reductions.append(reduction)
+        print(f"{question[:54]:<55}{len(tables or structure):>8}{len(pruned_text):>9}{reduction:>10.1%}{select_ms:>13.2f}")
+
+    print(f"Median prompt-size reduction: {statistics.median(reductions):.1%}")
+
+
+if __name__ == "__main__":
+    main()
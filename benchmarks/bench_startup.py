@@ -0,0 +1,55 @@
+"""Measure CLI startup: time to `import main` in a fresh interpreter.
+
+Each run spawns a new Python process so nothing is already cached in
+sys.modules. Also reports which heavy stacks the import pulled in; none of
+pandas, plotly or google.generativeai should load before first use.
+
+Run from the repo root (no database or API key needed):
+    python -m benchmarks.bench_startup --runs 10
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ["pandas", "numpy", "plotly", "google.generativeai", "google.api_core", "mysql.connector"]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module, runs):
+    timings = []
+    loaded = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result["seconds"])
+        loaded = result["loaded"]
+    return timings, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modules", nargs="+", default=["main", "src.nl_to_sql", "src.chart_generator"])
+    args = parser.parse_args()
+
+    print(f"Runs per module: {args.runs}")
+    print(f"{'module':<22}{'median (ms)':>14}{'min (ms)':>12}  heavy modules loaded")
+    for module in args.modules:
+        timings, loaded = measure(module, args.runs)
+        print(f"{module:<22}{statistics.median(timings) * 1000:>14.1f}{min(timings) * 1000:>12.1f}  {', '.join(loaded) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
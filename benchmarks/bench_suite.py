@@ -0,0 +1,269 @@
+"""Per-stage benchmark suite with stored baselines and regression thresholds.
+
+Times each pipeline stage at several data scales, hermetically: the schema
+and rows come from the synthetic generator, the database is the synthetic
+connection stand-in and the LLM is the stub backend. Each benchmark is
+repeated and its fastest run compared with benchmarks/baselines.json, after
+scaling the baseline by a fixed reference workload timed just before it (so
+a machine that is busier or throttled than when the baselines were recorded
+does not read as a regression). One slower than its baseline by more than
+the threshold ratio, and by more than --min-delta-ms, is a regression, and
+the exit status is 1.
+
+Run from the repo root:
+    python -m benchmarks.bench_suite                              # compare with the baselines
+    python -m benchmarks.bench_suite --scales small --only prompt_build
+    python -m benchmarks.bench_suite --save-baseline              # record new baselines
+
+Baselines are only comparable on the machine they were recorded on; record
+them again after moving to a different machine.
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+
+import numpy as np
+
+from src import db_manager, nl_to_sql
+from src.chart_generator import get_chart_suggestions, prepare_chart_data, build_figure
+from src.db_pool import ConnectionPool
+from src.llm_backends import StubBackend
+from src.schema_cache import schema_cache
+from benchmarks.synthetic import make_schema_structure, schema_rows, SyntheticConnection
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+QUERY = "SELECT id, region, amount, quantity, created_at FROM sales"
+QUESTION = "total amount per region for orders shipped this year"
+
+SCALES = {
+    "small": {"tables": 20, "rows": 1_000},
+    "medium": {"tables": 200, "rows": 50_000},
+    "large": {"tables": 1_000, "rows": 500_000}
+}
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Register setup(scale) -> the zero-argument callable to time at that scale"""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+def use_database(structure=None, rows=0):
+    SyntheticConnection.schema_rows = schema_rows(structure) if structure else None
+    SyntheticConnection.row_count = rows
+    db_manager.close_pool()
+    db_manager._pool = ConnectionPool(SyntheticConnection, size=1)
+    db_manager._router = None
+
+def fetch_frame(rows):
+    use_database(rows=rows)
+    return db_manager.fetch_dataframe(QUERY)
+
+
+@benchmark("schema_introspection")
+def schema_introspection(scale):
+    structure = make_schema_structure(scale["tables"])
+    use_database(structure)
+    return db_manager.get_schema_structure
+
+@benchmark("prompt_build")
+def prompt_build(scale):
+    schema_cache.prime(make_schema_structure(scale["tables"]), f"synthetic-{scale['tables']}")
+    # The schema index is built once per schema, not per question.
+    nl_to_sql.build_prompt(QUESTION)
+    return lambda: nl_to_sql.build_prompt(QUESTION)
+
+@benchmark("sql_generation")
+def sql_generation(scale):
+    schema_cache.prime(make_schema_structure(scale["tables"]), f"synthetic-{scale['tables']}")
+    nl_to_sql.llm_backend = StubBackend()
+    nl_to_sql.NL_CACHE_ENABLED = False
+    nl_to_sql.get_sql_from_natural_language(QUESTION)
+    return lambda: nl_to_sql.get_sql_from_natural_language(QUESTION)
+
+@benchmark("query_execution")
+def query_execution(scale):
+    use_database(rows=scale["rows"])
+    return lambda: db_manager.count_query_rows(QUERY)
+
+@benchmark("dataframe_construction")
+def dataframe_construction(scale):
+    use_database(rows=scale["rows"])
+    return lambda: db_manager.fetch_dataframe(QUERY)
+
+@benchmark("suggestion_inference")
+def suggestion_inference(scale):
+    df = fetch_frame(scale["rows"])
+
+    def run():
+        # The column profile is kept on the frame; time the first look at a new result.
+        df.attrs.clear()
+        return get_chart_suggestions(df)
+    return run
+
+@benchmark("chart_rendering")
+def chart_rendering(scale):
+    df = fetch_frame(scale["rows"])
+    configs = [
+        {"chart_type": "bar", "x_axis": "region", "y_axis": "amount", "title": "bar"},
+        {"chart_type": "line", "x_axis": "created_at", "y_axis": "amount", "title": "line"}
+    ]
+
+    def run():
+        for config in configs:
+            df.attrs.clear()
+            fig = build_figure(prepare_chart_data(df, config), config)
+            fig.to_html(include_plotlyjs=False, full_html=False)
+    return run
+
+
+def time_callable(func, repeat, min_sample_seconds=0.02):
+    """(median, min) seconds per call; fast calls are looped so each sample lasts min_sample_seconds"""
+    started = time.perf_counter()
+    func()
+    first = time.perf_counter() - started
+    number = max(1, math.ceil(min_sample_seconds / first)) if first > 0 else 1000
+
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(number):
+                func()
+            samples.append((time.perf_counter() - started) / number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return statistics.median(samples), min(samples)
+
+def reference_workload():
+    # Fixed mix of interpreter and numpy work, independent of the code under test.
+    total = 0
+    for i in range(20_000):
+        total += len(str(i * 7))
+    values = np.arange(200_000, dtype=np.float64)
+    return total + float(np.sort(values[::-1]).sum())
+
+def calibrate(repeat=7):
+    """Seconds for the reference workload right now, to factor out machine speed drift"""
+    return min(time_callable(reference_workload, repeat, min_sample_seconds=0.005))
+
+def environment():
+    import pandas as pd
+
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "cpus": os.cpu_count(),
+        "pandas": pd.__version__
+    }
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {"threshold": None, "results": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_baselines(path, baselines, results, threshold):
+    baselines = dict(baselines)
+    baselines["recorded"] = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    baselines["environment"] = environment()
+    baselines["threshold"] = threshold
+    # Keep baselines for benchmarks or scales this run skipped.
+    baselines["results"] = dict(baselines.get("results", {}), **{
+        key: {"median_ms": round(median * 1000, 4), "min_ms": round(fastest * 1000, 4), "reference_ms": round(reference * 1000, 4)}
+        for key, (median, fastest, reference) in results.items()
+    })
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+def verdict(min_ms, reference_ms, baseline, threshold, min_delta_ms, normalize=True):
+    """(status, ratio) of this run's fastest sample against the baseline's.
+
+    Noise only ever adds time, so the fastest samples are what compare
+    reliably. With normalize, the baseline is first scaled by how much
+    slower or faster the reference workload ran than when it was recorded.
+    """
+    if baseline is None:
+        return "new", None
+    expected_ms = baseline["min_ms"]
+    if normalize and baseline.get("reference_ms"):
+        expected_ms *= reference_ms / baseline["reference_ms"]
+    ratio = min_ms / expected_ms if expected_ms else float("inf")
+    if ratio > threshold and min_ms - expected_ms > min_delta_ms:
+        return "REGRESSION", ratio
+    if ratio < 1 / threshold:
+        return "faster", ratio
+    return "ok", ratio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=list(SCALES))
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, help="Slowdown ratio that counts as a regression (default: the baseline file's, else 1.5)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore slowdowns smaller than this, whatever the ratio")
+    parser.add_argument("--no-normalize", action="store_true", help="Compare raw times, without scaling by the reference workload")
+    parser.add_argument("--save-baseline", action="store_true", help="Record this run as the new baselines instead of comparing")
+    args = parser.parse_args()
+
+    baselines = load_baselines(args.baseline)
+    threshold = args.threshold or baselines.get("threshold") or 1.5
+    if baselines["results"] and baselines.get("environment") != environment() and not args.save_baseline:
+        print(f"Warning: baselines were recorded on {baselines.get('environment')}; timings may not be comparable")
+
+    print(f"Repeats: {args.repeat}, regression threshold: {threshold:g}x (and > {args.min_delta_ms:g} ms)")
+    print(f"{'benchmark':<24}{'scale':<8}{'median (ms)':>13}{'min (ms)':>11}{'base min':>11}{'ref (ms)':>10}{'ratio':>8}   status")
+
+    results, regressions = {}, []
+    for name in args.only or BENCHMARKS:
+        for scale_name in args.scales:
+            key = f"{name}[{scale_name}]"
+            # What the stages print (cache notices, chart paths) would drown the table.
+            with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                func = BENCHMARKS[name](SCALES[scale_name])
+                reference = calibrate()
+                median, fastest = time_callable(func, args.repeat)
+                reference = min(reference, calibrate())
+            results[key] = (median, fastest, reference)
+
+            baseline = baselines["results"].get(key)
+            status, ratio = verdict(fastest * 1000, reference * 1000, baseline, threshold, args.min_delta_ms, not args.no_normalize)
+            if status == "REGRESSION":
+                regressions.append(key)
+            print(
+                f"{name:<24}{scale_name:<8}{median * 1000:>13.2f}{fastest * 1000:>11.2f}"
+                f"{baseline['min_ms'] if baseline else float('nan'):>11.2f}{reference * 1000:>10.2f}{ratio if ratio else float('nan'):>8.2f}   {status}"
+            )
+    db_manager.close_pool()
+
+    if args.save_baseline:
+        save_baselines(args.baseline, baselines, results, threshold)
+        print(f"Baselines saved to {args.baseline}")
+        return 0
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
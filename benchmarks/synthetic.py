@@ -0,0 +1,157 @@
+"""Synthetic schema generator shared by the benchmarks"""
+import json
+import random
+import time
+
+ENTITIES = [
+    "customer", "order", "order_item", "product", "category", "supplier", "warehouse", "shipment",
+    "invoice", "payment", "employee", "department", "region", "store", "promotion", "return",
+    "review", "inventory", "campaign", "account", "subscription", "ticket", "vendor", "contract"
+]
+
+COLUMN_POOL = [
+    ("name", "varchar(255)"), ("status", "varchar(32)"), ("amount", "decimal(12,2)"),
+    ("quantity", "int"), ("created_at", "datetime"), ("updated_at", "datetime"),
+    ("price", "decimal(10,2)"), ("email", "varchar(255)"), ("city", "varchar(100)"),
+    ("country", "varchar(64)"), ("score", "float"), ("notes", "text"), ("code", "varchar(16)")
+]
+
+
+def make_schema_structure(table_count, columns_per_table=12, seed=7):
+    rng = random.Random(seed)
+    tables = []
+    for i in range(table_count):
+        base = ENTITIES[i % len(ENTITIES)]
+        tables.append(base if i < len(ENTITIES) else f"{base}_{i // len(ENTITIES)}")
+
+    structure = {}
+    for i, table in enumerate(tables):
+        columns = [{"name": "id", "type": "int", "nullable": False, "key": "PRI", "default": None, "extra": "auto_increment", "comment": ""}]
+        foreign_keys = []
+        for ref in rng.sample(tables[:i], min(i, 2)):
+            column = f"{ref}_id"
+            columns.append({"name": column, "type": "int", "nullable": True, "key": "MUL", "default": None, "extra": "", "comment": ""})
+            foreign_keys.append({"name": f"fk_{table}_{ref}", "columns": [column], "ref_table": ref, "ref_columns": ["id"]})
+        for name, col_type in rng.sample(COLUMN_POOL, min(columns_per_table, len(COLUMN_POOL))):
+            columns.append({"name": name, "type": col_type, "nullable": True, "key": "", "default": None, "extra": "", "comment": ""})
+        structure[table] = {
+            "columns": columns,
+            "foreign_keys": foreign_keys,
+            "indexes": [{"name": "PRIMARY", "columns": ["id"], "unique": True}],
+            "comment": ""
+        }
+    return structure
+
+
+def schema_rows(structure):
+    """(column rows, key rows) as the information_schema queries in db_manager return them for structure"""
+    column_rows, key_rows = [], []
+    for table in sorted(structure):
+        info = structure[table]
+        for column in info["columns"]:
+            column_rows.append((
+                table, column["name"], column["type"], "YES" if column["nullable"] else "NO", column["key"],
+                column["default"], column["extra"], column["comment"], info["comment"]
+            ))
+        for fk in info["foreign_keys"]:
+            for position, (column, ref_column) in enumerate(zip(fk["columns"], fk["ref_columns"]), 1):
+                key_rows.append(("fk", table, fk["name"], column, fk["ref_table"], ref_column, position, None))
+        for index in info["indexes"]:
+            for position, column in enumerate(index["columns"], 1):
+                key_rows.append(("index", table, index["name"], column, None, None, position, 0 if index["unique"] else 1))
+    key_rows.sort(key=lambda row: (row[1], row[0], row[2], row[6]))
+    return column_rows, key_rows
+
+
+class SyntheticCursor:
+    """Unbuffered-cursor stand-in that generates rows lazily"""
+
+    def __init__(self, row_count, latency_ms=0, schema_rows=None):
+        self.row_count = row_count
+        self.latency_ms = latency_ms
+        self.schema_rows = schema_rows
+        self.description = None
+        self._next = 0
+        self._fixed = None
+
+    def execute(self, query, params=None):
+        self._next = 0
+        self._fixed = None
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        if query.lstrip().upper().startswith("EXPLAIN"):
+            # A small single-table plan, well inside the cost guard's limits.
+            self.description = [("EXPLAIN",)]
+            self._fixed = [(json.dumps({"query_block": {"cost_info": {"query_cost": "10.0"}, "table": {"table_name": "synthetic", "access_type": "ref", "rows_examined_per_scan": 100}}}),)]
+            return
+        if self.schema_rows and "information_schema.COLUMNS c" in query:
+            self.description = [("TABLE_NAME",)]
+            self._fixed = list(self.schema_rows[0])
+            return
+        if self.schema_rows and "information_schema.KEY_COLUMN_USAGE" in query:
+            self.description = [("KIND",)]
+            self._fixed = list(self.schema_rows[1])
+            return
+        if "information_schema" in query or query.lstrip().upper().startswith("SET"):
+            # Other metadata lookups find nothing, so nothing gets cached.
+            self.description = [("TABLE_NAME",)]
+            self._next = self.row_count
+            return
+        self.description = [("id",), ("region",), ("amount",), ("quantity",), ("created_at",)]
+
+    def _row(self, i):
+        return (i, f"region_{i % 50}", (i % 1000) * 1.25, i % 17, f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}")
+
+    def fetchmany(self, size):
+        if self._fixed is not None:
+            rows, self._fixed = self._fixed[:size], self._fixed[size:]
+            return rows
+        end = min(self._next + size, self.row_count)
+        rows = [self._row(i) for i in range(self._next, end)]
+        self._next = end
+        return rows
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def fetchall(self):
+        if self._fixed is not None:
+            return self.fetchmany(len(self._fixed))
+        return self.fetchmany(self.row_count - self._next)
+
+    def close(self):
+        pass
+
+
+class SyntheticConnection:
+    row_count = 1000
+    # Per-statement delay, standing in for server round trip and execution time.
+    latency_ms = 0
+    # schema_rows(structure) to answer schema introspection; None finds no tables.
+    schema_rows = None
+    unread_result = False
+
+    def __init__(self):
+        self.in_transaction = False
+
+    def cursor(self, buffered=None, prepared=False):
+        return SyntheticCursor(self.row_count, self.latency_ms, self.schema_rows)
+
+    def is_connected(self):
+        return True
+
+    def consume_results(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        pass
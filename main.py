@@ -1,7 +1,8 @@
-from src.nl_to_sql import get_sql_from_natural_language
-from src.db_manager import execute_query, get_connection, get_all_table_names, get_table_schema
-from src.chart_generator import generate_chart_from_instruction, get_chart_suggestions
-import pandas as pd
+from src.db_manager import execute_query, fetch_dataframe, pooled_connection, close_pool, get_all_table_names
+from src.query_guard import check_query
+from src.schema_cache import get_cached_schema_structure, warm_schema_cache
+from src.config import SCHEMA_CACHE_WARM_ON_STARTUP, METRICS_PORT, SESSION_STORE_ENABLED
+from src.tracing import start_trace, format_trace, start_metrics_server
 import os
 import webbrowser
 
@@ -31,22 +32,23 @@ def display_database_info():
     print("DATABASE SCHEMA")
     print("=" * 60)
     
-    tables = get_all_table_names()
-    if not tables:
+    structure = get_cached_schema_structure()
+    if not structure:
         print("No tables found or connection failed")
         return
     
-    for table in tables:
+    for table, info in structure.items():
         print(f"\nTable: {table}")
-        schema = get_table_schema(table)
-        if schema:
-            for col_name, col_type in schema:
-                print(f"   • {col_name}: {col_type}")
-        else:
-            print("Could not fetch schema")
+        for column in info["columns"]:
+            print(f"   • {column['name']}: {column['type']}")
+        for fk in info["foreign_keys"]:
+            print(f"   → {', '.join(fk['columns'])} references {fk['ref_table']}({', '.join(fk['ref_columns'])})")
+
+def handle_chart_generation(df, original_query, sql_query):
+    # Plotting stack (plotly, pandas) is imported on first use to keep startup fast.
+    from src.chart_generator import get_chart_suggestions
 
-def handle_chart_generation(results, original_query):
-    if not results:
+    if df is None or df.empty:
         print("No data available for chart generation")
         return
     
@@ -54,7 +56,6 @@ def handle_chart_generation(results, original_query):
     print("CHART GENERATION")
     print("=" * 60)
     
-    df = pd.DataFrame(results)
     columns = list(df.columns)
     
     print(f"Available columns: {', '.join(columns)}")
@@ -82,8 +83,9 @@ def handle_chart_generation(results, original_query):
                     }
                     
                     print(f"\nGenerating {suggestion['type']} chart...")
-                    if generate_chart_from_instruction(df, config):
-                        open_chart_in_browser(config["chart_type"])
+                    artifacts = render_chart(df, config, sql_query)
+                    if artifacts:
+                        open_chart_in_browser(artifacts.get("html"))
                     return
             except (ValueError, IndexError):
                 print("Invalid selection, continuing with manual setup...")
@@ -136,14 +138,37 @@ def handle_chart_generation(results, original_query):
     }
     
     print(f"\nGenerating {chart_type} chart...")
-    if generate_chart_from_instruction(df, config):
-        open_chart_in_browser(chart_type)
+    artifacts = render_chart(df, config, sql_query)
+    if artifacts:
+        open_chart_in_browser(artifacts.get("html"))
+
+def render_chart(df, config, sql_query):
+    from src.chart_query import fetch_chart_data
+    from src.render_service import get_render_service, RenderQueueFull
+
+    with start_trace("render_chart") as trace:
+        # Results answered from the session store have no MySQL query to re-aggregate.
+        chart_data = fetch_chart_data(sql_query, config, df) if sql_query else None
+        if chart_data:
+            df, config = chart_data
+        try:
+            created = get_render_service().render(df, config)
+        except RenderQueueFull as e:
+            print(f"Chart not rendered: {e}")
+            created = None
+    print_trace(trace)
+    return created
 
-def open_chart_in_browser(chart_type):
+def print_trace(trace):
+    if trace:
+        print(f"[trace {trace.trace_id}] {format_trace(trace)}")
+
+def open_chart_in_browser(chart_path):
+    if not chart_path:
+        return
     open_chart = input("Open chart in browser? (y/n): ").lower()
     if open_chart == 'y':
         try:
-            chart_path = f"{chart_type}_chart.html"
             if os.path.exists(chart_path):
                 abs_path = os.path.abspath(chart_path)
                 webbrowser.open(f'file://{abs_path}')
@@ -153,7 +178,75 @@ def open_chart_in_browser(chart_type):
         except Exception as e:
             print(f"Could not open browser: {e}")
 
+def echo_partial_sql():
+    """on_partial callback that prints the SQL as it streams in from the LLM"""
+    printed = [""]
+    def echo(sql):
+        if sql.startswith(printed[0]):
+            print(sql[len(printed[0]):], end="", flush=True)
+            printed[0] = sql
+    return echo
+
+def display_results(results, user_query, sql_query):
+    if results.empty:
+        print("SQL executed, but no results returned")
+        return
+
+    print(f"\nQuery Results ({len(results)} rows):")
+    print("=" * 80)
+
+    headers = list(results.columns)
+
+    header_line = " | ".join([f"{h:>15}" for h in headers])
+    print(header_line)
+    print("-" * len(header_line))
+
+    for row in results.head(10).itertuples(index=False):
+        row_line = " | ".join([f"{str(value)[:15]:>15}" for value in row])
+        print(row_line)
+
+    if len(results) > 10:
+        print(f"... and {len(results) - 10} more rows")
+
+    print("=" * 80)
+
+    create_chart = input("\nCreate a chart from these results? (y/n): ").lower()
+    if create_chart == 'y':
+        handle_chart_generation(results, user_query, sql_query)
+
+def answer_follow_up(user_query):
+    """Answer a refinement of an earlier result from the session store; False if it could not be"""
+    from src.nl_to_sql import get_follow_up_sql
+    from src.session_store import session_store
+
+    print("Converting to SQL over previous results...")
+    results = None
+    with start_trace("follow_up") as trace:
+        local_sql = get_follow_up_sql(user_query, session_store, on_partial=echo_partial_sql())
+        print()
+        if local_sql:
+            try:
+                results = session_store.query(local_sql)
+            except Exception as e:
+                print(f"Could not answer from previous results: {e}")
+    print_trace(trace)
+    if results is None:
+        return False
+
+    print("\nSQL over previous results:")
+    print("-" * 50)
+    print(local_sql)
+    print("-" * 50)
+    if not results.empty:
+        session_store.add(results, user_query)
+    display_results(results, user_query, None)
+    return True
+
 def handle_nl_to_sql_flow():
+    # The LLM client is only loaded when the user actually asks a question.
+    from src.nl_to_sql import get_sql_from_natural_language
+    from src.session_store import session_store, is_follow_up
+
     print("\n" + "=" * 60)
     print("NATURAL LANGUAGE TO SQL CONVERSION")
     print("=" * 60)
@@ -166,9 +259,19 @@ def handle_nl_to_sql_flow():
         if not user_query:
             print("Query cannot be empty")
             continue
-            
+
+        if SESSION_STORE_ENABLED and len(session_store) and is_follow_up(user_query):
+            use_local = input("Answer from the previous results, without querying the database? (y/n): ").lower()
+            if use_local == 'y' and answer_follow_up(user_query):
+                if input("\nTry another query? (y/n): ").lower() != 'y':
+                    break
+                continue
+
         print("Converting to SQL...")
-        sql_query = get_sql_from_natural_language(user_query)
+        with start_trace("generate_sql") as trace:
+            sql_query = get_sql_from_natural_language(user_query, on_partial=echo_partial_sql())
+        print()
+        print_trace(trace)
 
         if not sql_query:
             print("Failed to generate a valid SQL query")
@@ -182,47 +285,36 @@ def handle_nl_to_sql_flow():
         print(sql_query)
         print("-" * 50)
         
+        decision = check_query(sql_query)
+        if not decision["allowed"]:
+            print(f"Query blocked by the cost guard: {decision['reason']}")
+            continue
+        if decision["rewritten"]:
+            sql_query = decision["sql"]
+            print(f"Cost guard: {decision['reason']}. Will run:")
+            print(sql_query)
+
         confirm = input("Execute this query? (y/n): ").lower()
         if confirm != 'y':
             print("Query not executed.")
             continue
 
         print("Executing query...")
-        results = execute_query(sql_query, fetch_results=True)
+        with start_trace("execute_sql") as trace:
+            if sql_query.strip().upper().startswith("SELECT"):
+                results = fetch_dataframe(sql_query)
+            else:
+                results = execute_query(sql_query, fetch_results=False)
+        print_trace(trace)
         
-        if results is False:
+        if results is None or results is False:
             print("SQL Execution failed")
         elif results is True:
             print("SQL executed successfully (no output)")
-        elif results:
-            print(f"\nQuery Results ({len(results)} rows):")
-            print("=" * 80)
-            
-            if isinstance(results[0], dict):
-                headers = list(results[0].keys())
-                
-                header_line = " | ".join([f"{h:>15}" for h in headers])
-                print(header_line)
-                print("-" * len(header_line))
-
-                display_rows = results[:10]
-                for row in display_rows:
-                    row_line = " | ".join([f"{str(row[col])[:15]:>15}" for col in headers])
-                    print(row_line)
-                
-                if len(results) > 10:
-                    print(f"... and {len(results) - 10} more rows")
-                
-                print("=" * 80)
-
-                create_chart = input("\nCreate a chart from these results? (y/n): ").lower()
-                if create_chart == 'y':
-                    handle_chart_generation(results, user_query)
-            else:
-                for row in results:
-                    print(row)
         else:
-            print("SQL executed, but no results returned")
+            if SESSION_STORE_ENABLED and not results.empty:
+                session_store.add(results, user_query, sql_query)
+            display_results(results, user_query, sql_query)
 
         if input("\nTry another query? (y/n): ").lower() != 'y':
             break
@@ -231,10 +323,13 @@ def main():
     print("Welcome to NL2SQL + Chart Generator!")
     print("Transform your questions into SQL queries and beautiful charts!")
 
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+
     print("\nTesting database connection...")
-    conn = get_connection()
-    if conn:
-        conn.close()
+    with pooled_connection() as conn:
+        connected = conn is not None
+    if connected:
         print("Database connection successful")
     else:
         print("Failed to connect to database")
@@ -242,7 +337,10 @@ def main():
         return
 
     print("\nAvailable Tables:")
-    tables = get_all_table_names()
+    if SCHEMA_CACHE_WARM_ON_STARTUP and warm_schema_cache():
+        tables = list(get_cached_schema_structure())
+    else:
+        tables = get_all_table_names()
     if tables:
         for table in tables:
             print(f"   • {table}")
@@ -260,6 +358,7 @@ def main():
         elif choice == '3':
             print("Thank you for using NL2SQL + Chart Generator!")
             print("Goodbye! ")
+            close_pool()
             break
         else:
             print("Invalid choice. Please enter 1, 2, or 3.")
@@ -0,0 +1,134 @@
+"""asyncio API over the NL→SQL pipeline for service wrappers.
+
+The LLM backend is awaited natively; MySQL and schema work run on a shared thread
+pool. A per-loop semaphore bounds how many questions are in flight, and
+every call takes a timeout. When execute_query times out or its task is
+cancelled, the running statement is stopped with KILL QUERY.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from . import db_manager
+from . import nl_to_sql
+from .config import ASYNC_MAX_CONCURRENCY, ASYNC_REQUEST_TIMEOUT_SECONDS
+from .llm_backends import LLMBackendError
+from .query_control import cancel_scope
+from .query_guard import check_query
+from .schema_cache import schema_cache
+from .tracing import start_trace, stage
+
+_executor = ThreadPoolExecutor(max_workers=ASYNC_MAX_CONCURRENCY, thread_name_prefix="nl2sql")
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def _limit():
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(ASYNC_MAX_CONCURRENCY)
+        _semaphores[loop] = semaphore
+    return semaphore
+
+async def run_blocking(func, *args):
+    # Copy the context so the worker thread records into the caller's trace.
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(_executor, functools.partial(context.run, func, *args))
+
+
+async def get_sql_from_natural_language(natural_language_query, timeout=ASYNC_REQUEST_TIMEOUT_SECONDS):
+    async with _limit():
+        try:
+            return await asyncio.wait_for(_generate_sql(natural_language_query), timeout)
+        except asyncio.TimeoutError:
+            print(f"NL to SQL conversion timed out after {timeout}s")
+            return None
+
+async def _generate_sql(natural_language_query):
+    if not nl_to_sql.llm_backend.ready():
+        return None
+
+    fingerprint = await run_blocking(schema_cache.get_fingerprint)
+    cached_sql = nl_to_sql.lookup_cached_sql(natural_language_query, fingerprint)
+    if cached_sql:
+        return cached_sql
+
+    prompt = await run_blocking(nl_to_sql.build_prompt, natural_language_query)
+    if prompt is None:
+        return None
+
+    if nl_to_sql.llm_rate_limiter:
+        with stage("llm_rate_limit_wait"):
+            await run_blocking(nl_to_sql.llm_rate_limiter.acquire)
+
+    try:
+        with stage("llm_call"):
+            response_text = await nl_to_sql.llm_backend.generate_async(prompt, natural_language_query)
+        sql_query = nl_to_sql.clean_sql_response(response_text)
+        nl_to_sql.remember_sql(natural_language_query, fingerprint, sql_query)
+        return sql_query
+    except LLMBackendError as e:
+        print(e)
+        return None
+    except Exception as e:
+        print(f"Unexpected error during NL to SQL conversion: {e}")
+        return None
+
+
+def _cancel(scope):
+    # Not on _executor: its workers may all be busy in the very queries being killed.
+    threading.Thread(target=scope.cancel, name="nl2sql-cancel", daemon=True).start()
+
+async def execute_query(query, fetch_results=True, timeout=ASYNC_REQUEST_TIMEOUT_SECONDS):
+    if timeout is not None and timeout <= 0:
+        # A scope timeout of 0 would mean no limit at all.
+        print("Query execution timed out before it started")
+        return False
+    async with _limit():
+        # The scope carries the time limit to the server and lets a timed-out
+        # or cancelled await stop the query on its worker thread.
+        with cancel_scope(timeout) as scope:
+            try:
+                return await asyncio.wait_for(run_blocking(db_manager.execute_query, query, fetch_results), timeout)
+            except asyncio.TimeoutError:
+                _cancel(scope)
+                print(f"Query execution timed out after {timeout}s")
+                return False
+            except asyncio.CancelledError:
+                _cancel(scope)
+                raise
+
+
+async def answer_question(natural_language_query, execute=True, timeout=ASYNC_REQUEST_TIMEOUT_SECONDS):
+    """Generate SQL and optionally run it, sharing one time budget across both stages"""
+    with start_trace("answer_question") as trace:
+        started = time.monotonic()
+        sql_query = await get_sql_from_natural_language(natural_language_query, timeout=timeout)
+        answer = {"question": natural_language_query, "sql": sql_query, "results": None}
+        if sql_query and execute:
+            decision = await run_blocking(check_query, sql_query)
+            answer["guard"] = decision
+            if decision["allowed"]:
+                remaining = max(timeout - (time.monotonic() - started), 0)
+                answer["results"] = await execute_query(decision["sql"], timeout=remaining)
+            else:
+                print(f"Query blocked by the cost guard: {decision['reason']}")
+                answer["results"] = False
+        answer["elapsed_seconds"] = time.monotonic() - started
+        answer["trace_id"] = trace.trace_id if trace else None
+    return answer
+
+async def render_chart(df, config, timeout=ASYNC_REQUEST_TIMEOUT_SECONDS):
+    """Artifact paths for a chart, rendered on the render service's process pool"""
+    from .render_service import get_render_service
+
+    # submit() may wait for a queue slot, so it runs on the thread pool too.
+    future = await run_blocking(get_render_service().submit, df, config)
+    return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+
+async def answer_questions(questions, execute=True, timeout=ASYNC_REQUEST_TIMEOUT_SECONDS):
+    return await asyncio.gather(*(answer_question(q, execute=execute, timeout=timeout) for q in questions))
@@ -0,0 +1,142 @@
+"""Batch NL→SQL over a file of questions.
+
+Input is JSONL ({"question": ..., "id": ...} per line) or CSV with a
+"question" column and optional "id" column. Output format follows the
+output file extension (.jsonl or .csv).
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import nl_to_sql
+from .db_manager import count_query_rows
+from .query_guard import check_query
+from .rate_limiter import RateLimiter
+from .tracing import start_trace
+
+RESULT_FIELDS = ["id", "question", "sql", "status", "generation_seconds", "execution_seconds", "total_seconds", "row_count"]
+
+
+def load_questions(path):
+    questions = []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            for i, row in enumerate(csv.DictReader(f)):
+                if row.get("question", "").strip():
+                    questions.append({"id": row.get("id") or str(i + 1), "question": row["question"].strip()})
+        else:
+            for i, line in enumerate(f):
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                if row.get("question", "").strip():
+                    questions.append({"id": str(row.get("id", i + 1)), "question": row["question"].strip()})
+    return questions
+
+def process_question(item, execute=False):
+    with start_trace("batch_question"):
+        return _process_question(item, execute)
+
+def _process_question(item, execute):
+    record = {"id": item["id"], "question": item["question"], "sql": None, "status": "ok",
+              "generation_seconds": None, "execution_seconds": None, "row_count": None}
+    started = time.perf_counter()
+
+    sql_query = nl_to_sql.get_sql_from_natural_language(item["question"])
+    record["generation_seconds"] = round(time.perf_counter() - started, 4)
+    record["sql"] = sql_query
+    if not sql_query:
+        record["status"] = "generation_failed"
+    elif execute:
+        # Batch runs are read-only; anything that is not a SELECT is left alone.
+        if not sql_query.strip().upper().startswith("SELECT"):
+            record["status"] = "skipped_non_select"
+        else:
+            execution_started = time.perf_counter()
+            decision = check_query(sql_query)
+            if decision["allowed"]:
+                record["row_count"] = count_query_rows(decision["sql"])
+            record["execution_seconds"] = round(time.perf_counter() - execution_started, 4)
+            if not decision["allowed"]:
+                record["status"] = "rejected_by_cost_guard"
+            elif record["row_count"] is None:
+                record["status"] = "execution_failed"
+
+    record["total_seconds"] = round(time.perf_counter() - started, 4)
+    return record
+
+def run_batch(questions, workers=4, execute=False):
+    records = [None] * len(questions)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process_question, item, execute): i for i, item in enumerate(questions)}
+        for done, future in enumerate(as_completed(futures), 1):
+            records[futures[future]] = future.result()
+            if done % 10 == 0 or done == len(futures):
+                print(f"Processed {done}/{len(futures)} questions")
+    return records
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+def summarize(records, wall_seconds):
+    latencies = [record["total_seconds"] for record in records]
+    return {
+        "questions": len(records),
+        "succeeded": sum(1 for record in records if record["status"] == "ok"),
+        "failed": sum(1 for record in records if record["status"] in ("generation_failed", "execution_failed")),
+        "wall_seconds": round(wall_seconds, 3),
+        "questions_per_second": round(len(records) / wall_seconds, 3) if wall_seconds else None,
+        "p50_seconds": percentile(latencies, 50),
+        "p95_seconds": percentile(latencies, 95)
+    }
+
+def write_results(records, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
+        else:
+            for record in records:
+                f.write(json.dumps(record, default=str) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="questions file (.jsonl or .csv)")
+    parser.add_argument("output", help="results file (.jsonl or .csv)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rpm", type=float, default=None, help="max LLM requests per minute (default: LLM_REQUESTS_PER_MINUTE)")
+    parser.add_argument("--execute", action="store_true", help="run generated SELECTs and record row counts")
+    args = parser.parse_args(argv)
+
+    if args.rpm:
+        nl_to_sql.llm_rate_limiter = RateLimiter(args.rpm)
+
+    questions = load_questions(args.input)
+    if not questions:
+        print(f"No questions found in {args.input}")
+        return None
+    print(f"Running {len(questions)} questions with {args.workers} workers...")
+
+    started = time.perf_counter()
+    records = run_batch(questions, workers=args.workers, execute=args.execute)
+    summary = summarize(records, time.perf_counter() - started)
+    write_results(records, args.output)
+
+    print(f"Results written to {os.path.abspath(args.output)}")
+    print(f"Succeeded: {summary['succeeded']}/{summary['questions']}")
+    print(f"Throughput: {summary['questions_per_second']} questions/sec")
+    print(f"Latency p50: {summary['p50_seconds']}s, p95: {summary['p95_seconds']}s")
+    return summary
@@ -1,34 +1,33 @@
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
+import numpy as np
+import importlib.util
+import multiprocessing
 import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from .config import CHART_MAX_POINTS, CHART_HISTOGRAM_BINS, CHART_LINE_DOWNSAMPLE, CHART_PIE_TOP_N, CHART_PIE_MAX_SLICES
+from .config import CHART_OUTPUT_DIR, CHART_FORMATS, CHART_PLOTLYJS, CHART_PNG_ASYNC, CHART_PNG_WORKERS
+from .config import CHART_SCATTER_WEBGL_THRESHOLD, CHART_SCATTER_DENSITY_THRESHOLD, CHART_SCATTER_DENSITY_BINS
+from .downsample import downsample_line, density_grid
+from .column_profile import get_column_profile, columns_with_role
+from .tracing import traced, stage
 
+@traced("chart_suggestions")
 def get_chart_suggestions(df):
     if df.empty:
         return []
     
     suggestions = []
     columns = list(df.columns)
-    
-    numeric_cols = [col for col in columns if pd.api.types.is_numeric_dtype(df[col])]
-    
-    categorical_cols = []
-    for col in columns:
-        if not pd.api.types.is_numeric_dtype(df[col]):
-            unique_count = df[col].nunique()
-            if unique_count <= 20:  
-                categorical_cols.append(col)
-    
-    date_cols = []
-    for col in columns:
-        if not pd.api.types.is_numeric_dtype(df[col]):
-            try:
-                sample_val = str(df[col].dropna().iloc[0]) if not df[col].dropna().empty else ""
-                if any(char.isdigit() for char in sample_val) and ('-' in sample_val or '/' in sample_val):
-                    pd.to_datetime(sample_val)
-                    date_cols.append(col)
-            except:
-                pass
+    profile = get_column_profile(df)
+
+    numeric_cols = columns_with_role(profile, "numeric")
+    categorical_cols = columns_with_role(profile, "categorical")
+    date_cols = columns_with_role(profile, "temporal")
     
     if categorical_cols and numeric_cols:
         suggestions.append({
@@ -38,7 +37,7 @@ def get_chart_suggestions(df):
             'reason': f'Categories vs numeric values'
         })
 
-        if df[categorical_cols[0]].nunique() <= 8:
+        if profile[categorical_cols[0]]["distinct"] <= 8:
             suggestions.append({
                 'type': 'pie',
                 'x': categorical_cols[0],
@@ -80,27 +79,11 @@ def get_chart_suggestions(df):
     
     return suggestions[:4]  
 
-def generate_chart_from_instruction(df, config):
-
-    if df.empty:
-        print("No data to chart")
-        return False
-    
+def prepare_chart_data(df, config):
+    """Drop missing values, coerce types and reduce the rows to what the chart can show; None on failure"""
     chart_type = config.get("chart_type", "bar")
     x = config.get("x_axis")
-    y = config.get("y_axis") 
-    color = config.get("color")
-    title = config.get("title", "My Chart")
-
-    if x and x not in df.columns:
-        print(f"Column '{x}' not found in data")
-        print(f"Available columns: {list(df.columns)}")
-        return False
-    
-    if y and y not in df.columns and chart_type != "histogram":
-        print(f"Column '{y}' not found in data")
-        print(f"Available columns: {list(df.columns)}")
-        return False
+    y = config.get("y_axis")
 
     try:
         if x and y:
@@ -112,81 +95,253 @@ def generate_chart_from_instruction(df, config):
         
         if df_clean.empty:
             print("No data remaining after removing missing values")
-            return False
-
-        if len(df_clean) > 1000:
-            df_clean = df_clean.head(1000)
-            print(f"Limited to first 1000 rows for performance")
+            return None
         
+        # DECIMAL and DATE values arrive as Python objects; give plotly real numbers and timestamps.
+        profile = get_column_profile(df)
+        for col in {x, y} - {None}:
+            if col not in df_clean.columns:
+                continue
+            if profile[col]["numeric"] and not pd.api.types.is_numeric_dtype(df_clean[col]):
+                df_clean[col] = pd.to_numeric(df_clean[col], errors='coerce')
+            elif profile[col]["role"] == "temporal" and not pd.api.types.is_datetime64_any_dtype(df_clean[col]):
+                df_clean[col] = pd.to_datetime(df_clean[col], errors='coerce', format='mixed')
         if chart_type == "pie" and y:
-            try:
-                df_clean[y] = pd.to_numeric(df_clean[y], errors='coerce')
-                df_clean = df_clean.dropna(subset=[y])
-            except:
-                pass
+            df_clean[y] = pd.to_numeric(df_clean[y], errors='coerce')
+        df_clean = df_clean.dropna(subset=[col for col in (x, y) if col in df_clean.columns])
+
+        if not config.get("preaggregated"):
+            df_clean = reduce_points(df_clean, chart_type, x, y, config.get("downsample", CHART_LINE_DOWNSAMPLE))
         
     except Exception as e:
         print(f"Data preprocessing failed: {e}")
-        return False
+        return None
+
+    return df_clean
+
+def reduce_points(df, chart_type, x, y, method=CHART_LINE_DOWNSAMPLE):
+    """Line charts are downsampled and bar charts aggregated to CHART_MAX_POINTS.
+
+    Scatter plots and histograms are reduced in build_figure instead, where the
+    drawing method is chosen; pies group their small slices there too.
+    """
+    numeric_y = bool(y) and y in df.columns and pd.api.types.is_numeric_dtype(df[y])
+    if len(df) <= CHART_MAX_POINTS or chart_type in ("scatter", "histogram", "pie"):
+        return df
+
+    if chart_type == "line" and numeric_y:
+        with stage("chart_downsample"):
+            reduced = downsample_line(df, x, y, CHART_MAX_POINTS, method)
+        print(f"Downsampled {len(df)} points to {len(reduced)} ({method})")
+        return reduced
+
+    if chart_type == "bar" and numeric_y:
+        totals = df.groupby(x, as_index=False, sort=False)[y].sum()
+        if len(totals) > CHART_MAX_POINTS:
+            print(f"Showing the top {CHART_MAX_POINTS} of {len(totals)} bars")
+            totals = totals.nlargest(CHART_MAX_POINTS, y)
+        return totals
+
+    print(f"Limited to first {CHART_MAX_POINTS} rows for performance")
+    return df.head(CHART_MAX_POINTS)
+
+def build_figure(df_clean, config):
+    """Plotly figure for already-prepared data; None for unsupported chart types"""
+    chart_type = config.get("chart_type", "bar")
+    x = config.get("x_axis")
+    y = config.get("y_axis")
+    color = config.get("color")
+    title = config.get("title", "My Chart")
+    numeric_x = bool(x) and pd.api.types.is_numeric_dtype(df_clean[x])
+    numeric_y = bool(y) and y in df_clean.columns and pd.api.types.is_numeric_dtype(df_clean[y])
 
     fig = None
-    try:
-        if chart_type == "bar":
-            fig = px.bar(
-                df_clean, 
-                x=x, 
-                y=y, 
-                title=title,
-                color_discrete_sequence=['#3498db'] if not color else [color]
-            )
-            
-        elif chart_type == "pie":
-            if df_clean[x].nunique() > 15:
-                top_categories = df_clean.groupby(x)[y].sum().nlargest(10)
-                others_sum = df_clean.groupby(x)[y].sum().drop(top_categories.index).sum()
-                
-                pie_data = top_categories.to_dict()
-                if others_sum > 0:
-                    pie_data['Others'] = others_sum
-                
-                pie_df = pd.DataFrame(list(pie_data.items()), columns=[x, y])
-                fig = px.pie(pie_df, names=x, values=y, title=title)
-            else:
-                fig = px.pie(df_clean, names=x, values=y, title=title)
-            
-        elif chart_type == "line":
-            fig = px.line(
-                df_clean, 
-                x=x, 
-                y=y, 
-                title=title,
-                color_discrete_sequence=['#e74c3c'] if not color else [color]
-            )
+    if chart_type == "histogram" and not config.get("preaggregated") and numeric_x:
+        # Bin here rather than shipping every value to plotly.js to bin in the browser.
+        counts, edges = np.histogram(df_clean[x].to_numpy(dtype=float), bins=CHART_HISTOGRAM_BINS)
+        df_clean = pd.DataFrame({x: (edges[:-1] + edges[1:]) / 2, "count": counts})
+        y = "count"
+        config = dict(config, preaggregated=True)
+
+    if chart_type == "bar":
+        fig = px.bar(
+            df_clean, 
+            x=x, 
+            y=y, 
+            title=title,
+            color_discrete_sequence=['#3498db'] if not color else [color]
+        )
+        
+    elif chart_type == "pie":
+        if df_clean[x].nunique() > CHART_PIE_MAX_SLICES:
+            top_categories = df_clean.groupby(x)[y].sum().nlargest(CHART_PIE_TOP_N)
+            others_sum = df_clean.groupby(x)[y].sum().drop(top_categories.index).sum()
             
-        elif chart_type == "histogram":
-            fig = px.histogram(
-                df_clean,
-                x=x,
-                title=title,
-                color_discrete_sequence=['#2ecc71'] if not color else [color],
-                nbins=20
-            )
+            pie_data = top_categories.to_dict()
+            if others_sum > 0:
+                pie_data['Others'] = others_sum
             
-        elif chart_type == "scatter":
-            fig = px.scatter(
-                df_clean,
-                x=x,
-                y=y,
-                title=title,
-                color_discrete_sequence=['#f39c12'] if not color else [color]
+            pie_df = pd.DataFrame(list(pie_data.items()), columns=[x, y])
+            fig = px.pie(pie_df, names=x, values=y, title=title)
+        else:
+            fig = px.pie(df_clean, names=x, values=y, title=title)
+        
+    elif chart_type == "line":
+        fig = px.line(
+            df_clean, 
+            x=x, 
+            y=y, 
+            title=title,
+            color_discrete_sequence=['#e74c3c'] if not color else [color]
+        )
+        
+    elif chart_type == "histogram" and config.get("preaggregated"):
+        fig = px.bar(
+            df_clean,
+            x=x,
+            y=y,
+            title=title,
+            color_discrete_sequence=['#2ecc71'] if not color else [color]
+        )
+        fig.update_layout(bargap=0)
+        
+    elif chart_type == "histogram":
+        fig = px.histogram(
+            df_clean,
+            x=x,
+            title=title,
+            color_discrete_sequence=['#2ecc71'] if not color else [color],
+            nbins=CHART_HISTOGRAM_BINS
+        )
+        
+    elif chart_type == "scatter" and config.get("density"):
+        # Grid cells counted by the database (chart_query); empty cells were never returned.
+        grid = df_clean.pivot_table(index=y, columns=x, values="points", aggfunc="sum")
+        fig = density_heatmap(grid.to_numpy(dtype=float), grid.columns, grid.index, x, y, title)
+        
+    elif chart_type == "scatter" and len(df_clean) > CHART_SCATTER_DENSITY_THRESHOLD and numeric_x and numeric_y:
+        with stage("chart_downsample"):
+            counts, x_centres, y_centres = density_grid(
+                df_clean[x].to_numpy(dtype=float), df_clean[y].to_numpy(dtype=float), CHART_SCATTER_DENSITY_BINS
             )
-            
+        print(f"Binned {len(df_clean)} points into a {CHART_SCATTER_DENSITY_BINS}x{CHART_SCATTER_DENSITY_BINS} density map")
+        fig = density_heatmap(counts, x_centres, y_centres, x, y, title)
+        
+    elif chart_type == "scatter":
+        fig = px.scatter(
+            df_clean,
+            x=x,
+            y=y,
+            title=title,
+            render_mode="webgl" if len(df_clean) > CHART_SCATTER_WEBGL_THRESHOLD else "auto",
+            color_discrete_sequence=['#f39c12'] if not color else [color]
+        )
+        
+    else:
+        print(f"Unsupported chart type: {chart_type}")
+        return None
+
+    return fig
+
+def density_heatmap(counts, x_centres, y_centres, x, y, title):
+    """Heatmap of point counts per grid cell, with empty cells as NaN"""
+    fig = go.Figure(go.Heatmap(
+        z=counts, x=x_centres, y=y_centres, colorscale="Blues", colorbar={"title": "points"},
+        hovertemplate=f"<b>{x}</b>: %{{x}}<br><b>{y}</b>: %{{y}}<br>points: %{{z}}<extra></extra>"
+    ))
+    fig.update_layout(title=title, xaxis_title=x, yaxis_title=y)
+    return fig
+
+def chart_base_path(chart_type, output_dir=CHART_OUTPUT_DIR):
+    """Unique path stem per chart, so concurrent or repeated requests never overwrite each other"""
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(output_dir, f"{chart_type}_chart_{stamp}_{uuid.uuid4().hex[:8]}")
+
+def write_chart(fig, chart_type, formats=CHART_FORMATS, output_dir=CHART_OUTPUT_DIR, png_async=CHART_PNG_ASYNC):
+    """Write fig in each of formats ("html", "json", "png"); returns {format: path}.
+
+    HTML references plotly.js per CHART_PLOTLYJS instead of embedding the
+    3.5 MB bundle every time. PNG export runs in a background process and its
+    future is returned as "png_future"; the path is only valid once it is done.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    base = chart_base_path(chart_type, output_dir)
+    artifacts = {}
+
+    if "html" in formats:
+        artifacts["html"] = f"{base}.html"
+        with stage("chart_render_html"):
+            fig.write_html(artifacts["html"], include_plotlyjs=True if CHART_PLOTLYJS == "inline" else CHART_PLOTLYJS)
+
+    if "json" in formats:
+        artifacts["json"] = f"{base}.json"
+        with stage("chart_render_json"):
+            fig.write_json(artifacts["json"])
+
+    if "png" in formats:
+        if importlib.util.find_spec("kaleido") is None:
+            print("Install kaleido for PNG export: pip install kaleido")
+        elif png_async:
+            artifacts["png"] = f"{base}.png"
+            artifacts["png_future"] = export_png_async(fig, artifacts["png"])
         else:
-            print(f"Unsupported chart type: {chart_type}")
-            return False
+            artifacts["png"] = f"{base}.png"
+            with stage("chart_render_png"):
+                _write_png(fig.to_json(), artifacts["png"])
+    return artifacts
+
+def _write_png(figure_json, path):
+    # Module-level so it can run in a worker process; figures travel as JSON.
+    import plotly.io as pio
+    pio.from_json(figure_json).write_image(path, width=1200, height=800, scale=2)
+    return path
+
+_png_pool = None
+_png_pool_lock = threading.Lock()
+
+def export_png_async(fig, path):
+    global _png_pool
+    with _png_pool_lock:
+        if _png_pool is None:
+            _png_pool = ProcessPoolExecutor(max_workers=CHART_PNG_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    future = _png_pool.submit(_write_png, fig.to_json(), path)
+    future.add_done_callback(_report_png_failure)
+    return future
+
+def _report_png_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        print(f"PNG export failed: {future.exception()}")
+
+@traced("chart_generation")
+def generate_chart_from_instruction(df, config, formats=CHART_FORMATS, png_async=CHART_PNG_ASYNC):
+
+    if df.empty:
+        print("No data to chart")
+        return False
+    
+    chart_type = config.get("chart_type", "bar")
+    x = config.get("x_axis")
+    y = config.get("y_axis") 
+    title = config.get("title", "My Chart")
 
+    if x and x not in df.columns:
+        print(f"Column '{x}' not found in data")
+        print(f"Available columns: {list(df.columns)}")
+        return False
+    
+    if y and y not in df.columns and chart_type != "histogram":
+        print(f"Column '{y}' not found in data")
+        print(f"Available columns: {list(df.columns)}")
+        return False
+
+    df_clean = prepare_chart_data(df, config)
+    if df_clean is None:
+        return False
+
+    fig = None
+    try:
+        fig = build_figure(df_clean, config)
         if fig is None:
-            print("Failed to create chart")
             return False
 
         fig.update_layout(
@@ -207,23 +362,18 @@ def generate_chart_from_instruction(df, config):
         if y and chart_type not in ["pie", "histogram"]:
             fig.update_yaxes(title_font_size=14)
 
-        if chart_type in ["bar", "scatter", "line"]:
+        if chart_type in ["bar", "scatter", "line"] and fig.data[0].type != "heatmap":
             fig.update_traces(
                 hovertemplate=f"<b>{x}</b>: %{{x}}<br><b>{y}</b>: %{{y}}<extra></extra>"
             )
-        filename = f"{chart_type}_chart.html"
-        fig.write_html(filename)
-        
-        try:
-            png_filename = f"{chart_type}_chart.png"
-            fig.write_image(png_filename, width=1200, height=800, scale=2)
-            print(f"Chart saved as: {os.path.abspath(filename)}")
-            print(f"PNG saved as: {os.path.abspath(png_filename)}")
-        except Exception:
-            print(f"Chart saved as: {os.path.abspath(filename)}")
-            print("Install kaleido for PNG export: pip install kaleido")
-        
-        return True
+        artifacts = write_chart(fig, chart_type, formats=formats, png_async=png_async)
+        if "html" in artifacts:
+            print(f"Chart saved as: {os.path.abspath(artifacts['html'])}")
+        if "json" in artifacts:
+            print(f"Figure JSON saved as: {os.path.abspath(artifacts['json'])}")
+        if "png" in artifacts:
+            print(f"PNG will be saved as: {os.path.abspath(artifacts['png'])}")
+        return artifacts
 
     except Exception as e:
         print(f"Chart generation failed: {e}")
@@ -249,8 +399,9 @@ def generate_quick_chart(df, chart_type="bar", title="Quick Chart"):
         print("No columns found")
         return False
     
-    numeric_cols = [col for col in columns if pd.api.types.is_numeric_dtype(df[col])]
-    categorical_cols = [col for col in columns if not pd.api.types.is_numeric_dtype(df[col])]
+    profile = get_column_profile(df)
+    numeric_cols = columns_with_role(profile, "numeric")
+    categorical_cols = columns_with_role(profile, "categorical", "temporal", "text")
     
     if len(columns) >= 2:
         if categorical_cols and numeric_cols:
@@ -0,0 +1,137 @@
+"""Rewrite a result query so the database returns only what a chart plots.
+
+The original SELECT is wrapped as a derived table and the chart's
+aggregation (bar totals, pie top-N plus "Others", histogram binning) runs in
+MySQL. Line charts get each bucket's first, last, lowest and highest rows,
+which the client then downsamples (LTTB or min/max) without losing peaks.
+Scatter plots get every point up to CHART_SCATTER_DENSITY_THRESHOLD, for
+WebGL, and above it the point counts of a density grid. Window functions
+require MySQL 8. Callers fall back to client-side charting when this
+returns None.
+"""
+import pandas as pd
+
+from .config import CHART_MAX_POINTS, CHART_PIE_TOP_N, CHART_PIE_MAX_SLICES, CHART_HISTOGRAM_BINS
+from .config import CHART_SCATTER_DENSITY_THRESHOLD, CHART_SCATTER_DENSITY_BINS
+from .column_profile import get_column_profile
+from .db_manager import fetch_dataframe
+from .query_guard import strip_statement_end
+
+HISTOGRAM_COUNT_COLUMN = "count"
+DENSITY_COUNT_COLUMN = "points"
+
+
+def quote_identifier(name):
+    return "`" + str(name).replace("`", "``") + "`"
+
+def build_chart_query(sql, config, numeric_columns):
+    chart_type = config.get("chart_type", "bar")
+    x = config.get("x_axis")
+    y = config.get("y_axis")
+    if not x or (y == x and chart_type != "histogram"):
+        return None
+
+    # A trailing "-- note" would otherwise comment out the rest of the wrapper.
+    base = strip_statement_end(sql)
+    src = f"({base}) AS chart_src"
+    qx = quote_identifier(x)
+    qy = quote_identifier(y) if y else None
+
+    if chart_type == "bar" and y in numeric_columns:
+        # Bars keep the result's order; only past CHART_MAX_POINTS groups are the largest totals kept.
+        return (
+            f"SELECT {qx}, {qy} FROM (SELECT {qx}, SUM({qy}) AS {qy}, MIN(row_pos) AS first_pos, "
+            f"COUNT(*) OVER () AS group_count, ROW_NUMBER() OVER (ORDER BY SUM({qy}) DESC) AS total_rank "
+            f"FROM (SELECT {qx}, {qy}, ROW_NUMBER() OVER () AS row_pos FROM {src} "
+            f"WHERE {qx} IS NOT NULL AND {qy} IS NOT NULL) AS positioned GROUP BY {qx}) AS bars "
+            f"WHERE group_count <= {CHART_MAX_POINTS} OR total_rank <= {CHART_MAX_POINTS} ORDER BY first_pos"
+        )
+
+    if chart_type == "pie" and y in numeric_columns:
+        return (
+            f"SELECT CASE WHEN group_count <= {CHART_PIE_MAX_SLICES} OR group_rank <= {CHART_PIE_TOP_N} "
+            f"THEN {qx} ELSE 'Others' END AS {qx}, SUM(group_total) AS {qy} "
+            f"FROM (SELECT {qx}, SUM({qy}) AS group_total, "
+            f"ROW_NUMBER() OVER (ORDER BY SUM({qy}) DESC) AS group_rank, COUNT(*) OVER () AS group_count "
+            f"FROM {src} WHERE {qx} IS NOT NULL AND {qy} IS NOT NULL GROUP BY {qx}) AS ranked "
+            f"GROUP BY 1 HAVING SUM(group_total) > 0 ORDER BY MIN(group_rank)"
+        )
+
+    if chart_type == "line" and y in numeric_columns:
+        # Up to four rows per bucket; NTILE keeps every row when there are fewer rows than buckets.
+        return (
+            f"SELECT {qx}, {qy} FROM (SELECT {qx}, {qy}, "
+            f"ROW_NUMBER() OVER (PARTITION BY bucket ORDER BY {qx}) AS first_rank, "
+            f"ROW_NUMBER() OVER (PARTITION BY bucket ORDER BY {qx} DESC) AS last_rank, "
+            f"ROW_NUMBER() OVER (PARTITION BY bucket ORDER BY {qy}) AS low_rank, "
+            f"ROW_NUMBER() OVER (PARTITION BY bucket ORDER BY {qy} DESC) AS high_rank "
+            f"FROM (SELECT {qx}, {qy}, NTILE({CHART_MAX_POINTS}) OVER (ORDER BY {qx}) AS bucket "
+            f"FROM {src} WHERE {qx} IS NOT NULL AND {qy} IS NOT NULL) AS buckets) AS ranked "
+            f"WHERE first_rank = 1 OR last_rank = 1 OR low_rank = 1 OR high_rank = 1 ORDER BY {qx}"
+        )
+
+    if chart_type == "scatter" and x in numeric_columns and y in numeric_columns and DENSITY_COUNT_COLUMN not in (x, y):
+        # Every point while the browser can draw them, else one row per non-empty density cell.
+        bins = CHART_SCATTER_DENSITY_BINS
+        limit = CHART_SCATTER_DENSITY_THRESHOLD
+        cell = lambda col, low, width: f"COALESCE(LEAST(FLOOR(({col} - {low}) / NULLIF({width}, 0)), {bins - 1}), 0)"
+        return (
+            f"WITH chart_points AS (SELECT {qx}, {qy}, COUNT(*) OVER () AS row_count, "
+            f"MIN({qx}) OVER () AS x_low, (MAX({qx}) OVER () - MIN({qx}) OVER ()) / {bins} AS x_width, "
+            f"MIN({qy}) OVER () AS y_low, (MAX({qy}) OVER () - MIN({qy}) OVER ()) / {bins} AS y_width "
+            f"FROM {src} WHERE {qx} IS NOT NULL AND {qy} IS NOT NULL) "
+            f"SELECT {qx}, {qy}, 1 AS {quote_identifier(DENSITY_COUNT_COLUMN)} FROM chart_points WHERE row_count <= {limit} "
+            f"UNION ALL "
+            f"SELECT x_low + (x_bin + 0.5) * x_width, y_low + (y_bin + 0.5) * y_width, COUNT(*) "
+            f"FROM (SELECT {cell(qx, 'x_low', 'x_width')} AS x_bin, {cell(qy, 'y_low', 'y_width')} AS y_bin, "
+            f"x_low, x_width, y_low, y_width FROM chart_points WHERE row_count > {limit}) AS binned "
+            f"GROUP BY x_bin, y_bin, x_low, x_width, y_low, y_width"
+        )
+
+    if chart_type == "histogram" and x in numeric_columns:
+        bins = CHART_HISTOGRAM_BINS
+        return (
+            f"SELECT low + (bin + 0.5) * width AS {qx}, COUNT(*) AS {quote_identifier(HISTOGRAM_COUNT_COLUMN)} "
+            f"FROM (SELECT COALESCE(LEAST(FLOOR(({qx} - low) / NULLIF(width, 0)), {bins - 1}), 0) AS bin, low, width "
+            f"FROM (SELECT {qx}, MIN({qx}) OVER () AS low, (MAX({qx}) OVER () - MIN({qx}) OVER ()) / {bins} AS width "
+            f"FROM {src} WHERE {qx} IS NOT NULL) AS ranged) AS binned "
+            f"GROUP BY bin, low, width ORDER BY bin"
+        )
+
+    return None
+
+def fetch_chart_data(sql, config, sample_df):
+    """Run the chart-shaped query; returns (df, config) or None to fall back to client-side charting.
+
+    sample_df only supplies column types, so a preview of the result is enough.
+    """
+    numeric_columns = {col for col, info in get_column_profile(sample_df).items() if info["numeric"]}
+    chart_sql = build_chart_query(sql, config, numeric_columns)
+    if chart_sql is None:
+        return None
+
+    df = fetch_dataframe(chart_sql)
+    if df is None:
+        print("Could not aggregate in the database, charting the fetched rows instead")
+        return None
+
+    chart_type = config.get("chart_type")
+    chart_config = dict(config)
+    # Line candidates and scatter points still go through the client's downsampling and drawing choices.
+    chart_config["preaggregated"] = chart_type not in ("line", "scatter")
+    if chart_type == "histogram":
+        chart_config["y_axis"] = HISTOGRAM_COUNT_COLUMN
+    if chart_type == "scatter":
+        counts = pd.to_numeric(df.pop(DENSITY_COUNT_COLUMN))
+        # Only grid cells can add up to more points than the threshold.
+        if counts.sum() > CHART_SCATTER_DENSITY_THRESHOLD:
+            df[DENSITY_COUNT_COLUMN] = counts
+            chart_config["preaggregated"] = True
+            chart_config["density"] = True
+
+    # SUM/AVG and DECIMAL columns come back as Decimal objects; plot them as floats.
+    numeric_axes = (chart_config["y_axis"], config["x_axis"] if chart_type in ("histogram", "scatter") else None)
+    for col in numeric_axes:
+        if col and col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df, chart_config
@@ -0,0 +1,111 @@
+"""Column roles for chart suggestions, inferred from a bounded random sample.
+
+Each column is classified as numeric, temporal, categorical, id or text
+using vectorized checks on at most CHART_PROFILE_SAMPLE_ROWS rows: pandas'
+infer_dtype for object columns (so DECIMAL and DATE values from MySQL are
+recognised), to_datetime/to_numeric over the whole sample for strings, and
+a GEE estimate of distinct values scaled up from the sample. The profile is
+stored in df.attrs, so later calls on the same result set (including the
+copies handed out by the result cache) reuse it.
+"""
+import math
+import re
+
+import pandas as pd
+
+from .config import CHART_PROFILE_SAMPLE_ROWS
+
+CATEGORICAL_MAX_DISTINCT = 20
+# Share of sampled values that must parse before a string column is treated as dates or numbers.
+PARSE_THRESHOLD = 0.9
+DATE_LIKE = r"^\s*\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}"
+ID_NAME = re.compile(r"(?i:(^|_)(id|uuid|guid|key))$|[a-z]Id$")
+PROFILE_ATTR = "column_profile"
+
+
+def estimate_distinct(sample, total_rows):
+    """Distinct values in total_rows, estimated from a uniform sample of them.
+
+    GEE (singletons scale by sqrt(N/n), repeated values count once), except
+    when nearly every sampled value is unique: GEE badly undercounts key-like
+    columns, so those scale linearly instead.
+    """
+    n = len(sample)
+    if n == 0:
+        return 0
+    counts = sample.value_counts(dropna=True)
+    if n >= total_rows:
+        return len(counts)
+    singletons = int((counts == 1).sum())
+    if singletons >= 0.95 * n:
+        return min(total_rows, round(len(counts) * total_rows / n))
+    return min(total_rows, round(math.sqrt(total_rows / n) * singletons + (len(counts) - singletons)))
+
+def _parses(values, parse):
+    parsed = parse(values)
+    return parsed.notna().mean() >= PARSE_THRESHOLD
+
+def _as_datetime(values):
+    return pd.to_datetime(values, errors="coerce", format="mixed")
+
+def _as_number(values):
+    return pd.to_numeric(values, errors="coerce")
+
+def profile_column(name, sample, total_rows):
+    values = sample.dropna()
+    non_null = int(total_rows * (len(values) / len(sample))) if len(sample) else 0
+    distinct = estimate_distinct(values, non_null)
+    info = {
+        "role": "text",
+        "numeric": False,
+        "distinct": distinct,
+        "null_fraction": round(1 - len(values) / len(sample), 4) if len(sample) else 0.0
+    }
+    unique_ratio = distinct / non_null if non_null else 0
+
+    if pd.api.types.is_bool_dtype(sample):
+        info["role"] = "categorical"
+        return info
+    if pd.api.types.is_datetime64_any_dtype(sample):
+        info["role"] = "temporal"
+        return info
+
+    if pd.api.types.is_numeric_dtype(sample):
+        kind = "integer" if pd.api.types.is_integer_dtype(sample) else "floating"
+    else:
+        kind = pd.api.types.infer_dtype(values, skipna=True)
+        if kind in ("string", "mixed") and len(values):
+            strings = values.astype(str)
+            if strings.str.match(DATE_LIKE).mean() >= PARSE_THRESHOLD and _parses(strings, _as_datetime):
+                kind = "date"
+            elif _parses(strings, _as_number):
+                kind = "floating"
+
+    if kind in ("date", "datetime", "datetime64", "time"):
+        info["role"] = "temporal"
+    elif kind in ("integer", "floating", "decimal", "mixed-integer-float"):
+        info["numeric"] = True
+        is_key = ID_NAME.search(str(name)) and kind == "integer"
+        info["role"] = "id" if is_key and unique_ratio >= 0.95 else "numeric"
+    elif distinct <= CATEGORICAL_MAX_DISTINCT:
+        info["role"] = "categorical"
+    elif unique_ratio >= 0.95 and ID_NAME.search(str(name)):
+        info["role"] = "id"
+    return info
+
+def profile_dataframe(df, sample_rows=CHART_PROFILE_SAMPLE_ROWS, seed=0):
+    sample = df.sample(n=sample_rows, random_state=seed) if len(df) > sample_rows else df
+    return {col: profile_column(col, sample[col], len(df)) for col in df.columns}
+
+def get_column_profile(df):
+    """Profile for df, computed once per result set and kept in df.attrs"""
+    signature = (len(df), tuple(df.columns))
+    cached = df.attrs.get(PROFILE_ATTR)
+    if cached and cached["signature"] == signature:
+        return cached["profile"]
+    profile = profile_dataframe(df)
+    df.attrs[PROFILE_ATTR] = {"signature": signature, "profile": profile}
+    return profile
+
+def columns_with_role(profile, *roles):
+    return [col for col, info in profile.items() if info["role"] in roles]
@@ -5,8 +5,97 @@ load_dotenv()
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
-DB_HOST = os.getenv("DB_HOST", "localhost")
-DB_USER = os.getenv("DB_USER", "nl2sql_user")
-DB_PASSWORD = os.getenv("DB_PASSWORD", "admin")
-DB_NAME = os.getenv("DB_NAME", "nl_to_sql_db")
+# MYSQL_* is what the app has always connected with; the DB_* spellings are accepted too.
+DB_HOST = os.getenv("MYSQL_HOST") or os.getenv("DB_HOST", "localhost")
+DB_PORT = int(os.getenv("MYSQL_PORT") or os.getenv("DB_PORT", "3306"))
+DB_USER = os.getenv("MYSQL_USER") or os.getenv("DB_USER", "nl2sql_user")
+DB_PASSWORD = os.getenv("MYSQL_PASSWORD") or os.getenv("DB_PASSWORD", "admin")
+DB_NAME = os.getenv("MYSQL_DB") or os.getenv("DB_NAME", "nl_to_sql_db")
 
+# Read replicas as "host[:port],host[:port]"; same user, password and database as the primary.
+DB_REPLICAS = [r.strip() for r in (os.getenv("MYSQL_REPLICAS") or os.getenv("DB_REPLICAS", "")).split(",") if r.strip()]
+DB_REPLICA_RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", "30"))
+DB_REPLICA_STICKY_SECONDS = float(os.getenv("DB_REPLICA_STICKY_SECONDS", "5"))
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_POOL_MAX_IDLE_SECONDS = int(os.getenv("DB_POOL_MAX_IDLE_SECONDS", "300"))
+DB_POOL_HEALTH_CHECK_SECONDS = int(os.getenv("DB_POOL_HEALTH_CHECK_SECONDS", "30"))
+DB_POOL_TIMEOUT_SECONDS = int(os.getenv("DB_POOL_TIMEOUT_SECONDS", "10"))
+
+SCHEMA_CACHE_TTL_SECONDS = int(os.getenv("SCHEMA_CACHE_TTL_SECONDS", "300"))
+SCHEMA_CACHE_PATH = os.getenv("SCHEMA_CACHE_PATH", "")
+SCHEMA_CACHE_WARM_ON_STARTUP = os.getenv("SCHEMA_CACHE_WARM_ON_STARTUP", "true").lower() == "true"
+
+SCHEMA_TOP_K = int(os.getenv("SCHEMA_TOP_K", "8"))
+SCHEMA_DESCRIPTIONS_PATH = os.getenv("SCHEMA_DESCRIPTIONS_PATH", "")
+
+NL_CACHE_ENABLED = os.getenv("NL_CACHE_ENABLED", "true").lower() == "true"
+NL_CACHE_MAX_ENTRIES = int(os.getenv("NL_CACHE_MAX_ENTRIES", "1000"))
+NL_CACHE_TTL_SECONDS = int(os.getenv("NL_CACHE_TTL_SECONDS", "86400"))
+NL_CACHE_SQLITE_PATH = os.getenv("NL_CACHE_SQLITE_PATH", "")
+NL_CACHE_FUZZY_THRESHOLD = float(os.getenv("NL_CACHE_FUZZY_THRESHOLD", "0.85"))
+
+ASYNC_MAX_CONCURRENCY = int(os.getenv("ASYNC_MAX_CONCURRENCY", "8"))
+ASYNC_REQUEST_TIMEOUT_SECONDS = float(os.getenv("ASYNC_REQUEST_TIMEOUT_SECONDS", "60"))
+
+QUERY_FETCH_BATCH_SIZE = int(os.getenv("QUERY_FETCH_BATCH_SIZE", "10000"))
+QUERY_TIMEOUT_SECONDS = float(os.getenv("QUERY_TIMEOUT_SECONDS", "30"))
+QUERY_KILL_GRACE_SECONDS = float(os.getenv("QUERY_KILL_GRACE_SECONDS", "1"))
+QUERY_PREPARED_STATEMENTS = os.getenv("QUERY_PREPARED_STATEMENTS", "true").lower() == "true"
+QUERY_PREPARE_AFTER = int(os.getenv("QUERY_PREPARE_AFTER", "2"))
+QUERY_PREPARED_CACHE_SIZE = int(os.getenv("QUERY_PREPARED_CACHE_SIZE", "64"))
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", "300"))
+
+SESSION_STORE_ENABLED = os.getenv("SESSION_STORE_ENABLED", "true").lower() == "true"
+SESSION_MAX_RESULTS = int(os.getenv("SESSION_MAX_RESULTS", "5"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024 * 1024)))
+
+QUERY_GUARD_ENABLED = os.getenv("QUERY_GUARD_ENABLED", "true").lower() == "true"
+QUERY_GUARD_MAX_ROWS_EXAMINED = float(os.getenv("QUERY_GUARD_MAX_ROWS_EXAMINED", "10000000"))
+QUERY_GUARD_MAX_COST = float(os.getenv("QUERY_GUARD_MAX_COST", "0"))
+QUERY_GUARD_AUTO_LIMIT = int(os.getenv("QUERY_GUARD_AUTO_LIMIT", "1000"))
+QUERY_GUARD_PLAN_CACHE_SIZE = int(os.getenv("QUERY_GUARD_PLAN_CACHE_SIZE", "1000"))
+QUERY_GUARD_PLAN_CACHE_TTL_SECONDS = int(os.getenv("QUERY_GUARD_PLAN_CACHE_TTL_SECONDS", "300"))
+
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "1000"))
+CHART_PIE_TOP_N = int(os.getenv("CHART_PIE_TOP_N", "10"))
+CHART_PIE_MAX_SLICES = int(os.getenv("CHART_PIE_MAX_SLICES", "15"))
+CHART_HISTOGRAM_BINS = int(os.getenv("CHART_HISTOGRAM_BINS", "20"))
+CHART_LINE_DOWNSAMPLE = os.getenv("CHART_LINE_DOWNSAMPLE", "lttb").lower()
+CHART_SCATTER_WEBGL_THRESHOLD = int(os.getenv("CHART_SCATTER_WEBGL_THRESHOLD", "1000"))
+CHART_SCATTER_DENSITY_THRESHOLD = int(os.getenv("CHART_SCATTER_DENSITY_THRESHOLD", "200000"))
+CHART_SCATTER_DENSITY_BINS = int(os.getenv("CHART_SCATTER_DENSITY_BINS", "100"))
+CHART_OUTPUT_DIR = os.getenv("CHART_OUTPUT_DIR", "charts")
+CHART_FORMATS = {f.strip().lower() for f in os.getenv("CHART_FORMATS", "html,png").split(",") if f.strip()}
+CHART_PLOTLYJS = os.getenv("CHART_PLOTLYJS", "directory").lower()
+CHART_PNG_ASYNC = os.getenv("CHART_PNG_ASYNC", "true").lower() == "true"
+CHART_PNG_WORKERS = int(os.getenv("CHART_PNG_WORKERS", "1"))
+CHART_RENDER_WORKERS = int(os.getenv("CHART_RENDER_WORKERS", "2"))
+CHART_RENDER_QUEUE_SIZE = int(os.getenv("CHART_RENDER_QUEUE_SIZE", "32"))
+CHART_RENDER_CACHE_SIZE = int(os.getenv("CHART_RENDER_CACHE_SIZE", "256"))
+CHART_RENDER_SUBMIT_TIMEOUT_SECONDS = float(os.getenv("CHART_RENDER_SUBMIT_TIMEOUT_SECONDS", "10"))
+CHART_PROFILE_SAMPLE_ROWS = int(os.getenv("CHART_PROFILE_SAMPLE_ROWS", "5000"))
+
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "models/gemini-2.5-pro")
+LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "0"))
+LLM_STUB_JITTER_MS = float(os.getenv("LLM_STUB_JITTER_MS", "0"))
+LLM_REPLAY_PATH = os.getenv("LLM_REPLAY_PATH", "llm_responses.jsonl")
+LLM_RECORD_PATH = os.getenv("LLM_RECORD_PATH", "")
+LLM_STREAMING = os.getenv("LLM_STREAMING", "true").lower() == "true"
+
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8080"))
+SERVICE_MAX_CONCURRENCY = int(os.getenv("SERVICE_MAX_CONCURRENCY", "32"))
+SERVICE_QUEUE_TIMEOUT_SECONDS = float(os.getenv("SERVICE_QUEUE_TIMEOUT_SECONDS", "5"))
+SERVICE_MAX_ROWS = int(os.getenv("SERVICE_MAX_ROWS", "1000"))
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", "")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
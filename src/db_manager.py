@@ -1,107 +1,540 @@
 import mysql.connector
 from mysql.connector import Error
-import os
-from dotenv import load_dotenv
+from mysql.connector.constants import ClientFlag
+import functools
+import json
+import threading
+from .config import DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME, DB_REPLICAS, DB_REPLICA_RETRY_SECONDS, DB_REPLICA_STICKY_SECONDS
+from .config import DB_POOL_SIZE, DB_POOL_MAX_IDLE_SECONDS, DB_POOL_HEALTH_CHECK_SECONDS, DB_POOL_TIMEOUT_SECONDS, QUERY_FETCH_BATCH_SIZE
+from .config import RESULT_CACHE_ENABLED, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL_SECONDS
+from .config import QUERY_PREPARED_STATEMENTS, QUERY_PREPARE_AFTER, QUERY_PREPARED_CACHE_SIZE
+from .db_pool import ConnectionPool
+from .db_router import DatabaseRouter, Endpoint, parse_address
+from .query_control import track_query, with_time_limit
+from . import tracing
+from .tracing import traced, stage, record
+from .result_cache import ResultCache, normalize_sql, extract_read_tables, extract_write_tables
+from .sql_template import StatementCache, parameterize
 
-load_dotenv()
+_pool = None
+_router = None
+_pool_lock = threading.Lock()
 
-DB_HOST = os.getenv("MYSQL_HOST", "localhost")
-DB_USER = os.getenv("MYSQL_USER", "nl2sql_user")
-DB_PASSWORD = os.getenv("MYSQL_PASSWORD", "admin")
-DB_NAME = os.getenv("MYSQL_DB", "nl_to_sql_db")
+# MySQL error code for statements that can't be run through the prepared statement protocol.
+ER_UNSUPPORTED_PS = 1295
+
+result_cache = ResultCache(max_bytes=RESULT_CACHE_MAX_BYTES, ttl_seconds=RESULT_CACHE_TTL_SECONDS)
+statement_cache = StatementCache(max_per_connection=QUERY_PREPARED_CACHE_SIZE, prepare_after=QUERY_PREPARE_AFTER)
+
+SCHEMA_COLUMNS_QUERY = """
+    SELECT c.TABLE_NAME, c.COLUMN_NAME, c.COLUMN_TYPE, c.IS_NULLABLE, c.COLUMN_KEY, c.COLUMN_DEFAULT, c.EXTRA,
+           c.COLUMN_COMMENT, t.TABLE_COMMENT
+    FROM information_schema.COLUMNS c
+    JOIN information_schema.TABLES t ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME
+    WHERE c.TABLE_SCHEMA = DATABASE()
+    ORDER BY c.TABLE_NAME, c.ORDINAL_POSITION
+"""
+
+SCHEMA_KEYS_QUERY = """
+    SELECT 'fk' AS KIND, TABLE_NAME, CONSTRAINT_NAME, COLUMN_NAME,
+           REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME, ORDINAL_POSITION, NULL AS NON_UNIQUE
+    FROM information_schema.KEY_COLUMN_USAGE
+    WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IS NOT NULL
+    UNION ALL
+    SELECT 'index', TABLE_NAME, INDEX_NAME, COLUMN_NAME,
+           NULL, NULL, SEQ_IN_INDEX, NON_UNIQUE
+    FROM information_schema.STATISTICS
+    WHERE TABLE_SCHEMA = DATABASE()
+    ORDER BY TABLE_NAME, KIND, CONSTRAINT_NAME, ORDINAL_POSITION
+"""
+
+# CREATE_TIME alone lags behind DDL because MySQL 8 caches it in TABLES
+# (information_schema_stats_expiry), so column definitions are checksummed too.
+# UPDATE_TIME is left out on purpose: it moves on every data write.
+SCHEMA_FINGERPRINT_QUERY = """
+    SELECT
+        (SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE()),
+        (SELECT COALESCE(SUM(CRC32(CONCAT_WS('|', TABLE_NAME, CREATE_TIME))), 0)
+         FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE()),
+        (SELECT COUNT(*) FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE()),
+        (SELECT COALESCE(SUM(CRC32(CONCAT_WS('|', TABLE_NAME, COLUMN_NAME, ORDINAL_POSITION, COLUMN_TYPE, COLUMN_KEY))), 0)
+         FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE())
+"""
+
+# UPDATE_TIME has one-second resolution, so results read while a table is
+# still being written in the current second are not cached.
+TABLE_FINGERPRINT_QUERY = """
+    SELECT TABLE_NAME, TABLE_TYPE, UPDATE_TIME, UPDATE_TIME >= NOW() - INTERVAL 1 SECOND
+    FROM information_schema.TABLES
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({placeholders})
+"""
 
 def get_full_schema_for_gemini():
-    tables = get_all_table_names()
+    return format_schema_for_gemini(get_schema_structure())
+
+def format_schema_for_gemini(structure, tables=None, include_foreign_keys=False):
     schema = ""
-    for table in tables:
-        columns = get_table_schema(table)
+    for table, info in structure.items():
+        if tables is not None and table not in tables:
+            continue
         schema += f"Table: {table}\n"
-        for col_name, col_type in columns:
-            schema += f"  - {col_name}: {col_type}\n"
+        for column in info["columns"]:
+            schema += f"  - {column['name']}: {column['type']}\n"
+        if include_foreign_keys:
+            for fk in info["foreign_keys"]:
+                schema += f"  FK: ({', '.join(fk['columns'])}) -> {fk['ref_table']}({', '.join(fk['ref_columns'])})\n"
         schema += "\n"
     return schema.strip()
 
+@traced("schema_fingerprint")
+def get_schema_fingerprint():
+    """Cheap one-row checksum that changes whenever tables or columns change"""
+    with pooled_connection() as connection:
+        if connection is None:
+            print("Could not establish connection")
+            return None
+
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            cursor.execute(SCHEMA_FINGERPRINT_QUERY)
+            row = cursor.fetchone()
+            return "-".join(str(value) for value in row)
+        except Error as e:
+            print(f"Error computing schema fingerprint: {e}")
+            return None
+        finally:
+            if cursor:
+                cursor.close()
+
+@traced("schema_introspection")
+def get_schema_structure():
+    """Introspect every table, column, foreign key and index in two queries"""
+    with pooled_connection() as connection:
+        if connection is None:
+            print("Could not establish connection")
+            return {}
+
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            cursor.execute(SCHEMA_COLUMNS_QUERY)
+            column_rows = cursor.fetchall()
+            cursor.execute(SCHEMA_KEYS_QUERY)
+            key_rows = cursor.fetchall()
+        except Error as e:
+            print(f"Error introspecting schema: {e}")
+            return {}
+        finally:
+            if cursor:
+                cursor.close()
+
+    structure = {}
+    for table, name, col_type, nullable, key, default, extra, comment, table_comment in column_rows:
+        info = structure.setdefault(table, {"columns": [], "foreign_keys": [], "indexes": [], "comment": table_comment or ""})
+        info["columns"].append({
+            "name": name,
+            "type": col_type,
+            "nullable": nullable == "YES",
+            "key": key,
+            "default": default,
+            "extra": extra,
+            "comment": comment or ""
+        })
 
-def get_connection():
+    for kind, table, constraint, column, ref_table, ref_column, _, non_unique in key_rows:
+        info = structure.get(table)
+        if info is None:
+            continue
+        if kind == "fk":
+            entries = info["foreign_keys"]
+            if not entries or entries[-1]["name"] != constraint:
+                entries.append({"name": constraint, "columns": [], "ref_table": ref_table, "ref_columns": []})
+            entries[-1]["columns"].append(column)
+            entries[-1]["ref_columns"].append(ref_column)
+        else:
+            entries = info["indexes"]
+            if not entries or entries[-1]["name"] != constraint:
+                entries.append({"name": constraint, "columns": [], "unique": not int(non_unique)})
+            entries[-1]["columns"].append(column)
+
+    return structure
+
+
+def get_connection(host=DB_HOST, port=DB_PORT):
     try:
         conn = mysql.connector.connect(
-            host=DB_HOST,
+            host=host,
+            port=port,
             user=DB_USER,
             password=DB_PASSWORD,
-            database=DB_NAME
+            database=DB_NAME,
+            # One statement per execute: a stacked "SELECT ...; DROP ..." is refused by the server.
+            client_flags=[-ClientFlag.MULTI_STATEMENTS]
         )
         if conn.is_connected():
+            _disable_stats_expiry(conn)
             return conn
     except Error as e:
-        print(f"Error connecting to MySQL: {e}")
+        print(f"Error connecting to MySQL at {host}:{port}: {e}")
     return None
 
-def execute_query(query, fetch_results=True):
-    connection = get_connection()
-    if connection is None:
-        print("Could not establish connection")
-        return False
-
+def _disable_stats_expiry(conn):
+    # MySQL 8 caches information_schema.TABLES timestamps for a day by default,
+    # which would hide table updates from the result cache. Older servers lack
+    # the variable and already report live values.
     cursor = None
     try:
-        cursor = connection.cursor()
-        cursor.execute(query)
+        cursor = conn.cursor()
+        cursor.execute("SET SESSION information_schema_stats_expiry = 0")
+    except Error:
+        pass
+    finally:
+        if cursor:
+            cursor.close()
+
+def _new_pool(connect):
+    return ConnectionPool(
+        connect,
+        size=DB_POOL_SIZE,
+        max_idle_seconds=DB_POOL_MAX_IDLE_SECONDS,
+        health_check_seconds=DB_POOL_HEALTH_CHECK_SECONDS,
+        checkout_timeout=DB_POOL_TIMEOUT_SECONDS
+    )
 
-        if fetch_results and query.strip().upper().startswith("SELECT"):
-            columns = [col[0] for col in cursor.description]
+def get_pool():
+    """Pool of connections to the primary"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _new_pool(get_connection)
+    return _pool
+
+def get_router():
+    global _router
+    if _router is None:
+        primary = Endpoint(f"{DB_HOST}:{DB_PORT}", "primary", get_pool(), get_connection)
+        with _pool_lock:
+            if _router is None:
+                replicas = []
+                for address in DB_REPLICAS:
+                    host, port = parse_address(address, DB_PORT)
+                    connect = functools.partial(get_connection, host, port)
+                    replicas.append(Endpoint(f"{host}:{port}", "replica", _new_pool(connect), connect))
+                _router = DatabaseRouter(
+                    primary,
+                    replicas,
+                    retry_seconds=DB_REPLICA_RETRY_SECONDS,
+                    sticky_seconds=DB_REPLICA_STICKY_SECONDS
+                )
+    return _router
+
+def pooled_connection():
+    """Borrow a primary connection for the current thread; nested calls share it"""
+    return get_pool().connection()
+
+def routed_connection(query=None, read_only=None):
+    """Borrow (connection, endpoint) for query: a replica for reads when configured, else the primary"""
+    return get_router().connection(query, read_only=read_only)
+
+def get_pool_stats():
+    return get_pool().stats()
+
+def get_router_stats():
+    return get_router().stats() if DB_REPLICAS else {}
+
+def get_result_cache_stats():
+    return result_cache.stats()
+
+def get_statement_cache_stats():
+    return statement_cache.stats()
+
+tracing.register_collector("db_pool", get_pool_stats)
+tracing.register_collector("result_cache", get_result_cache_stats)
+tracing.register_collector("db_router", get_router_stats)
+tracing.register_collector("prepared_statements", get_statement_cache_stats)
+
+def close_pool():
+    if _router is not None:
+        _router.close_all()
+    elif _pool is not None:
+        _pool.close_all()
+
+def get_table_fingerprints(tables):
+    """{table: UPDATE_TIME} for cache validation, or None if the tables' results can't be cached safely"""
+    if not tables:
+        return None
+    names = sorted(tables)
+    with routed_connection(read_only=True) as (connection, _):
+        if connection is None:
+            return None
+
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            cursor.execute(TABLE_FINGERPRINT_QUERY.format(placeholders=", ".join(["%s"] * len(names))), names)
             rows = cursor.fetchall()
-            return [dict(zip(columns, row)) for row in rows]
-        else:
-            connection.commit()
-            return True
+        except Error as e:
+            print(f"Error reading table fingerprints: {e}")
+            return None
+        finally:
+            if cursor:
+                cursor.close()
+
+    fingerprints = {}
+    for table, table_type, update_time, recently_updated in rows:
+        # Views never report UPDATE_TIME, so changes underneath them are invisible.
+        if table_type != "BASE TABLE" or recently_updated:
+            return None
+        fingerprints[table] = str(update_time)
+    if len(fingerprints) != len(names):
+        return None
+    return fingerprints
+
+def _cached_select(kind, query, load):
+    if not RESULT_CACHE_ENABLED:
+        return load()
+
+    # Fingerprints and the result are read on one server, so replica lag can't
+    # pair a stale result with a newer fingerprint.
+    with routed_connection(query):
+        fingerprints = get_table_fingerprints(extract_read_tables(query))
+        if fingerprints is None:
+            return load()
+
+        key = (kind, normalize_sql(query))
+        cached = result_cache.get(key, fingerprints)
+        if cached is not None:
+            record("result_cache_hits")
+            return cached.copy()
+        record("result_cache_misses")
+
+        result = load()
+    if result is not None and result is not False:
+        result_cache.put(key, fingerprints, result.copy())
+    return result
+
+def execute_query(query, fetch_results=True):
+    is_select = query.strip().upper().startswith("SELECT")
+    if fetch_results and is_select:
+        return _cached_select("rows", query, lambda: _execute_query(query, fetch_results))
+
+    result = _execute_query(query, fetch_results)
+    if result is True and not is_select:
+        result_cache.invalidate_tables(extract_write_tables(query))
+    return result
 
+def _run_statement(connection, query, timeout, **cursor_options):
+    """Execute query on connection and return (cursor, prepared).
+
+    SELECTs whose template is in regular use run as that connection's cached
+    prepared statement, and prepared is the statement text; the cursor must
+    then be handed to _release_cursor rather than closed. Otherwise prepared
+    is None and the cursor is a plain one.
+    """
+    templated = parameterize(query) if QUERY_PREPARED_STATEMENTS and query.strip().upper().startswith("SELECT") else None
+    if templated and statement_cache.should_prepare(templated[0]):
+        template, params = templated
+        cursor, sql = statement_cache.cursor(connection, with_time_limit(template, timeout))
+        try:
+            cursor.execute(sql, params)
+            return cursor, sql
+        except Error as e:
+            # Statements the server can't prepare go back to plain text for good.
+            unsupported = e.errno == ER_UNSUPPORTED_PS
+            statement_cache.discard(connection, sql, template if unsupported else None)
+            if not unsupported:
+                raise
+
+    cursor = connection.cursor(**cursor_options)
+    cursor.execute(with_time_limit(query, timeout))
+    return cursor, None
+
+def _release_cursor(connection, cursor, prepared):
+    if cursor is None:
+        return
+    if prepared is None:
+        cursor.close()
+        return
+    # The statement stays prepared for the next execution; just leave no rows unread on it.
+    try:
+        if connection.unread_result:
+            cursor.fetchall()
+    except Error:
+        statement_cache.discard(connection, prepared)
+
+@traced("sql_execution")
+def _execute_query(query, fetch_results):
+    with routed_connection(query) as (connection, endpoint):
+        if connection is None:
+            print("Could not establish connection")
+            return False
+
+        cursor, prepared = None, None
+        try:
+            with track_query(connection, query, endpoint.connect) as running:
+                try:
+                    cursor, prepared = _run_statement(connection, query, running.timeout)
+
+                    if fetch_results and query.strip().upper().startswith("SELECT"):
+                        columns = [col[0] for col in cursor.description]
+                        rows = cursor.fetchall()
+                        record("rows_fetched", len(rows))
+                        return [dict(zip(columns, row)) for row in rows]
+                    else:
+                        connection.commit()
+                        return True
+                except Error as e:
+                    running.raise_error(e)
+
+        except Error as e:
+            print(f"Query execution failed: {e}")
+            connection.rollback()
+            return False
+
+        finally:
+            _release_cursor(connection, cursor, prepared)
+
+@traced("sql_explain")
+def explain_query(query):
+    """Parsed EXPLAIN FORMAT=JSON plan for query; raises Error if it can't be explained"""
+    with routed_connection(query) as (connection, _):
+        if connection is None:
+            raise Error("Could not establish connection")
+
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            cursor.execute(f"EXPLAIN FORMAT=JSON {query.strip().rstrip(';')}")
+            row = cursor.fetchone()
+            cursor.fetchall()
+        finally:
+            if cursor:
+                cursor.close()
+    return json.loads(row[0])
+
+def _fetch_batches(query, batch_size):
+    # Raises Error to the caller; yields at least one (columns, rows) pair for
+    # row-returning statements so empty results still carry their columns.
+    with routed_connection(query) as (connection, endpoint):
+        if connection is None:
+            raise Error("Could not establish connection")
+
+        cursor, prepared = None, None
+        try:
+            with track_query(connection, query, endpoint.connect) as running:
+                try:
+                    cursor, prepared = _run_statement(connection, query, running.timeout, buffered=False)
+                    if cursor.description is None:
+                        return
+                    columns = [col[0] for col in cursor.description]
+                    rows = cursor.fetchmany(batch_size)
+                    yield columns, rows
+                    while rows:
+                        rows = cursor.fetchmany(batch_size)
+                        if rows:
+                            yield columns, rows
+                except Error as e:
+                    running.raise_error(e)
+        finally:
+            # Drain anything left unread (consumer stopped early) so the pooled
+            # connection can be handed out again.
+            try:
+                connection.consume_results()
+            except Error:
+                pass
+            _release_cursor(connection, cursor, prepared)
+
+def stream_query(query, batch_size=QUERY_FETCH_BATCH_SIZE):
+    """Yield (columns, rows) batches from an unbuffered cursor without materializing the result"""
+    try:
+        for columns, rows in _fetch_batches(query, batch_size):
+            if rows:
+                yield columns, rows
     except Error as e:
         print(f"Query execution failed: {e}")
-        connection.rollback()
-        return False
 
-    finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
+@traced("sql_execution")
+def count_query_rows(query, batch_size=QUERY_FETCH_BATCH_SIZE):
+    """Run a SELECT and count its rows without keeping them; None if it failed"""
+    row_count = 0
+    try:
+        for _, rows in _fetch_batches(query, batch_size):
+            row_count += len(rows)
+    except Error as e:
+        print(f"Query execution failed: {e}")
+        return None
+    return row_count
 
-def get_all_table_names():
-    connection = get_connection()
-    if connection is None:
-        print("Could not establish connection")
-        return []
+def fetch_dataframe(query, batch_size=QUERY_FETCH_BATCH_SIZE):
+    """Build a DataFrame batch by batch, skipping the per-row dict intermediate.
 
-    cursor = None
+    Each batch becomes a small typed frame right away, so only one batch of
+    Python row tuples is alive at a time. Returns None if the query failed.
+    """
+    return _cached_select("frame", query, lambda: _fetch_dataframe(query, batch_size))
+
+@traced("sql_execution")
+def _fetch_dataframe(query, batch_size):
+    # pandas is only needed once results are fetched; keeping it out of module import keeps CLI startup fast.
+    import pandas as pd
+
+    columns = []
+    frames = []
     try:
-        cursor = connection.cursor()
-        cursor.execute("SHOW TABLES")
-        return [row[0] for row in cursor.fetchall()]
+        for columns, rows in _fetch_batches(query, batch_size):
+            if rows:
+                record("rows_fetched", len(rows))
+                with stage("dataframe_construction"):
+                    frames.append(pd.DataFrame.from_records(rows, columns=columns))
     except Error as e:
-        print(f"Error fetching table names: {e}")
-        return []
-    finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
+        print(f"Query execution failed: {e}")
+        return None
+
+    with stage("dataframe_construction"):
+        if not frames:
+            df = pd.DataFrame(columns=columns)
+        elif len(frames) == 1:
+            df = frames[0]
+        else:
+            df = pd.concat(frames, ignore_index=True)
+    if tracing.enabled:
+        record("result_bytes", int(df.memory_usage(index=False).sum()))
+    return df
+
+def get_all_table_names():
+    with pooled_connection() as connection:
+        if connection is None:
+            print("Could not establish connection")
+            return []
+
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SHOW TABLES")
+            return [row[0] for row in cursor.fetchall()]
+        except Error as e:
+            print(f"Error fetching table names: {e}")
+            return []
+        finally:
+            if cursor:
+                cursor.close()
 
 def get_table_schema(table_name):
-    connection = get_connection()
-    if connection is None:
-        print("Could not establish connection")
-        return []
+    with pooled_connection() as connection:
+        if connection is None:
+            print("Could not establish connection")
+            return []
 
-    cursor = None
-    try:
-        cursor = connection.cursor()
-        cursor.execute(f"DESCRIBE {table_name}")
-        return [(row[0], row[1]) for row in cursor.fetchall()]
-    except Error as e:
-        print(f"Error fetching schema for {table_name}: {e}")
-        return []
-    finally:
-        if cursor:
-            cursor.close()
-        if connection and connection.is_connected():
-            connection.close()
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            cursor.execute(f"DESCRIBE {table_name}")
+            return [(row[0], row[1]) for row in cursor.fetchall()]
+        except Error as e:
+            print(f"Error fetching schema for {table_name}: {e}")
+            return []
+        finally:
+            if cursor:
+                cursor.close()
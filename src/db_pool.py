@@ -0,0 +1,162 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from mysql.connector import Error
+
+
+class ConnectionPool:
+    """Thread-safe pool of reusable MySQL connections"""
+
+    def __init__(self, connect, size=5, max_idle_seconds=300, health_check_seconds=30, checkout_timeout=10):
+        self._connect = connect
+        self.size = size
+        self.max_idle_seconds = max_idle_seconds
+        self.health_check_seconds = health_check_seconds
+        self.checkout_timeout = checkout_timeout
+
+        self._idle = []
+        self._open = 0
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._local = threading.local()
+        self._checked_at = {}
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "created": 0,
+            "reconnects": 0,
+            "evicted": 0,
+        }
+
+    def acquire(self):
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            self._local.depth += 1
+            return held
+
+        conn = None
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._available:
+            while True:
+                self._evict_idle()
+                if self._idle:
+                    conn, _ = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    print(f"Timed out waiting for a pooled connection after {self.checkout_timeout}s")
+                    return None
+                self._stats["waits"] += 1
+                self._available.wait(remaining)
+            self._stats["checkouts"] += 1
+
+        if conn is None:
+            conn = self._new_connection()
+        else:
+            conn = self._check_health(conn)
+
+        if conn is None:
+            with self._available:
+                self._open -= 1
+                self._available.notify()
+            return None
+
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+
+    def release(self, conn):
+        if conn is None or getattr(self._local, "conn", None) is not conn:
+            return
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+        self._local.conn = None
+
+        healthy = False
+        try:
+            if conn.is_connected():
+                # Ending the transaction drops the REPEATABLE READ snapshot so
+                # the next borrower sees fresh data.
+                if conn.in_transaction:
+                    conn.rollback()
+                healthy = True
+        except Error:
+            pass
+
+        with self._available:
+            if healthy:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._discard(conn)
+                self._open -= 1
+            self._available.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = self.size
+            stats["open"] = self._open
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._open - len(self._idle)
+        return stats
+
+    def close_all(self):
+        with self._available:
+            for conn, _ in self._idle:
+                self._discard(conn)
+            self._open -= len(self._idle)
+            self._idle = []
+            self._available.notify_all()
+
+    def _new_connection(self):
+        conn = self._connect()
+        if conn is not None:
+            with self._lock:
+                self._stats["created"] += 1
+            self._checked_at[id(conn)] = time.monotonic()
+        return conn
+
+    def _check_health(self, conn):
+        now = time.monotonic()
+        if now - self._checked_at.get(id(conn), 0) < self.health_check_seconds:
+            return conn
+        try:
+            conn.ping(reconnect=False)
+            self._checked_at[id(conn)] = now
+            return conn
+        except Error:
+            self._discard(conn)
+            with self._lock:
+                self._stats["reconnects"] += 1
+            return self._new_connection()
+
+    def _evict_idle(self):
+        # Caller holds the lock. Idle list is LIFO, so stale entries sit at the front.
+        cutoff = time.monotonic() - self.max_idle_seconds
+        while self._idle and self._idle[0][1] < cutoff:
+            conn, _ = self._idle.pop(0)
+            self._discard(conn)
+            self._open -= 1
+            self._stats["evicted"] += 1
+
+    def _discard(self, conn):
+        self._checked_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Error:
+            pass
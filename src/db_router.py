@@ -0,0 +1,140 @@
+"""Routing statements between the primary and its read replicas.
+
+Read-only statements go to the healthy replica with the fewest connections
+in use; everything else, and all reads for DB_REPLICA_STICKY_SECONDS after a
+write (so a session sees its own changes), goes to the primary. A replica
+that cannot hand out a connection is skipped for DB_REPLICA_RETRY_SECONDS
+and the statement fails over to the next replica, then to the primary.
+Within one thread, nested reads reuse the endpoint already in use, so a
+result and the table fingerprints it is cached under come from the same
+server.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from .result_cache import COMMENT_OR_LITERAL, SQL_TOKEN, strip_sql_comments
+
+READ_VERBS = {"SELECT", "WITH", "SHOW", "EXPLAIN", "DESCRIBE", "DESC"}
+# Present anywhere in a statement, these need the primary: writes inside a CTE,
+# locking reads, SELECT ... INTO, DDL and grants, and session state such as
+# user variables or GET_LOCK.
+PRIMARY_TOKENS = {
+    "INSERT", "UPDATE", "DELETE", "REPLACE", "INTO", "LOCK", "SHARE",
+    "DROP", "CREATE", "ALTER", "TRUNCATE", "RENAME", "GRANT", "REVOKE",
+    "GET_LOCK", "RELEASE_LOCK", "LAST_INSERT_ID", "FOUND_ROWS"
+}
+
+
+def is_single_statement(sql):
+    """No top-level ";" other than one at the end, and no /*! ... */ comment, which MySQL executes"""
+    if any(m.group(0).startswith("/*!") for m in COMMENT_OR_LITERAL.finditer(sql or "")):
+        return False
+    tokens = SQL_TOKEN.findall(strip_sql_comments(sql or ""))
+    if tokens and tokens[-1] == ";":
+        tokens.pop()
+    return ";" not in tokens
+
+def is_read_only(sql):
+    """Whether sql can safely run on a replica"""
+    if not is_single_statement(sql):
+        return False
+    tokens = [t.upper() for t in SQL_TOKEN.findall(strip_sql_comments(sql or "")) if not t.startswith(("'", '"', "`"))]
+    if not tokens or tokens[0] not in READ_VERBS:
+        return False
+    return not (PRIMARY_TOKENS & set(tokens) or ":=" in sql)
+
+
+class Endpoint:
+    def __init__(self, name, role, pool, connect):
+        self.name = name
+        self.role = role
+        self.pool = pool
+        # Unpooled connection to this server, for KILL QUERY.
+        self.connect = connect
+        self.down_until = 0.0
+        self.routed = 0
+        self.failovers = 0
+
+    def load(self):
+        return self.pool.stats()["in_use"]
+
+    def stats(self):
+        stats = self.pool.stats()
+        return {
+            "role": self.role,
+            "healthy": self.down_until <= time.monotonic(),
+            "routed": self.routed,
+            "failovers": self.failovers,
+            "in_use": stats["in_use"],
+            "open": stats["open"]
+        }
+
+
+class DatabaseRouter:
+    def __init__(self, primary, replicas=(), retry_seconds=30, sticky_seconds=5):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.retry_seconds = retry_seconds
+        self.sticky_seconds = sticky_seconds
+        self._last_write = float("-inf")
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def candidates(self, read_only):
+        """Endpoints to try in order: healthy replicas by load (reads only), then the primary"""
+        now = time.monotonic()
+        if not read_only or not self.replicas or now - self._last_write < self.sticky_seconds:
+            return [self.primary]
+        healthy = [r for r in self.replicas if r.down_until <= now]
+        return sorted(healthy, key=lambda r: (r.load(), r.routed)) + [self.primary]
+
+    @contextmanager
+    def connection(self, sql=None, read_only=None):
+        """Yields (connection, endpoint); connection is None if no endpoint could provide one"""
+        if read_only is None:
+            read_only = is_read_only(sql)
+        held = getattr(self._local, "endpoint", None)
+        if held is not None and (read_only or held is self.primary):
+            with held.pool.connection() as connection:
+                yield connection, held
+            return
+
+        connection, endpoint = None, self.primary
+        for endpoint in self.candidates(read_only):
+            timeouts = endpoint.pool.stats()["timeouts"]
+            connection = endpoint.pool.acquire()
+            if connection is not None:
+                break
+            # A checkout timeout means busy, not down; only a failed connect takes a replica out.
+            if endpoint is not self.primary and endpoint.pool.stats()["timeouts"] == timeouts:
+                self._mark_down(endpoint)
+
+        with self._lock:
+            endpoint.routed += 1
+        self._local.endpoint = endpoint if connection is not None else None
+        try:
+            yield connection, endpoint
+        finally:
+            self._local.endpoint = held
+            endpoint.pool.release(connection)
+            if not read_only and connection is not None:
+                self._last_write = time.monotonic()
+
+    def stats(self):
+        return {endpoint.name: endpoint.stats() for endpoint in [self.primary] + self.replicas}
+
+    def close_all(self):
+        for endpoint in [self.primary] + self.replicas:
+            endpoint.pool.close_all()
+
+    def _mark_down(self, endpoint):
+        print(f"Replica {endpoint.name} unavailable; retrying it in {self.retry_seconds:g}s")
+        with self._lock:
+            endpoint.down_until = time.monotonic() + self.retry_seconds
+            endpoint.failovers += 1
+
+
+def parse_address(address, default_port=3306):
+    host, _, port = address.rpartition(":") if address.count(":") == 1 else (address, "", "")
+    return host, int(port) if port else default_port
@@ -0,0 +1,71 @@
+"""Point reduction for charts over large results.
+
+Line charts keep their shape with LTTB (largest triangle three buckets) or
+min/max bucketing, instead of the first N rows. Scatter plots too dense to
+draw as points are binned into a 2D histogram here, so the browser gets
+counts rather than millions of markers.
+"""
+import numpy as np
+import pandas as pd
+
+
+def as_float_axis(series):
+    """Numeric positions for an x column: numbers as-is, timestamps as ns, anything else by row order"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(float)
+    if pd.api.types.is_numeric_dtype(series):
+        return series.to_numpy(dtype=float)
+    return np.arange(len(series), dtype=float)
+
+def lttb_indices(x, y, threshold):
+    """Row positions LTTB keeps from x/y (sorted by x), always including the first and last"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # threshold - 2 buckets between the fixed first and last points.
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(area.argmax())
+        kept[i + 1] = previous
+    return kept
+
+def minmax_indices(y, max_points):
+    """Row positions of each bucket's minimum and maximum (two points per bucket), plus the endpoints"""
+    n = len(y)
+    buckets = max(max_points // 2, 1)
+    if n <= max_points:
+        return np.arange(n)
+    groups = pd.Series(y).groupby(np.arange(n) * buckets // n)
+    kept = np.union1d(groups.idxmin().to_numpy(), groups.idxmax().to_numpy())
+    return np.union1d(kept, [0, n - 1])
+
+def downsample_line(df, x, y, max_points, method="lttb"):
+    """df sorted by x and reduced to about max_points rows; y must be numeric"""
+    df = df.sort_values(x, kind="stable").reset_index(drop=True)
+    if len(df) <= max_points:
+        return df
+    y_values = df[y].to_numpy(dtype=float)
+    if method == "minmax":
+        kept = minmax_indices(y_values, max_points)
+    else:
+        kept = lttb_indices(as_float_axis(df[x]), y_values, max_points)
+    return df.iloc[kept].reset_index(drop=True)
+
+def density_grid(x, y, bins):
+    """(counts[y_bin][x_bin] with empty cells as NaN, x bin centres, y bin centres)"""
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=bins)
+    counts = counts.T
+    counts[counts == 0] = np.nan
+    return counts, (x_edges[:-1] + x_edges[1:]) / 2, (y_edges[:-1] + y_edges[1:]) / 2
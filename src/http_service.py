@@ -0,0 +1,311 @@
+"""HTTP/JSON service over the NL→SQL pipeline, for dashboards and other programs.
+
+    python service.py --port 8080
+
+    POST /sql      {"question"}                        -> {"sql"}
+    POST /execute  {"sql" or "question", "max_rows"}   -> {"sql", "columns", "rows", "row_count", "truncated"}
+    POST /chart    {"sql" or "question", "chart": {"chart_type", "x_axis", "y_axis", "title"}} -> {"sql", "artifacts"}
+    GET  /health, GET /metrics
+
+The schema cache, connection pool and LLM client are loaded at startup and
+stay warm. Identical requests that arrive while one is being answered wait
+for it instead of repeating the work: one LLM call per question and one
+execution per statement (single-flight). Only single read-only statements run, and
+only after the cost guard allows them. At most SERVICE_MAX_CONCURRENCY
+requests are worked on at once; the rest wait up to
+SERVICE_QUEUE_TIMEOUT_SECONDS, then get 503.
+"""
+import argparse
+import importlib
+import json
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import tracing
+from .config import SERVICE_HOST, SERVICE_PORT, SERVICE_MAX_CONCURRENCY, SERVICE_QUEUE_TIMEOUT_SECONDS, SERVICE_MAX_ROWS
+from .config import CHART_PROFILE_SAMPLE_ROWS
+from .db_manager import fetch_dataframe, pooled_connection, close_pool
+from .db_router import is_read_only, is_single_statement
+from .nl_cache import normalize_question
+from .query_guard import check_query, strip_statement_end
+from .result_cache import normalize_sql
+from .schema_cache import schema_cache, warm_schema_cache
+from .tracing import start_trace
+
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class SingleFlight:
+    """Runs func once per key at a time; callers with the same key meanwhile share its result"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "coalesced": 0}
+
+    def do(self, key, func):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self._stats["calls"] += 1
+            else:
+                self._stats["coalesced"] += 1
+        if not leader:
+            tracing.record("single_flight_coalesced")
+            return future.result()
+
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        return stats
+
+
+class NL2SQLService:
+    def __init__(self, max_concurrency=SERVICE_MAX_CONCURRENCY, queue_timeout=SERVICE_QUEUE_TIMEOUT_SECONDS, coalesce=True):
+        self.queue_timeout = queue_timeout
+        self.coalesce = coalesce
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "rejected_busy": 0, "errors": 0}
+
+    def warm(self):
+        """Open a pooled connection and load the schema, LLM client and chart code before the first request"""
+        # The CLI imports these lazily to start fast; a service pays for them once, up front.
+        for module in ("pandas", ".chart_query", ".render_service"):
+            importlib.import_module(module, __package__)
+        from . import nl_to_sql
+
+        with pooled_connection() as connection:
+            if connection is None:
+                print("Warning: no database connection at startup")
+        warm_schema_cache()
+        nl_to_sql.llm_backend.warm()
+
+    def handle(self, route, body):
+        with self._lock:
+            self._stats["requests"] += 1
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self._stats["rejected_busy"] += 1
+            raise ServiceError(503, "Service busy, try again later")
+        try:
+            with start_trace(f"http_{route}"):
+                return getattr(self, route)(body)
+        except ServiceError:
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            self._slots.release()
+
+    def sql(self, body):
+        return {"sql": self._sql_for(body)}
+
+    def execute(self, body):
+        try:
+            max_rows = max(0, min(int(body.get("max_rows", SERVICE_MAX_ROWS)), SERVICE_MAX_ROWS))
+        except (TypeError, ValueError):
+            raise ServiceError(400, "max_rows must be an integer")
+        sql = self._sql_for(body)
+        # One row past max_rows is enough to tell whether there are more.
+        df, sql = self._run(sql, limit=max_rows + 1)
+        rows = json.loads(df.head(max_rows).to_json(orient="values", date_format="iso", default_handler=str))
+        return {
+            "sql": sql,
+            "columns": [str(col) for col in df.columns],
+            "rows": rows,
+            "row_count": len(rows),
+            "truncated": len(df) > max_rows
+        }
+
+    def chart(self, body):
+        config = body.get("chart")
+        if not isinstance(config, dict) or not config.get("chart_type") or not config.get("x_axis"):
+            raise ServiceError(400, "chart must give at least chart_type and x_axis")
+        config = dict(config)
+        config.setdefault("title", f"{config['chart_type'].title()} of {config['x_axis']}")
+        sql = self._sql_for(body)
+        # Column types are all the chart query needs from the result itself.
+        preview, sql = self._run(sql, limit=CHART_PROFILE_SAMPLE_ROWS)
+        key = ("chart", normalize_sql(sql), json.dumps(config, sort_keys=True))
+        artifacts = self._once(key, lambda: self._render(preview, config, sql))
+        if not artifacts:
+            raise ServiceError(422, "Could not build a chart from these columns")
+        return {"sql": sql, "artifacts": artifacts}
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({f"single_flight_{name}": value for name, value in self._flights.stats().items()})
+        return stats
+
+    def _sql_for(self, body):
+        if body.get("sql"):
+            return body["sql"]
+        question = (body.get("question") or "").strip()
+        if not question:
+            raise ServiceError(400, "Give a question or sql")
+        from . import nl_to_sql
+
+        key = ("sql", schema_cache.get_fingerprint(), " ".join(normalize_question(question)))
+        sql = self._once(key, lambda: nl_to_sql.get_sql_from_natural_language(question))
+        if not sql:
+            raise ServiceError(422, "Could not generate SQL for this question")
+        return sql
+
+    def _run(self, sql, limit=None):
+        """(DataFrame, executed SQL) for a read-only statement the cost guard allows.
+
+        With limit, only the first limit rows are fetched.
+        """
+        if not is_single_statement(sql):
+            raise ServiceError(400, "Send one statement per request")
+        if not is_read_only(sql):
+            raise ServiceError(403, "Only read-only statements can run through the service")
+
+        def run():
+            decision = check_query(sql)
+            if not decision["allowed"]:
+                raise ServiceError(403, f"Blocked by the cost guard: {decision['reason']}")
+            query = decision["sql"]
+            if limit:
+                query = f"SELECT * FROM ({strip_statement_end(query)}) AS limited LIMIT {limit}"
+            df = fetch_dataframe(query)
+            if df is None:
+                raise ServiceError(500, "Query execution failed")
+            return df, decision["sql"]
+
+        key = ("limited", normalize_sql(sql), limit) if limit else ("execute", normalize_sql(sql))
+        return self._once(key, run)
+
+    def _render(self, preview, config, sql):
+        from .chart_query import fetch_chart_data
+        from .render_service import get_render_service, RenderQueueFull
+
+        chart_data = fetch_chart_data(sql, config, preview)
+        if chart_data:
+            df, config = chart_data
+        else:
+            # Only client-side charting needs every row.
+            df, sql = self._run(sql)
+        try:
+            return get_render_service().render(df, config)
+        except RenderQueueFull as e:
+            raise ServiceError(503, str(e))
+
+    def _once(self, key, func):
+        return self._flights.do(key, func) if self.coalesce else func()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    routes = {"/sql": "sql", "/execute": "execute", "/chart": "chart"}
+
+    def do_GET(self):
+        path = self.path.rstrip("/")
+        if path == "/health":
+            self._send_json(200, {"status": "ok", "service": self.server.app.stats()})
+        elif path == "/metrics":
+            self._send(200, tracing.render_prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        route = self.routes.get(self.path.rstrip("/"))
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send_json(413, {"error": "Request body too large"})
+            return
+        raw = self.rfile.read(length)
+        if route is None:
+            self._send_json(404, {"error": "Not found"})
+            return
+        try:
+            body = json.loads(raw or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("expected a JSON object")
+        except ValueError as e:
+            self._send_json(400, {"error": f"Invalid JSON: {e}"})
+            return
+
+        try:
+            self._send_json(200, self.server.app.handle(route, body))
+        except ServiceError as e:
+            self._send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            print(f"Unexpected error in /{route}: {e}")
+            self._send_json(500, {"error": "Internal error"})
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload, default=str).encode("utf-8"), "application/json")
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # socketserver's default backlog of 5 resets connections from a burst of clients.
+    request_queue_size = 128
+
+
+def create_server(app, host=SERVICE_HOST, port=SERVICE_PORT):
+    server = _Server((host, port), _Handler)
+    server.app = app
+    tracing.register_collector("http_service", app.stats)
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    args = parser.parse_args(argv)
+
+    app = NL2SQLService()
+    print("Warming up schema, connection pool and LLM client...")
+    app.warm()
+    server = create_server(app, args.host, args.port)
+    print(f"Serving on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down")
+    finally:
+        from .render_service import get_render_service
+
+        server.server_close()
+        get_render_service().shutdown()
+        close_pool()
@@ -0,0 +1,230 @@
+"""LLM backends behind get_sql_from_natural_language.
+
+Every backend exposes ready(), warm(), generate(prompt, question) and
+generate_async(prompt, question), returning the raw response text, and
+generate_stream(prompt, question), yielding it in chunks as it arrives.
+LLM_BACKEND picks one: "gemini" (default), "stub" (rule-based, offline)
+or "replay" (responses recorded earlier with LLM_RECORD_PATH).
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from .config import GOOGLE_API_KEY, LLM_BACKEND, LLM_MODEL_NAME, LLM_STUB_LATENCY_MS, LLM_STUB_JITTER_MS, LLM_REPLAY_PATH, LLM_RECORD_PATH
+
+
+class LLMBackendError(Exception):
+    """Raised by backends for provider/API failures"""
+
+
+def question_key(question):
+    return " ".join(re.findall(r"[a-z0-9]+", question.lower()))
+
+
+class GeminiBackend:
+    def __init__(self, model_name, api_key):
+        self.model_name = model_name
+        self.api_key = api_key
+        self._model = None
+        self._lock = threading.Lock()
+
+    def ready(self):
+        if not self.api_key:
+            print("Error: Problem with the API key. Check .env file")
+            return False
+        return True
+
+    def warm(self):
+        """Load the client library and model up front, for long-running services"""
+        if self.api_key:
+            self._get_model()
+
+    def _get_model(self):
+        with self._lock:
+            if self._model is None:
+                # Imported on first use: google.generativeai adds about a second to startup.
+                import google.generativeai as genai
+                genai.configure(api_key=self.api_key)
+                self._model = genai.GenerativeModel(self.model_name)
+            return self._model
+
+    def generate(self, prompt, question=None):
+        from google.api_core.exceptions import GoogleAPICallError
+        try:
+            return self._get_model().generate_content(prompt).text
+        except GoogleAPICallError as e:
+            raise LLMBackendError(f"Gemini API Error: {e}") from e
+
+    async def generate_async(self, prompt, question=None):
+        from google.api_core.exceptions import GoogleAPICallError
+        try:
+            response = await self._get_model().generate_content_async(prompt)
+            return response.text
+        except GoogleAPICallError as e:
+            raise LLMBackendError(f"Gemini API Error: {e}") from e
+
+    def generate_stream(self, prompt, question=None):
+        from google.api_core.exceptions import GoogleAPICallError
+        try:
+            for chunk in self._get_model().generate_content(prompt, stream=True):
+                yield chunk.text
+        except GoogleAPICallError as e:
+            raise LLMBackendError(f"Gemini API Error: {e}") from e
+
+
+def split_chunks(text):
+    """Split text into word-sized pieces, the way a streaming API delivers it"""
+    return re.findall(r"\s*\S+", text) or [text]
+
+
+class StubBackend:
+    """Deterministic rule-based SQL with configurable latency, for hermetic benchmarks"""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def ready(self):
+        return True
+
+    def warm(self):
+        pass
+
+    def _delay(self):
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+        return max(self.latency_ms + jitter, 0) / 1000
+
+    def generate(self, prompt, question=None):
+        time.sleep(self._delay())
+        return self.respond(prompt, question)
+
+    async def generate_async(self, prompt, question=None):
+        await asyncio.sleep(self._delay())
+        return self.respond(prompt, question)
+
+    def generate_stream(self, prompt, question=None):
+        # The configured latency is spread over the chunks, so time to first chunk is a fraction of it.
+        chunks = split_chunks(self.respond(prompt, question))
+        delay = self._delay() / len(chunks)
+        for chunk in chunks:
+            time.sleep(delay)
+            yield chunk
+
+    def respond(self, prompt, question):
+        tables = re.findall(r"^\s*Table: (\S+)", prompt, flags=re.M)
+        if not tables:
+            return "SELECT 1"
+        words = set(question_key(question or "").split())
+        table = next((t for t in tables if set(t.lower().split("_")) & words), tables[0])
+
+        if words & {"count", "many", "number"}:
+            return f"```sql\nSELECT COUNT(*) AS total FROM `{table}`;\n```"
+        top = re.search(r"\btop (\d+)", question_key(question or ""))
+        limit = int(top.group(1)) if top else 100
+        return f"```sql\nSELECT * FROM `{table}` LIMIT {limit};\n```"
+
+
+class ReplayBackend:
+    """Serves responses recorded by RecordingBackend, keyed on the question text"""
+
+    def __init__(self, path, fallback=None):
+        self.responses = {}
+        self.fallback = fallback
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.responses[question_key(record["question"])] = record["response"]
+        else:
+            print(f"Replay file {path} not found")
+
+    def ready(self):
+        return True
+
+    def warm(self):
+        pass
+
+    def _lookup(self, question):
+        response = self.responses.get(question_key(question or ""))
+        if response is None and self.fallback is None:
+            raise KeyError(f"No recorded response for question: {question}")
+        return response
+
+    def generate(self, prompt, question=None):
+        response = self._lookup(question)
+        return response if response is not None else self.fallback.generate(prompt, question)
+
+    async def generate_async(self, prompt, question=None):
+        response = self._lookup(question)
+        return response if response is not None else await self.fallback.generate_async(prompt, question)
+
+    def generate_stream(self, prompt, question=None):
+        response = self._lookup(question)
+        if response is None:
+            yield from self.fallback.generate_stream(prompt, question)
+        else:
+            yield from split_chunks(response)
+
+
+class RecordingBackend:
+    """Wraps another backend and appends every (question, response) to a JSONL file for replay"""
+
+    def __init__(self, inner, path):
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+
+    def ready(self):
+        return self.inner.ready()
+
+    def warm(self):
+        self.inner.warm()
+
+    def _record(self, question, response):
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"question": question, "response": response}) + "\n")
+
+    def generate(self, prompt, question=None):
+        response = self.inner.generate(prompt, question)
+        self._record(question, response)
+        return response
+
+    async def generate_async(self, prompt, question=None):
+        response = await self.inner.generate_async(prompt, question)
+        self._record(question, response)
+        return response
+
+    def generate_stream(self, prompt, question=None):
+        chunks = []
+        try:
+            for chunk in self.inner.generate_stream(prompt, question):
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            # Callers may stop reading once the statement is complete; what was read still replays as valid SQL.
+            if chunks:
+                self._record(question, "".join(chunks))
+
+
+def create_backend(name=LLM_BACKEND):
+    stub = StubBackend(latency_ms=LLM_STUB_LATENCY_MS, jitter_ms=LLM_STUB_JITTER_MS)
+    if name == "stub":
+        backend = stub
+    elif name == "replay":
+        backend = ReplayBackend(LLM_REPLAY_PATH, fallback=stub)
+    else:
+        if name != "gemini":
+            print(f"Unknown LLM_BACKEND '{name}', using gemini")
+        backend = GeminiBackend(LLM_MODEL_NAME, GOOGLE_API_KEY)
+    if LLM_RECORD_PATH:
+        backend = RecordingBackend(backend, LLM_RECORD_PATH)
+    return backend
@@ -0,0 +1,297 @@
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+from . import tracing
+from .sql_template import parameterize, render
+from .config import NL_CACHE_MAX_ENTRIES, NL_CACHE_TTL_SECONDS, NL_CACHE_SQLITE_PATH, NL_CACHE_FUZZY_THRESHOLD
+
+# Politeness and filler only. Words such as "how many", "top" or "average"
+# change the SQL and must stay part of the key.
+FILLER_WORDS = {
+    "a", "an", "the", "please", "can", "could", "would", "you", "me", "us", "i", "we",
+    "show", "give", "tell", "list", "display", "find", "get", "fetch", "return", "want", "need", "to", "know"
+}
+
+# Words and values such as 2024-01-01, 3.5 or north_east, as they appear in questions.
+VALUE_TOKEN = re.compile(r"\w+(?:[.\-/:]\w+)*")
+NUMBER = re.compile(r"\d+(?:\.\d+)?")
+NUMBER_SLOT = r"(\d+(?:\.\d+)?)"
+# One value word that is not a plain number.
+TEXT_WORD = r"(?!\d+(?:\.\d+)?(?![\w.\-/:]))\w+(?:[.\-/:]\w+)*"
+
+
+def normalize_question(question):
+    tokens = re.findall(r"[a-z0-9]+", question.lower())
+    normalized = []
+    for token in tokens:
+        if token in FILLER_WORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss") and not token.isdigit():
+            token = token[:-1]
+        normalized.append(token)
+    return normalized
+
+def _slot(value, words):
+    """Capture group for a new value of the same kind as value: a number, or text of as many words"""
+    if not isinstance(value, str) or NUMBER.fullmatch(value.strip()):
+        return NUMBER_SLOT
+    return "(" + r"\s+".join([TEXT_WORD] * len(words)) + ")"
+
+def question_shape(question, params):
+    """Regex matching question with each literal it shares with the SQL replaced by a capture group.
+
+    Returns (pattern, bindings) where bindings[param_index] is the group that
+    supplies that parameter, or None when no parameter value appears in the
+    question exactly once. Shapes where one value fills several parameters
+    ("top 3 ... category 3") are refused, since a new question could not
+    say which of them it changes.
+    """
+    values = [str(value).strip().lower() for value in params]
+    if len(set(values)) != len(values):
+        return None
+    tokens = VALUE_TOKEN.findall(question)
+    lower = [t.lower() for t in tokens]
+    spans = {}
+    bindings = {}
+    for index, value in enumerate(params):
+        if isinstance(value, str):
+            words = VALUE_TOKEN.findall(value)
+            if not words or " ".join(words) != value.strip():
+                continue
+        else:
+            words = [str(value)]
+        words = [w.lower() for w in words]
+        starts = [i for i in range(len(lower) - len(words) + 1) if lower[i:i + len(words)] == words]
+        if len(starts) != 1:
+            continue
+        span = (starts[0], len(words))
+        if span in spans:
+            return None
+        if any(s < span[0] + span[1] and span[0] < s + n for s, n in spans):
+            continue
+        spans[span] = _slot(value, words)
+        bindings[index] = span
+    if not spans:
+        return None
+
+    parts, groups, i = [], {}, 0
+    while i < len(tokens):
+        span = next((span for span in spans if span[0] == i), None)
+        if span is None:
+            parts.append(re.escape(tokens[i]))
+            i += 1
+            continue
+        if parts and parts[-1].startswith("("):
+            return None  # two values side by side can't be told apart
+        groups[span] = len(groups) + 1
+        parts.append(spans[span])
+        i += span[1]
+    return r"(?i)^\W*" + r"\W+".join(parts) + r"\W*$", {index: groups[span] for index, span in bindings.items()}
+
+def _bound_value(text, original):
+    if isinstance(original, str):
+        return text
+    return int(text) if text.isdigit() else Decimal(text)
+
+def similarity(tokens_a, tokens_b):
+    set_a, set_b = set(tokens_a), set(tokens_b)
+    if not set_a or not set_b:
+        return 0.0
+    # Different literals ("top 5" vs "top 10") are different questions, however similar the wording.
+    if {t for t in set_a if t.isdigit()} != {t for t in set_b if t.isdigit()}:
+        return 0.0
+    return len(set_a & set_b) / len(set_a | set_b)
+
+
+class NLQueryCache:
+    """LRU/TTL cache of generated SQL keyed on normalized question text and schema fingerprint.
+
+    Alongside each entry it keeps the question's shape: the SQL as a template
+    and the question as a pattern with the template's values cut out, so
+    "sales in Ohio for 2024" can reuse the SQL generated for "sales in Texas
+    for 2023" with the new values bound in.
+    """
+
+    def __init__(self, max_entries=1000, ttl_seconds=86400, sqlite_path="", fuzzy_threshold=0.85):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.fuzzy_threshold = fuzzy_threshold
+        self._entries = OrderedDict()
+        self._shapes = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "exact_hits": 0, "template_hits": 0, "fuzzy_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0
+        }
+        self._db = None
+        if sqlite_path:
+            self._open_sqlite(sqlite_path)
+
+    def get(self, question, fingerprint):
+        match = self.lookup(question, fingerprint)
+        return match["sql"] if match else None
+
+    def lookup(self, question, fingerprint):
+        """{"sql", "match"} for a cached answer, None on a miss.
+
+        match is "exact", "template" (also carrying "template" and bound
+        "params") or "fuzzy".
+        """
+        tokens = normalize_question(question)
+        key = (fingerprint, " ".join(tokens))
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and self._expired(entry, now):
+                self._remove(key)
+                self._stats["expired"] += 1
+                entry = None
+            if entry:
+                self._entries.move_to_end(key)
+                self._stats["exact_hits"] += 1
+                return {"sql": entry["sql"], "match": "exact"}
+
+            bound = self._template_match(question, fingerprint, now)
+            if bound:
+                self._stats["template_hits"] += 1
+                return bound
+
+            match = self._fuzzy_match(tokens, fingerprint, now)
+            if match:
+                self._entries.move_to_end(match)
+                self._stats["fuzzy_hits"] += 1
+                return {"sql": self._entries[match]["sql"], "match": "fuzzy"}
+
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, question, fingerprint, sql):
+        tokens = normalize_question(question)
+        key = (fingerprint, " ".join(tokens))
+        entry = {"tokens": tokens, "sql": sql, "created_at": time.time()}
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._stats["stores"] += 1
+            if self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO nl_cache (fingerprint, question_key, sql, created_at) VALUES (?, ?, ?, ?)",
+                    (key[0], key[1], sql, entry["created_at"])
+                )
+                self._db.commit()
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+            self._remember_shape(question, fingerprint, sql, entry["created_at"])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._shapes.clear()
+            if self._db:
+                self._db.execute("DELETE FROM nl_cache")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        stats["shapes"] = len(self._shapes)
+        hits = stats["exact_hits"] + stats["template_hits"] + stats["fuzzy_hits"]
+        stats["hit_rate"] = hits / (hits + stats["misses"]) if hits + stats["misses"] else 0.0
+        return stats
+
+    def _remember_shape(self, question, fingerprint, sql, created_at):
+        # Caller holds the lock. Shapes live in memory only; the SQLite file keeps normalized keys.
+        templated = parameterize(sql)
+        shape = question_shape(question, templated[1]) if templated else None
+        if shape is None:
+            return
+        pattern, bindings = shape
+        key = (fingerprint, pattern)
+        self._shapes[key] = {
+            "regex": re.compile(pattern),
+            "template": templated[0],
+            "params": templated[1],
+            "bindings": bindings,
+            "created_at": created_at
+        }
+        self._shapes.move_to_end(key)
+        while len(self._shapes) > self.max_entries:
+            self._shapes.popitem(last=False)
+
+    def _template_match(self, question, fingerprint, now):
+        for key, shape in reversed(self._shapes.items()):
+            if key[0] != fingerprint or self._expired(shape, now):
+                continue
+            found = shape["regex"].match(question.strip())
+            if not found:
+                continue
+            params = list(shape["params"])
+            for index, group in shape["bindings"].items():
+                params[index] = _bound_value(found.group(group), params[index])
+            self._shapes.move_to_end(key)
+            return {"sql": render(shape["template"], params), "match": "template", "template": shape["template"], "params": params}
+        return None
+
+    def _fuzzy_match(self, tokens, fingerprint, now):
+        if self.fuzzy_threshold >= 1 or not tokens:
+            return None
+        best_key, best_score = None, self.fuzzy_threshold
+        for key, entry in self._entries.items():
+            if key[0] != fingerprint or self._expired(entry, now):
+                continue
+            score = similarity(tokens, entry["tokens"])
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def _expired(self, entry, now):
+        return now - entry["created_at"] > self.ttl_seconds
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        if self._db:
+            self._db.execute("DELETE FROM nl_cache WHERE fingerprint = ? AND question_key = ?", key)
+            self._db.commit()
+
+    def _open_sqlite(self, path):
+        try:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS nl_cache ("
+                "fingerprint TEXT, question_key TEXT, sql TEXT, created_at REAL, "
+                "PRIMARY KEY (fingerprint, question_key))"
+            )
+            self._db.execute("DELETE FROM nl_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            self._db.commit()
+            rows = self._db.execute(
+                "SELECT fingerprint, question_key, sql, created_at FROM nl_cache ORDER BY created_at DESC LIMIT ?",
+                (self.max_entries,)
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Could not open NL cache database {path}: {e}")
+            self._db = None
+            return
+        for fingerprint, question_key, sql, created_at in reversed(rows):
+            self._entries[(fingerprint, question_key)] = {
+                "tokens": question_key.split(),
+                "sql": sql,
+                "created_at": created_at
+            }
+
+
+nl_cache = NLQueryCache(
+    max_entries=NL_CACHE_MAX_ENTRIES,
+    ttl_seconds=NL_CACHE_TTL_SECONDS,
+    sqlite_path=NL_CACHE_SQLITE_PATH,
+    fuzzy_threshold=NL_CACHE_FUZZY_THRESHOLD
+)
+
+def get_nl_cache_stats():
+    return nl_cache.stats()
+
+tracing.register_collector("nl_cache", get_nl_cache_stats)
@@ -1,18 +1,33 @@
-import google.generativeai as genai 
-from google.api_core.exceptions import InternalServerError, GoogleAPICallError 
-from .config import GOOGLE_API_KEY
-from .db_manager import get_full_schema_for_gemini 
+from .config import NL_CACHE_ENABLED, LLM_REQUESTS_PER_MINUTE, LLM_STREAMING
+from .llm_backends import create_backend, LLMBackendError
+from .sql_stream import StreamingSQLParser, InvalidSQLStream
+from .schema_retriever import get_relevant_schema_text
+from .schema_cache import schema_cache
+from .nl_cache import nl_cache
+from .rate_limiter import RateLimiter
+from .tracing import traced, stage, record
 
-genai.configure(api_key=GOOGLE_API_KEY)
+llm_backend = create_backend()
 
-model = genai.GenerativeModel('models/gemini-2.5-pro')
+llm_rate_limiter = RateLimiter(LLM_REQUESTS_PER_MINUTE) if LLM_REQUESTS_PER_MINUTE > 0 else None
 
-def get_sql_from_natural_language(natural_language_query):
-    if not GOOGLE_API_KEY:
-        print("Error: Problem with the API key. Check .env file")
+def lookup_cached_sql(natural_language_query, fingerprint):
+    if not NL_CACHE_ENABLED or not fingerprint:
         return None
-    
-    db_schema = get_full_schema_for_gemini()
+    match = nl_cache.lookup(natural_language_query, fingerprint)
+    record("nl_cache_hits" if match else "nl_cache_misses")
+    if match and match["match"] == "template":
+        # Same question shape with new values: the cached template with these values bound in.
+        record("nl_cache_template_hits")
+    return match["sql"] if match else None
+
+def remember_sql(natural_language_query, fingerprint, sql_query):
+    if NL_CACHE_ENABLED and fingerprint and sql_query:
+        nl_cache.put(natural_language_query, fingerprint, sql_query)
+
+@traced("prompt_build")
+def build_prompt(natural_language_query):
+    db_schema = get_relevant_schema_text(natural_language_query)
 
     if not db_schema:
         print("Error: Could not retrieve database schema. Cannot generate SQL")
@@ -28,21 +43,132 @@ def get_sql_from_natural_language(natural_language_query):
     
     SQL Query:
     """
+    record("prompt_chars", len(prompt))
+    record("prompt_tokens_estimate", len(prompt) // 4)
+    return prompt
+
+@traced("prompt_build")
+def build_follow_up_prompt(natural_language_query, store):
+    prompt = f"""You are an AI assistant that answers follow-up questions about earlier query results. The earlier results are stored as SQLite tables, described below. Your task is to generate one SQLite SELECT query over these tables that answers the follow-up question; "that", "those" or "it" refer to last_result unless the question says otherwise. Do NOT include any explanations, comments, or additional text in your response, just the SQL query.
+
+    Earlier Results:
+    {store.describe()}
+
+    Follow-up Question:
+    "{natural_language_query}"
+
+    SQL Query:
+    """
+    record("prompt_chars", len(prompt))
+    record("prompt_tokens_estimate", len(prompt) // 4)
+    return prompt
+
+def clean_sql_response(text):
+    sql_query = text.strip()
+
+    if sql_query.startswith("```sql") and sql_query.endswith("```"):
+        sql_query = sql_query[len("```sql"):-len("```")].strip()
+    elif sql_query.startswith("```") and sql_query.endswith("```"):
+        sql_query = sql_query[len("```"):-len("```")].strip()
+
+    return sql_query
+
+def stream_sql(prompt, natural_language_query, on_partial=None, known_tables=None):
+    """Read the backend's response as a stream, validating the SQL as chunks arrive.
 
+    on_partial(sql_so_far) is called after every chunk. Returns as soon as the
+    statement is complete instead of waiting for the end of the response, and
+    raises InvalidSQLStream as soon as the output is clearly not usable SQL.
+    known_tables defaults to the cached MySQL schema.
+    """
+    if known_tables is None:
+        known_tables = schema_cache.get_structure()
+    parser = StreamingSQLParser(known_tables=known_tables)
+    stream = llm_backend.generate_stream(prompt, natural_language_query)
     try:
-        response = model.generate_content(prompt)
-        sql_query = response.text.strip()
+        with stage("llm_call"):
+            with stage("llm_first_chunk"):
+                chunk = next(stream, None)
+            while chunk is not None:
+                record("llm_stream_chunks")
+                sql_so_far = parser.feed(chunk)
+                if on_partial and sql_so_far:
+                    on_partial(sql_so_far)
+                if parser.complete:
+                    return sql_so_far
+                chunk = next(stream, None)
+            return parser.finish()
+    except InvalidSQLStream:
+        record("llm_stream_aborts")
+        raise
+    finally:
+        stream.close()
+
+def get_sql_from_natural_language(natural_language_query, on_partial=None):
+    if not llm_backend.ready():
+        return None
+    
+    fingerprint = schema_cache.get_fingerprint()
+    cached_sql = lookup_cached_sql(natural_language_query, fingerprint)
+    if cached_sql:
+        print("Using cached SQL for this question")
+        return cached_sql
 
-        if sql_query.startswith("```sql") and sql_query.endswith("```"):
-            sql_query = sql_query[len("```sql"):-len("```")].strip()
-        elif sql_query.startswith("```") and sql_query.endswith("```"):
-            sql_query = sql_query[len("```"):-len("```")].strip()
+    prompt = build_prompt(natural_language_query)
+    if prompt is None:
+        return None
+
+    if llm_rate_limiter:
+        with stage("llm_rate_limit_wait"):
+            llm_rate_limiter.acquire()
 
+    try:
+        if LLM_STREAMING:
+            sql_query = stream_sql(prompt, natural_language_query, on_partial)
+        else:
+            with stage("llm_call"):
+                response_text = llm_backend.generate(prompt, natural_language_query)
+            sql_query = clean_sql_response(response_text)
+        remember_sql(natural_language_query, fingerprint, sql_query)
         return sql_query
 
-    except (InternalServerError, GoogleAPICallError) as e:  
-        print(f"Gemini API Error: {e}")
+    except InvalidSQLStream as e:
+        print(f"Discarded LLM response: {e}")
+        return None
+    except LLMBackendError as e:
+        print(e)
         return None
     except Exception as e:
         print(f"Unexpected error during NL to SQL conversion: {e}")
-        return None 
+        return None
+
+def get_follow_up_sql(natural_language_query, store, on_partial=None):
+    """SQLite SQL answering a follow-up question from the results in store, or None.
+
+    Not cached: the same words mean different SQL once the stored results change.
+    """
+    if not llm_backend.ready() or not len(store):
+        return None
+
+    prompt = build_follow_up_prompt(natural_language_query, store)
+
+    if llm_rate_limiter:
+        with stage("llm_rate_limit_wait"):
+            llm_rate_limiter.acquire()
+
+    try:
+        if LLM_STREAMING:
+            return stream_sql(prompt, natural_language_query, on_partial, known_tables=store.table_names())
+        with stage("llm_call"):
+            response_text = llm_backend.generate(prompt, natural_language_query)
+        return clean_sql_response(response_text)
+
+    except InvalidSQLStream as e:
+        print(f"Discarded LLM response: {e}")
+        return None
+    except LLMBackendError as e:
+        print(e)
+        return None
+    except Exception as e:
+        print(f"Unexpected error during follow-up SQL generation: {e}")
+        return None
@@ -0,0 +1,223 @@
+"""Per-query time budgets and cooperative cancellation.
+
+Every statement db_manager runs is registered here while it executes. The
+budget (QUERY_TIMEOUT_SECONDS, or the enclosing CancelScope's timeout) is
+enforced twice: SELECTs carry a MAX_EXECUTION_TIME hint so the server stops
+them itself, and a watchdog thread sends KILL QUERY from a side connection
+QUERY_KILL_GRACE_SECONDS later for anything still running (writes, CTEs,
+servers that ignore the hint). Callers cancel a group of queries with
+CancelScope.cancel(), or one query with cancel_query(query_id).
+"""
+import contextvars
+import heapq
+import itertools
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from mysql.connector import Error
+
+from . import tracing
+from .config import QUERY_TIMEOUT_SECONDS, QUERY_KILL_GRACE_SECONDS
+
+# MySQL error code for a statement stopped by max_execution_time.
+ER_QUERY_TIMEOUT = 3024
+
+_scope = contextvars.ContextVar("nl2sql_cancel_scope", default=None)
+_ids = itertools.count(1)
+_lock = threading.Lock()
+_running = {}
+_stats = {"started": 0, "finished": 0, "failed": 0, "timed_out_server": 0, "timed_out_client": 0, "cancelled": 0}
+
+
+class CancelScope:
+    """Queries run inside `with cancel_scope()`; cancel() stops them from any thread"""
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self.cancelled = False
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            running = list(self._running)
+        for query in running:
+            query.kill("cancelled")
+
+    def _add(self, query):
+        with self._lock:
+            if self.cancelled:
+                return False
+            self._running.add(query)
+            return True
+
+    def _discard(self, query):
+        with self._lock:
+            self._running.discard(query)
+
+
+class RunningQuery:
+    def __init__(self, connection, sql, timeout, connect):
+        self.query_id = next(_ids)
+        self.connection_id = getattr(connection, "connection_id", None)
+        self.sql = sql
+        self.timeout = timeout
+        self.started_at = time.monotonic()
+        self.stop_reason = None
+        self.finished = False
+        self._connect = connect
+        # Held while killing so the connection can't be released and reused mid-KILL.
+        self._lock = threading.Lock()
+
+    def kill(self, reason):
+        with self._lock:
+            if self.finished or self.stop_reason or self.connection_id is None:
+                return False
+            self.stop_reason = reason
+            side = self._connect()
+            if side is None:
+                return False
+            cursor = None
+            try:
+                cursor = side.cursor()
+                cursor.execute(f"KILL QUERY {int(self.connection_id)}")
+                return True
+            except Error as e:
+                print(f"Could not stop query {self.query_id}: {e}")
+                return False
+            finally:
+                if cursor:
+                    cursor.close()
+                side.close()
+
+    def raise_error(self, error):
+        """Record why the statement failed and re-raise with a message for the user"""
+        if error.errno == ER_QUERY_TIMEOUT:
+            outcome, message = "timed_out_server", f"Query exceeded its {self.timeout:g}s time limit"
+        elif self.stop_reason == "timeout":
+            outcome, message = "timed_out_client", f"Query killed after exceeding its {self.timeout:g}s time limit"
+        elif self.stop_reason == "cancelled":
+            outcome, message = "cancelled", "Query cancelled"
+        else:
+            outcome, message = "failed", None
+        with _lock:
+            _stats[outcome] += 1
+        if message is None:
+            raise error
+        tracing.record(f"queries_{outcome}")
+        stopped = Error(msg=message)
+        stopped.errno = error.errno
+        raise stopped from error
+
+    def to_dict(self):
+        return {
+            "query_id": self.query_id,
+            "connection_id": self.connection_id,
+            "sql": self.sql,
+            "timeout": self.timeout,
+            "running_seconds": round(time.monotonic() - self.started_at, 3)
+        }
+
+
+class _Watchdog:
+    """One daemon thread that kills queries past their deadline"""
+
+    def __init__(self):
+        self._heap = []
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def schedule(self, deadline, query):
+        with self._condition:
+            heapq.heappush(self._heap, (deadline, query.query_id, query))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="nl2sql-query-watchdog", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._heap:
+                    self._condition.wait()
+                deadline, _, query = self._heap[0]
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                heapq.heappop(self._heap)
+            if not query.finished:
+                query.kill("timeout")
+
+
+_watchdog = _Watchdog()
+
+@contextmanager
+def cancel_scope(timeout=None):
+    """Run the enclosed queries as one cancellable group, optionally with their own time limit"""
+    scope = CancelScope(timeout)
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+def current_timeout():
+    scope = _scope.get()
+    if scope is not None and scope.timeout is not None:
+        return scope.timeout
+    return QUERY_TIMEOUT_SECONDS
+
+@contextmanager
+def track_query(connection, sql, connect):
+    """Register a statement for its lifetime; raises Error if its scope is already cancelled.
+
+    connect() must return a new, unpooled connection; it is only used to send KILL QUERY.
+    """
+    query = RunningQuery(connection, sql, current_timeout(), connect)
+    scope = _scope.get()
+    if scope is not None and not scope._add(query):
+        with _lock:
+            _stats["cancelled"] += 1
+        raise Error("Query cancelled")
+    with _lock:
+        _running[query.query_id] = query
+        _stats["started"] += 1
+    if query.timeout:
+        _watchdog.schedule(query.started_at + query.timeout + QUERY_KILL_GRACE_SECONDS, query)
+    try:
+        yield query
+    finally:
+        with query._lock:
+            query.finished = True
+        with _lock:
+            _running.pop(query.query_id, None)
+            _stats["finished"] += 1
+        if scope is not None:
+            scope._discard(query)
+
+def with_time_limit(sql, timeout):
+    """Add a MAX_EXECUTION_TIME hint to a SELECT so the server enforces timeout itself"""
+    if not timeout or re.match(r"\s*SELECT\s*/\*\+", sql, re.I):
+        return sql
+    return re.sub(r"^\s*SELECT\b", f"SELECT /*+ MAX_EXECUTION_TIME({int(timeout * 1000)}) */", sql, count=1, flags=re.I)
+
+def running_queries():
+    with _lock:
+        return [query.to_dict() for query in _running.values()]
+
+def cancel_query(query_id):
+    with _lock:
+        query = _running.get(query_id)
+    return query.kill("cancelled") if query else False
+
+def get_query_stats():
+    with _lock:
+        stats = dict(_stats)
+        stats["running"] = len(_running)
+    return stats
+
+tracing.register_collector("queries", get_query_stats)
@@ -0,0 +1,209 @@
+"""Pre-execution cost guard for generated SQL.
+
+check_query() runs EXPLAIN FORMAT=JSON and estimates rows examined (summed
+over every table access, multiplied through nested-loop joins) and the
+optimizer's query cost. Queries over QUERY_GUARD_MAX_ROWS_EXAMINED or
+QUERY_GUARD_MAX_COST are rejected, except plain SELECTs that the server can
+stop early, which get LIMIT QUERY_GUARD_AUTO_LIMIT appended instead. Plans
+are cached by normalized SQL for QUERY_GUARD_PLAN_CACHE_TTL_SECONDS.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from mysql.connector import Error
+
+from . import tracing
+from .config import QUERY_GUARD_ENABLED, QUERY_GUARD_MAX_ROWS_EXAMINED, QUERY_GUARD_MAX_COST, QUERY_GUARD_AUTO_LIMIT
+from .config import QUERY_GUARD_PLAN_CACHE_SIZE, QUERY_GUARD_PLAN_CACHE_TTL_SECONDS
+from .db_manager import explain_query
+from .result_cache import COMMENT_OR_LITERAL, SQL_TOKEN, normalize_sql, strip_sql_comments
+from .tracing import traced, record
+
+EXPLAINABLE = {"SELECT", "WITH", "INSERT", "REPLACE", "UPDATE", "DELETE"}
+# Anything that makes MySQL read every input row before returning the first one.
+BLOCKING_TOKENS = {
+    "LIMIT", "GROUP", "ORDER", "DISTINCT", "UNION", "HAVING", "WINDOW", "OVER", "INTO", "FOR",
+    "COUNT", "SUM", "AVG", "MIN", "MAX", "GROUP_CONCAT", "STD", "STDDEV", "VARIANCE"
+}
+
+
+def summarize_plan(plan):
+    """{"cost", "rows_examined", "full_scans"} from an EXPLAIN FORMAT=JSON document"""
+    query_block = plan.get("query_block", {})
+    cost = float(query_block.get("cost_info", {}).get("query_cost", 0) or 0)
+    full_scans = []
+    rows_examined = _rows_examined(query_block, full_scans)
+    return {"cost": cost, "rows_examined": int(rows_examined), "full_scans": full_scans}
+
+def _rows_examined(node, full_scans):
+    if isinstance(node, list):
+        return sum(_rows_examined(item, full_scans) for item in node)
+    if not isinstance(node, dict):
+        return 0
+
+    total = 0
+    for key, value in node.items():
+        if key == "nested_loop":
+            # Each table is scanned once per row produced by the join so far.
+            prefix_rows = 1
+            for item in value:
+                table = item.get("table", {})
+                total += prefix_rows * _table_rows(table, full_scans)
+                total += _rows_examined(table, full_scans)
+                prefix_rows = table.get("rows_produced_per_join", prefix_rows) or prefix_rows
+        elif key == "table" and isinstance(value, dict):
+            total += _table_rows(value, full_scans)
+            total += _rows_examined(value, full_scans)
+        elif isinstance(value, (dict, list)):
+            total += _rows_examined(value, full_scans)
+    return total
+
+def _table_rows(table, full_scans):
+    rows = table.get("rows_examined_per_scan", 0) or 0
+    if table.get("access_type") == "ALL":
+        full_scans.append(table.get("table_name"))
+    return rows
+
+def strip_statement_end(sql):
+    """sql without the comments, whitespace and ';' after its last token, so a clause can be appended"""
+    end, pos = 0, 0
+    for m in [*COMMENT_OR_LITERAL.finditer(sql), None]:
+        code = sql[pos:m.start() if m else len(sql)].rstrip(" \t\r\n;")
+        if code:
+            end = pos + len(code)
+        if m is None:
+            return sql[:end]
+        # Comments with code after them (optimizer hints) are kept; only literals end the statement.
+        if m.group(0)[0] in "'\"`":
+            end = m.end()
+        pos = m.end()
+
+def can_auto_limit(sql):
+    """True for a single-block SELECT the server can stop early once LIMIT rows are produced"""
+    tokens = [t.upper() for t in SQL_TOKEN.findall(strip_sql_comments(sql)) if not t.startswith(("'", '"'))]
+    while tokens and tokens[-1] == ";":
+        tokens.pop()
+    if not tokens or tokens[0] != "SELECT" or tokens.count("SELECT") > 1:
+        return False
+    return not (set(tokens) & BLOCKING_TOKENS)
+
+
+class PlanCache:
+    """LRU/TTL cache of plan summaries keyed on normalized SQL"""
+
+    def __init__(self, max_entries=1000, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry["stored_at"] > self.ttl_seconds:
+                self._entries.pop(key, None)
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry["summary"]
+
+    def put(self, key, summary):
+        with self._lock:
+            self._entries[key] = {"summary": summary, "stored_at": time.monotonic()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+plan_cache = PlanCache(max_entries=QUERY_GUARD_PLAN_CACHE_SIZE, ttl_seconds=QUERY_GUARD_PLAN_CACHE_TTL_SECONDS)
+_stats = {"checked": 0, "allowed": 0, "rewritten": 0, "rejected": 0}
+_stats_lock = threading.Lock()
+
+def get_plan(sql):
+    """Plan summary for sql, from the cache when possible; raises Error if EXPLAIN fails"""
+    key = normalize_sql(sql)
+    summary = plan_cache.get(key)
+    if summary is not None:
+        record("plan_cache_hits")
+        return summary
+    record("plan_cache_misses")
+    summary = summarize_plan(explain_query(sql))
+    plan_cache.put(key, summary)
+    return summary
+
+@traced("cost_guard")
+def check_query(sql, max_rows_examined=QUERY_GUARD_MAX_ROWS_EXAMINED, max_cost=QUERY_GUARD_MAX_COST, auto_limit=QUERY_GUARD_AUTO_LIMIT):
+    """Decide whether sql may run.
+
+    Returns {"allowed", "sql", "rewritten", "reason", "plan"}; "sql" is what
+    should actually be executed. Threshold values of 0 disable that check.
+    """
+    decision = {"allowed": True, "sql": sql, "rewritten": False, "reason": "", "plan": None}
+    # "(SELECT ...) UNION (...)" and a leading comment are still SELECTs.
+    statement = strip_sql_comments(sql).lstrip("( \t\r\n")
+    verb = statement.split(None, 1)[0].upper() if statement else ""
+    if not QUERY_GUARD_ENABLED or verb not in EXPLAINABLE:
+        return decision
+
+    try:
+        plan = get_plan(sql)
+    except Error as e:
+        if getattr(e, "errno", None) is None:
+            # No database to ask; let execution report the connection problem.
+            return decision
+        return _decide(decision, False, f"EXPLAIN failed: {e}")
+    except ValueError as e:
+        return _decide(decision, True, f"unreadable plan ({e}), not checked")
+    decision["plan"] = plan
+
+    over = []
+    if max_rows_examined and plan["rows_examined"] > max_rows_examined:
+        over.append(f"~{plan['rows_examined']:,} rows examined (limit {max_rows_examined:,.0f})")
+    if max_cost and plan["cost"] > max_cost:
+        over.append(f"cost {plan['cost']:,.0f} (limit {max_cost:,.0f})")
+    if not over:
+        return _decide(decision, True, "")
+
+    reason = ", ".join(over)
+    if plan["full_scans"]:
+        reason += f"; full scan of {', '.join(str(t) for t in plan['full_scans'])}"
+    if auto_limit and can_auto_limit(sql):
+        # A trailing "-- note" or "# note" would comment out the LIMIT.
+        decision["sql"] = f"{strip_statement_end(sql)} LIMIT {auto_limit}"
+        decision["rewritten"] = True
+        return _decide(decision, True, f"{reason}; added LIMIT {auto_limit}")
+    return _decide(decision, False, reason)
+
+def _decide(decision, allowed, reason):
+    decision["allowed"] = allowed
+    decision["reason"] = reason
+    outcome = "rewritten" if decision["rewritten"] else "allowed" if allowed else "rejected"
+    with _stats_lock:
+        _stats["checked"] += 1
+        _stats[outcome] += 1
+    record(f"cost_guard_{outcome}")
+    return decision
+
+def get_query_guard_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats.update({f"plan_cache_{key}": value for key, value in plan_cache.stats().items()})
+    return stats
+
+tracing.register_collector("query_guard", get_query_guard_stats)
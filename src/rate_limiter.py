@@ -0,0 +1,25 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """Token bucket shared across threads; acquire() blocks until a request may go out"""
+
+    def __init__(self, requests_per_minute, burst=1):
+        self.interval = 60.0 / requests_per_minute
+        self.capacity = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) / self.interval)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) * self.interval
+            time.sleep(wait)
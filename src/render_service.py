@@ -0,0 +1,180 @@
+"""Chart rendering on a process pool.
+
+submit(df, config) returns a Future of the artifact paths that
+generate_chart_from_instruction would return. Figure building, HTML
+serialization and PNG export run in CHART_RENDER_WORKERS worker processes.
+Rows are reduced in the caller first, so only what will be plotted is
+pickled; CHART_RENDER_WORKERS=0 renders on the calling thread instead. At
+most CHART_RENDER_QUEUE_SIZE jobs may be queued or running; beyond that
+submit() waits up to its timeout and then raises RenderQueueFull. Results are cached by (data hash, config, formats), and
+identical jobs submitted while one is in flight share its future.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import pandas as pd
+
+from . import tracing
+from .chart_generator import generate_chart_from_instruction, prepare_chart_data
+from .config import CHART_FORMATS, CHART_RENDER_WORKERS, CHART_RENDER_QUEUE_SIZE, CHART_RENDER_CACHE_SIZE, CHART_RENDER_SUBMIT_TIMEOUT_SECONDS
+
+
+class RenderQueueFull(RuntimeError):
+    pass
+
+
+def frame_digest(df):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr([(str(col), str(dtype)) for col, dtype in df.dtypes.items()]).encode("utf-8"))
+    try:
+        hashed = pd.util.hash_pandas_object(df, index=False)
+    except TypeError:
+        # Unhashable cell values (lists, dicts from JSON columns); hash their text instead.
+        hashed = pd.util.hash_pandas_object(df.astype(str), index=False)
+    digest.update(hashed.to_numpy().tobytes())
+    return digest.hexdigest()
+
+def job_key(df, config, formats):
+    return (frame_digest(df), json.dumps(config, sort_keys=True, default=str), tuple(sorted(formats)))
+
+def _render_job(df, config, formats):
+    # Runs in a worker process, which is already off the request path, so PNG is rendered inline.
+    return generate_chart_from_instruction(df, config, formats=formats, png_async=False) or None
+
+
+class RenderService:
+    def __init__(self, workers=2, max_pending=32, cache_size=256):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.cache_size = cache_size
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._cache = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "cache_hits": 0, "coalesced": 0, "rejected": 0, "rendered": 0, "failed": 0}
+
+    def submit(self, df, config, formats=CHART_FORMATS, timeout=CHART_RENDER_SUBMIT_TIMEOUT_SECONDS):
+        """Future of the artifact dict ({format: path}), or of None if the chart could not be built"""
+        key = job_key(df, config, formats)
+        with self._lock:
+            self._stats["submitted"] += 1
+            cached = self._cached(key)
+            if cached is not None:
+                self._stats["cache_hits"] += 1
+                tracing.record("render_cache_hits")
+                return _done(dict(cached))
+            if key in self._in_flight:
+                self._stats["coalesced"] += 1
+                return self._in_flight[key]
+
+        if not self._slots.acquire(timeout=timeout):
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise RenderQueueFull(f"More than {self.max_pending} charts queued; try again later")
+
+        try:
+            df_ready = prepare_chart_data(df, config)
+            if df_ready is None:
+                self._slots.release()
+                return _done(None)
+            with self._lock:
+                # Another thread may have queued the same chart while we prepared the data.
+                if key in self._in_flight:
+                    self._slots.release()
+                    self._stats["coalesced"] += 1
+                    return self._in_flight[key]
+                if self.workers > 0:
+                    future = self._get_pool().submit(_render_job, df_ready, config, formats)
+                else:
+                    future = Future()
+                self._in_flight[key] = future
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda done: self._finish(key, done))
+
+        if self.workers <= 0:
+            # CHART_RENDER_WORKERS=0: render on the calling thread, still cached and coalesced.
+            try:
+                future.set_result(generate_chart_from_instruction(df_ready, config, formats=formats) or None)
+            except Exception as e:
+                future.set_exception(e)
+        return future
+
+    def render(self, df, config, formats=CHART_FORMATS):
+        """Blocking form of submit()"""
+        return self.submit(df, config, formats).result()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cached"] = len(self._cache)
+            stats["in_flight"] = len(self._in_flight)
+        stats["workers"] = self.workers
+        return stats
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def _cached(self, key):
+        artifacts = self._cache.get(key)
+        if artifacts is None:
+            return None
+        # Files may have been cleaned up since; render again rather than hand out dead paths.
+        if not all(os.path.exists(path) for path in artifacts.values()):
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return artifacts
+
+    def _finish(self, key, future):
+        self._slots.release()
+        failed = future.cancelled() or future.exception() is not None or future.result() is None
+        with self._lock:
+            self._in_flight.pop(key, None)
+            self._stats["failed" if failed else "rendered"] += 1
+            if not failed:
+                # Paths only; a background PNG future is not something to hand out twice.
+                self._cache[key] = {name: path for name, path in future.result().items() if isinstance(path, str)}
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+
+def _done(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_render_service():
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = RenderService(
+                    workers=CHART_RENDER_WORKERS,
+                    max_pending=CHART_RENDER_QUEUE_SIZE,
+                    cache_size=CHART_RENDER_CACHE_SIZE
+                )
+    return _service
+
+def get_render_stats():
+    return get_render_service().stats() if _service is not None else {}
+
+tracing.register_collector("render_service", get_render_stats)
@@ -0,0 +1,209 @@
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+COMMENT_OR_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`|/\*.*?\*/|(?:--\s|#)[^\n]*", re.S)
+SQL_TOKEN = re.compile(r"`[^`]*`|'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|\w+|[^\s\w]")
+CLAUSE_KEYWORDS = {
+    "WHERE", "GROUP", "ORDER", "HAVING", "LIMIT", "JOIN", "INNER", "LEFT", "RIGHT", "CROSS", "NATURAL",
+    "STRAIGHT_JOIN", "ON", "USING", "UNION", "WINDOW", "FOR", "LOCK", "INTO", "SET", "VALUES", "AS"
+}
+# Functions whose arguments use FROM as a keyword: EXTRACT(YEAR FROM d), TRIM(LEADING '0' FROM s), ...
+FROM_FUNCTIONS = {"EXTRACT", "TRIM", "SUBSTRING", "SUBSTR", "POSITION"}
+
+SQL_KEYWORDS = CLAUSE_KEYWORDS | {
+    "SELECT", "FROM", "BY", "AND", "OR", "NOT", "IN", "IS", "NULL", "LIKE", "BETWEEN", "DISTINCT",
+    "ASC", "DESC", "CASE", "WHEN", "THEN", "ELSE", "END", "WITH", "OUTER", "EXISTS", "ALL", "OFFSET",
+    "COUNT", "SUM", "AVG", "MIN", "MAX", "INTERVAL"
+}
+
+
+def strip_sql_comments(sql):
+    # Literals are matched first so a '#' or '--' inside a string survives.
+    return COMMENT_OR_LITERAL.sub(lambda m: m.group(0) if m.group(0)[0] in "'\"`" else " ", sql)
+
+def normalize_sql(sql):
+    """Collapse whitespace and comments and uppercase keywords; literals and identifiers keep their case"""
+    tokens = SQL_TOKEN.findall(strip_sql_comments(sql))
+    while tokens and tokens[-1] == ";":
+        tokens.pop()
+    return " ".join(t.upper() if t.upper() in SQL_KEYWORDS else t for t in tokens)
+
+def _identifier(token):
+    if token.startswith("`"):
+        return token[1:-1]
+    if re.match(r"^\w+$", token) and token.upper() not in CLAUSE_KEYWORDS:
+        return token
+    return None
+
+def _read_table(tokens, i):
+    # Returns (table_name, next_index) for `name` or `schema`.`name` at tokens[i].
+    if i >= len(tokens):
+        return None, i
+    name = _identifier(tokens[i])
+    if name is None:
+        return None, i
+    i += 1
+    if i + 1 < len(tokens) and tokens[i] == ".":
+        qualified = _identifier(tokens[i + 1])
+        if qualified:
+            name = qualified
+            i += 2
+    return name, i
+
+def extract_read_tables(sql):
+    """Best-effort set of tables a SELECT reads from; CTE names are excluded"""
+    tokens = [t for t in SQL_TOKEN.findall(strip_sql_comments(sql)) if not t.startswith(("'", '"'))]
+    upper = [t.upper() for t in tokens]
+    tables = set()
+    ctes = set()
+    # One entry per open parenthesis: whether it is the argument list of a FROM_FUNCTIONS call.
+    parens = []
+    for i, token in enumerate(upper):
+        if token == "(":
+            parens.append(i > 0 and upper[i - 1] in FROM_FUNCTIONS)
+        elif token == ")" and parens:
+            parens.pop()
+        if token == "AS" and i + 1 < len(tokens) and tokens[i + 1] == "(" and i > 0:
+            cte = _identifier(tokens[i - 1])
+            if cte:
+                ctes.add(cte)
+        if token not in ("FROM", "JOIN") or (parens and parens[-1]):
+            continue
+        j = i + 1
+        while True:
+            name, j = _read_table(tokens, j)
+            if name is None:
+                break
+            tables.add(name)
+            # Skip an optional alias, then continue through comma-separated FROM lists.
+            if j < len(tokens) and upper[j] == "AS":
+                j += 1
+            if j < len(tokens) and _identifier(tokens[j]):
+                j += 1
+            if token == "FROM" and j < len(tokens) and tokens[j] == ",":
+                j += 1
+                continue
+            break
+    return tables - ctes
+
+def extract_write_tables(sql):
+    """Tables a write statement modifies, or None when any table may be affected (DDL, unparsable)"""
+    tokens = [t for t in SQL_TOKEN.findall(strip_sql_comments(sql)) if not t.startswith(("'", '"'))]
+    upper = [t.upper() for t in tokens]
+    if not upper:
+        return set()
+    verb = upper[0]
+    start = None
+    if verb in ("INSERT", "REPLACE") and "INTO" in upper:
+        start = upper.index("INTO") + 1
+    elif verb == "UPDATE":
+        start = 1
+        while start < len(upper) and upper[start] in ("LOW_PRIORITY", "IGNORE"):
+            start += 1
+    elif verb == "DELETE" and "FROM" in upper:
+        start = upper.index("FROM") + 1
+    elif verb == "TRUNCATE":
+        start = 2 if len(upper) > 1 and upper[1] == "TABLE" else 1
+    if start is None:
+        return None
+    name, _ = _read_table(tokens, start)
+    if name is None:
+        return None
+    tables = {name}
+    if verb in ("UPDATE", "DELETE"):
+        # Multi-table forms write to whatever they join; be conservative.
+        tables |= extract_read_tables(sql)
+    return tables
+
+def estimate_size(value):
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, list):
+        size = sys.getsizeof(value)
+        for row in value:
+            size += sys.getsizeof(row)
+            if isinstance(row, dict):
+                size += sum(sys.getsizeof(v) for v in row.values())
+        return size
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """Byte-bounded LRU of query results, validated against per-table update fingerprints"""
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, ttl_seconds=300):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0, "evictions": 0, "uncacheable": 0}
+
+    def get(self, key, fingerprints):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            stale = time.monotonic() - entry["stored_at"] > self.ttl_seconds
+            if stale or entry["fingerprints"] != fingerprints:
+                self._remove(key)
+                self._stats["invalidations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry["value"]
+
+    def put(self, key, fingerprints, value):
+        size = estimate_size(value)
+        with self._lock:
+            if size > self.max_bytes:
+                self._stats["uncacheable"] += 1
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                "fingerprints": fingerprints,
+                "tables": set(fingerprints),
+                "value": value,
+                "size": size,
+                "stored_at": time.monotonic()
+            }
+            self._bytes += size
+            self._stats["stores"] += 1
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def invalidate_tables(self, tables):
+        """Drop entries reading any of tables; None drops everything"""
+        with self._lock:
+            if tables is None:
+                keys = list(self._entries)
+            else:
+                keys = [key for key, entry in self._entries.items() if entry["tables"] & tables]
+            for key in keys:
+                self._remove(key)
+            self._stats["invalidations"] += len(keys)
+
+    def clear(self):
+        self.invalidate_tables(None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+            stats["max_bytes"] = self.max_bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._bytes -= entry["size"]
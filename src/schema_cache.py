@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+import time
+
+from . import tracing
+from .config import SCHEMA_CACHE_TTL_SECONDS, SCHEMA_CACHE_PATH
+from .db_manager import DB_HOST, DB_NAME, get_schema_fingerprint, get_schema_structure, format_schema_for_gemini
+
+
+class SchemaCache:
+    """Schema structure and prompt text, re-introspected only when the fingerprint changes.
+
+    Within the TTL the cached entry is served without touching the database.
+    Once it expires a single fingerprint query decides whether a full
+    introspection is needed.
+    """
+
+    def __init__(self, ttl_seconds=300, snapshot_path=""):
+        self.ttl_seconds = ttl_seconds
+        self.snapshot_path = snapshot_path
+        self._entry = None
+        self._verified_at = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "fingerprint_checks": 0, "refreshes": 0, "snapshot_loads": 0}
+
+    def get_structure(self):
+        entry = self._get_entry()
+        return entry["structure"] if entry else {}
+
+    def get_text(self):
+        entry = self._get_entry()
+        return entry["text"] if entry else ""
+
+    def get_fingerprint(self):
+        entry = self._get_entry()
+        return entry["fingerprint"] if entry else None
+
+    def warm(self):
+        return bool(self._get_entry())
+
+    def prime(self, structure, fingerprint):
+        """Install a known schema without touching the database (benchmarks, offline runs)"""
+        with self._lock:
+            self._entry = {
+                "fingerprint": fingerprint,
+                "structure": structure,
+                "text": format_schema_for_gemini(structure)
+            }
+            self._verified_at = time.monotonic()
+            self.ttl_seconds = float("inf")
+
+    def invalidate(self, remove_snapshot=False):
+        with self._lock:
+            self._entry = None
+            self._verified_at = 0
+        if remove_snapshot and self.snapshot_path and os.path.exists(self.snapshot_path):
+            os.remove(self.snapshot_path)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cached"] = self._entry is not None
+            stats["fingerprint"] = self._entry["fingerprint"] if self._entry else None
+        return stats
+
+    def _get_entry(self):
+        with self._lock:
+            if self._entry and time.monotonic() - self._verified_at < self.ttl_seconds:
+                self._stats["hits"] += 1
+                tracing.record("schema_cache_hits")
+                return self._entry
+
+            if self._entry is None and self.snapshot_path:
+                self._entry = self._load_snapshot()
+
+            self._stats["fingerprint_checks"] += 1
+            fingerprint = get_schema_fingerprint()
+            if fingerprint is None:
+                # Database unreachable: keep serving whatever we had rather than nothing.
+                return self._entry
+
+            if self._entry is None or self._entry["fingerprint"] != fingerprint:
+                structure = get_schema_structure()
+                if not structure:
+                    return self._entry
+                self._entry = {
+                    "fingerprint": fingerprint,
+                    "structure": structure,
+                    "text": format_schema_for_gemini(structure)
+                }
+                self._stats["refreshes"] += 1
+                self._save_snapshot()
+
+            self._verified_at = time.monotonic()
+            return self._entry
+
+    def _load_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return None
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable schema snapshot {self.snapshot_path}: {e}")
+            return None
+        if snapshot.get("host") != DB_HOST or snapshot.get("database") != DB_NAME:
+            return None
+        self._stats["snapshot_loads"] += 1
+        return snapshot["entry"]
+
+    def _save_snapshot(self):
+        if not self.snapshot_path:
+            return
+        snapshot = {"host": DB_HOST, "database": DB_NAME, "entry": self._entry}
+        tmp_path = f"{self.snapshot_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, default=str)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            print(f"Could not write schema snapshot {self.snapshot_path}: {e}")
+
+
+schema_cache = SchemaCache(ttl_seconds=SCHEMA_CACHE_TTL_SECONDS, snapshot_path=SCHEMA_CACHE_PATH)
+
+def get_cached_schema_text():
+    return schema_cache.get_text()
+
+def get_cached_schema_structure():
+    return schema_cache.get_structure()
+
+def invalidate_schema_cache(remove_snapshot=False):
+    schema_cache.invalidate(remove_snapshot=remove_snapshot)
+
+def warm_schema_cache():
+    return schema_cache.warm()
+
+def get_schema_cache_stats():
+    return schema_cache.stats()
+
+tracing.register_collector("schema_cache", get_schema_cache_stats)
@@ -0,0 +1,136 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+from .config import SCHEMA_TOP_K, SCHEMA_DESCRIPTIONS_PATH
+from .db_manager import format_schema_for_gemini
+from .schema_cache import schema_cache
+
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "each", "for", "from", "get", "give", "how",
+    "i", "in", "is", "it", "list", "many", "me", "much", "of", "on", "or", "per", "show", "than",
+    "that", "the", "their", "there", "this", "to", "what", "when", "where", "which", "who", "with"
+}
+
+TABLE_NAME_WEIGHT = 3
+
+
+def tokenize(text):
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", str(text))
+    tokens = []
+    for token in re.findall(r"[a-z0-9]+", text.lower()):
+        if token in STOP_WORDS:
+            continue
+        tokens.append(stem(token))
+    return tokens
+
+def stem(token):
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def load_descriptions(path):
+    """Optional {"table": "...", "table.column": "..."} JSON used to enrich the index"""
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable schema descriptions {path}: {e}")
+        return {}
+
+
+class SchemaIndex:
+    """BM25 index with one document per table (table name, columns, comments)"""
+
+    def __init__(self, structure, descriptions=None, k1=1.2, b=0.75):
+        descriptions = descriptions or {}
+        self.structure = structure
+        self.k1 = k1
+        self.b = b
+        self.documents = {}
+        for table, info in structure.items():
+            tokens = tokenize(table) * TABLE_NAME_WEIGHT
+            tokens += tokenize(info.get("comment", ""))
+            tokens += tokenize(descriptions.get(table, ""))
+            for column in info["columns"]:
+                tokens += tokenize(column["name"])
+                tokens += tokenize(column.get("comment", ""))
+                tokens += tokenize(descriptions.get(f"{table}.{column['name']}", ""))
+            self.documents[table] = Counter(tokens)
+
+        self.lengths = {table: sum(counts.values()) for table, counts in self.documents.items()}
+        self.avg_length = (sum(self.lengths.values()) / len(self.lengths)) if self.lengths else 0
+        document_frequency = Counter()
+        for counts in self.documents.values():
+            document_frequency.update(counts.keys())
+        total = len(self.documents)
+        self.idf = {
+            token: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for token, df in document_frequency.items()
+        }
+
+    def score(self, question):
+        query = set(tokenize(question))
+        scores = {}
+        for table, counts in self.documents.items():
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[table] / self.avg_length) if self.avg_length else self.k1
+            for token in query:
+                tf = counts.get(token)
+                if tf:
+                    score += self.idf[token] * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                scores[table] = score
+        return scores
+
+    def select_tables(self, question, top_k):
+        scores = self.score(question)
+        if not scores:
+            return None
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        selected = ranked[:top_k]
+        chosen = set(selected)
+        # Only follow outgoing keys: incoming ones mention the selected table in
+        # their FK column names and would drag in half the schema on hub tables.
+        for table in selected:
+            for fk in self.structure[table]["foreign_keys"]:
+                if fk["ref_table"] in self.structure:
+                    chosen.add(fk["ref_table"])
+        return chosen
+
+
+_index = None
+_index_fingerprint = None
+_index_lock = threading.Lock()
+
+def get_schema_index():
+    global _index, _index_fingerprint
+    structure = schema_cache.get_structure()
+    fingerprint = schema_cache.get_fingerprint()
+    with _index_lock:
+        if _index is None or fingerprint != _index_fingerprint:
+            _index = SchemaIndex(structure, load_descriptions(SCHEMA_DESCRIPTIONS_PATH))
+            _index_fingerprint = fingerprint
+        return _index
+
+def get_relevant_schema_text(natural_language_query, top_k=SCHEMA_TOP_K):
+    """Schema text for the prompt, pruned to the top_k relevant tables plus FK neighbours"""
+    if top_k <= 0:
+        return schema_cache.get_text()
+
+    index = get_schema_index()
+    if len(index.structure) <= top_k:
+        return schema_cache.get_text()
+
+    tables = index.select_tables(natural_language_query, top_k)
+    if not tables:
+        return schema_cache.get_text()
+    return format_schema_for_gemini(index.structure, tables=tables, include_foreign_keys=True)
@@ -0,0 +1,154 @@
+"""Recent result sets, queryable locally for follow-up questions.
+
+Every SELECT result shown in a session is kept as a table (result_1,
+result_2, ...) in an in-process SQLite database, with the newest also
+reachable as last_result. Refinements such as "now just the top 3" or
+"group that by month" are turned into SQLite SQL over those tables and
+answered here, without another round trip to MySQL. The oldest results are
+dropped once there are more than SESSION_MAX_RESULTS of them or they
+take more than SESSION_MAX_BYTES.
+"""
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from . import tracing
+from .config import SESSION_MAX_RESULTS, SESSION_MAX_BYTES
+from .result_cache import estimate_size, strip_sql_comments
+
+LATEST_VIEW = "last_result"
+FOLLOW_UP = re.compile(
+    r"(?i)^\s*(now|then|also|and|but|just|only|instead)\b"
+    r"|\b(that|those|these|them|it|previous|above|last result|same)\b"
+)
+
+
+class SessionStore:
+    def __init__(self, max_results=5, max_bytes=256 * 1024 * 1024):
+        self.max_results = max_results
+        self.max_bytes = max_bytes
+        self._db = sqlite3.connect(":memory:", check_same_thread=False)
+        self._tables = OrderedDict()
+        self._next_id = 1
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"stored": 0, "evicted": 0, "queries": 0, "failed": 0, "uncacheable": 0}
+
+    def add(self, df, question=None, sql=None):
+        """Keep df as a new table and return its name, or None if it is too large to keep"""
+        size = estimate_size(df)
+        with self._lock:
+            if size > self.max_bytes:
+                self._stats["uncacheable"] += 1
+                return None
+            name = f"result_{self._next_id}"
+            self._next_id += 1
+            with tracing.stage("session_store"):
+                _sqlite_frame(df).to_sql(name, self._db, index=False)
+                self._db.execute(f"DROP VIEW IF EXISTS {LATEST_VIEW}")
+                self._db.execute(f"CREATE VIEW {LATEST_VIEW} AS SELECT * FROM {name}")
+                self._db.commit()
+            self._tables[name] = {"question": question, "sql": sql, "columns": list(df.columns), "rows": len(df), "size": size}
+            self._bytes += size
+            self._stats["stored"] += 1
+            while len(self._tables) > 1 and (len(self._tables) > self.max_results or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._tables)))
+            return name
+
+    def query(self, sql):
+        """Run a read-only statement against the stored results; raises sqlite3.Error on failure"""
+        if not re.match(r"\s*(SELECT|WITH)\b", strip_sql_comments(sql), re.I):
+            raise sqlite3.DatabaseError("Only SELECT statements can run against previous results")
+        with self._lock:
+            self._stats["queries"] += 1
+            self._db.execute("PRAGMA query_only = ON")
+            try:
+                with tracing.stage("session_query"):
+                    df = pd.read_sql_query(sql, self._db)
+            except Exception:
+                self._stats["failed"] += 1
+                raise
+            finally:
+                self._db.execute("PRAGMA query_only = OFF")
+        tracing.record("rows_returned", len(df))
+        return df
+
+    def table_names(self):
+        with self._lock:
+            names = list(self._tables)
+        return names + [LATEST_VIEW] if names else []
+
+    def describe(self):
+        """Schema text for the stored results, newest first, in the same format as the MySQL schema"""
+        with self._lock:
+            tables = list(self._tables.items())
+        schema = ""
+        for name, info in reversed(tables):
+            columns = self._db.execute(f"PRAGMA table_info({name})").fetchall()
+            schema += f"Table: {name}\n"
+            if info["question"]:
+                schema += f"  (answer to: \"{info['question']}\", {info['rows']} rows)\n"
+            for column in columns:
+                schema += f"  - {column[1]}: {column[2] or 'TEXT'}\n"
+            schema += "\n"
+        if tables:
+            schema += f"{LATEST_VIEW} is a view of {tables[-1][0]}, the most recent result."
+        return schema.strip()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._tables)
+
+    def clear(self):
+        with self._lock:
+            for name in list(self._tables):
+                self._drop(name)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["tables"] = len(self._tables)
+            stats["bytes"] = self._bytes
+            stats["max_bytes"] = self.max_bytes
+        return stats
+
+    def _drop(self, name):
+        info = self._tables.pop(name)
+        self._bytes -= info["size"]
+        self._stats["evicted"] += 1
+        self._db.execute(f"DROP TABLE IF EXISTS {name}")
+        if not self._tables:
+            self._db.execute(f"DROP VIEW IF EXISTS {LATEST_VIEW}")
+        self._db.commit()
+
+
+def _sqlite_frame(df):
+    """df with MySQL-specific cell types (DECIMAL, DATE, TIME) turned into ones SQLite stores"""
+    converted = None
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        kind = pd.api.types.infer_dtype(df[col], skipna=True)
+        if kind == "decimal":
+            values = pd.to_numeric(df[col], errors="coerce")
+        elif kind in ("date", "datetime"):
+            values = pd.to_datetime(df[col], errors="coerce")
+        elif kind not in ("string", "empty", "bytes", "integer", "floating", "boolean"):
+            values = df[col].map(lambda value: value if value is None else str(value))
+        else:
+            continue
+        if converted is None:
+            converted = df.copy(deep=False)
+        converted[col] = values
+    return df if converted is None else converted
+
+def is_follow_up(question):
+    """Whether a question reads as a refinement of the previous result"""
+    return bool(FOLLOW_UP.search(question))
+
+session_store = SessionStore(max_results=SESSION_MAX_RESULTS, max_bytes=SESSION_MAX_BYTES)
+
+tracing.register_collector("session_store", session_store.stats)
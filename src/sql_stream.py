@@ -0,0 +1,131 @@
+"""Incremental parsing of a streamed LLM response into a single SQL statement.
+
+Chunks are fed as they arrive. The parser skips an opening ``` fence,
+stops at the first top-level ";" or closing fence (so the caller can act
+on the statement without waiting for the rest of the response) and raises
+InvalidSQLStream as soon as the text clearly is not usable SQL: prose
+instead of a statement, or a FROM/JOIN on a table the schema does not have.
+"""
+import re
+
+from .result_cache import extract_read_tables, strip_sql_comments
+
+SQL_VERBS = {
+    "SELECT", "WITH", "INSERT", "REPLACE", "UPDATE", "DELETE", "CREATE", "ALTER", "DROP",
+    "TRUNCATE", "SHOW", "DESCRIBE", "DESC", "EXPLAIN"
+}
+# Always-valid FROM targets that are not schema tables.
+BUILTIN_TABLES = {"dual"}
+
+
+class InvalidSQLStream(ValueError):
+    pass
+
+
+def scan_statement(body):
+    """Return (end, open) for streamed SQL text.
+
+    end is the index just past the first top-level ";" (or the start of a
+    closing fence), or None if the statement has not finished yet. open is
+    True while the text ends inside a literal, quoted identifier or comment.
+    """
+    i, n = 0, len(body)
+    while i < n:
+        c = body[i]
+        if body.startswith("```", i):
+            return i, False
+        if c in "'\"`":
+            j = i + 1
+            while j < n and body[j] != c:
+                j += 2 if body[j] == "\\" and c != "`" else 1
+            if j >= n:
+                return None, True
+            i = j + 1
+        elif body.startswith("/*", i):
+            j = body.find("*/", i + 2)
+            if j == -1:
+                return None, True
+            i = j + 2
+        elif c == "#" or (body.startswith("--", i) and (i + 2 >= n or body[i + 2].isspace())):
+            j = body.find("\n", i)
+            if j == -1:
+                return None, True
+            i = j + 1
+        elif c == ";":
+            return i + 1, False
+        else:
+            i += 1
+    return None, False
+
+
+class StreamingSQLParser:
+    def __init__(self, known_tables=None):
+        self.known_tables = {t.lower() for t in known_tables or ()}
+        self.raw = ""
+        self.sql = ""
+        self.complete = False
+        self._body_start = None
+
+    def feed(self, chunk):
+        """Add a chunk and return the SQL parsed so far; raises InvalidSQLStream"""
+        self.raw += chunk
+        if self._body_start is None:
+            self._body_start = self._find_body_start()
+            if self._body_start is None:
+                return ""
+
+        body = self.raw[self._body_start:]
+        end, is_open = scan_statement(body)
+        if end is not None:
+            body = body[:end]
+            self.complete = True
+        self.sql = body.strip()
+        self._validate(final=self.complete, is_open=is_open)
+        return self.sql
+
+    def finish(self):
+        """Validate once the stream is exhausted and return the final SQL"""
+        if self._body_start is None:
+            # Never saw a newline after an opening fence, e.g. "```SELECT 1```".
+            self.sql = self.raw.strip().strip("`").strip()
+            if self.sql[:3].lower() == "sql":
+                self.sql = self.sql[3:].strip()
+        self.complete = True
+        self._validate(final=True, is_open=False)
+        if not self.sql:
+            raise InvalidSQLStream("Empty response")
+        return self.sql
+
+    def _find_body_start(self):
+        text = self.raw.lstrip()
+        offset = len(self.raw) - len(text)
+        if not text or "```".startswith(text):
+            return None
+        if text.startswith("```"):
+            newline = text.find("\n")
+            return None if newline == -1 else offset + newline + 1
+        return offset
+
+    def _validate(self, final, is_open):
+        statement = strip_sql_comments(self.sql).lstrip("( \n\t")
+        if statement.startswith("/*"):
+            return
+        word = re.match(r"[A-Za-z_]*", statement).group(0)
+        # The first word is judged once it is complete (or the stream has ended).
+        if statement and (final or len(word) < len(statement)) and word.upper() not in SQL_VERBS:
+            raise InvalidSQLStream(f"Response is not a SQL statement: {self.sql[:60]!r}")
+
+        if not self.known_tables or is_open:
+            return
+        # Only look at whole tokens; the last one may still be growing.
+        text = self.sql
+        if not final:
+            boundary = max(text.rfind(c) for c in " \n\t,;()")
+            text = text[:boundary + 1]
+        unknown = {
+            name for name in extract_read_tables(text)
+            if name.lower() not in self.known_tables and name.lower() not in BUILTIN_TABLES
+            and not re.search(rf"\b{re.escape(name)}\s*\(", text)
+        }
+        if unknown:
+            raise InvalidSQLStream(f"Response references unknown table(s): {', '.join(sorted(unknown))}")
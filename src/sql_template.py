@@ -0,0 +1,189 @@
+"""Literal extraction and server-side prepared statements for generated SELECTs.
+
+parameterize() turns the literals an LLM varies between runs (values in
+WHERE, HAVING and ON conditions, LIMIT/OFFSET counts) into "?" placeholders,
+so "... WHERE region = 'East'" and "... WHERE region = 'West'" share one
+template. StatementCache keeps a prepared cursor per template on each pooled
+connection; once a template has been seen QUERY_PREPARE_AFTER times, its
+executions skip MySQL's parse step and send only the bound values.
+Literals the server needs to see as text (type lengths in CAST, JSON paths,
+charset introducers, DATE '...' literals) are left in place.
+"""
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from decimal import Decimal
+
+from . import tracing
+
+TOKEN = re.compile(
+    r"(?P<comment>/\*.*?\*/|(?:--\s|#)[^\n]*)"
+    r"|(?P<string>'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\")"
+    r"|(?P<ident>`[^`]*`)"
+    r"|(?P<number>(?<![\w.])\d+(?:\.\d+)?(?:[eE][+-]?\d+)?(?![\w.]))"
+    r"|(?P<word>\w+)"
+    r"|(?P<space>\s+)"
+    r"|(?P<other>.)",
+    re.S
+)
+# Clause keywords that decide whether the literals after them are values.
+VALUE_CLAUSES = {"WHERE", "HAVING", "ON", "LIMIT", "OFFSET"}
+OTHER_CLAUSES = {"SELECT", "FROM", "JOIN", "GROUP", "ORDER", "BY", "WINDOW", "PARTITION", "UNION", "INTO", "SET", "VALUES", "USING"}
+# Literals the grammar requires as written: DATE '2024-01-01', _utf8mb4'x', LIKE ... ESCAPE '!'.
+LITERAL_PREFIXES = {"DATE", "TIME", "TIMESTAMP", "ESCAPE", "COLLATE"}
+# Calls whose arguments must be constants: CAST(x AS DECIMAL(10, 2)), AGAINST('...' IN BOOLEAN MODE).
+LITERAL_CALLS = {
+    "DECIMAL", "NUMERIC", "CHAR", "VARCHAR", "BINARY", "VARBINARY", "FLOAT", "DOUBLE", "DATETIME", "TIME",
+    "TIMESTAMP", "AGAINST", "MATCH"
+}
+ESCAPES = {"0": "\0", "b": "\b", "n": "\n", "r": "\r", "t": "\t", "Z": "\x1a"}
+
+
+def _unquote(literal):
+    quote, body = literal[0], literal[1:-1]
+    body = body.replace(quote * 2, quote)
+    # \% and \_ keep their backslash so LIKE patterns mean the same thing.
+    return re.sub(r"\\(.)", lambda m: ESCAPES.get(m.group(1), m.group(0) if m.group(1) in "%_" else m.group(1)), body)
+
+def _number(text):
+    if re.fullmatch(r"\d+", text):
+        return int(text)
+    return Decimal(text) if "e" not in text.lower() else float(text)
+
+def parameterize(sql):
+    """(template, params) for a SELECT, or None if it has placeholders already or no literals to extract"""
+    matches = list(TOKEN.finditer(sql))
+    if any(m.group("other") == "?" for m in matches):
+        return None
+
+    template, params = [], []
+    clauses = ["SELECT"]
+    calls = [None]
+    previous = []
+    for m in matches:
+        kind, text = m.lastgroup, m.group(0)
+        if kind in ("space", "comment"):
+            template.append(text)
+            continue
+
+        upper = text.upper()
+        if kind == "word" and upper in VALUE_CLAUSES | OTHER_CLAUSES:
+            clauses[-1] = upper if upper != "BY" else clauses[-1]
+        elif text == "(":
+            clauses.append(clauses[-1])
+            calls.append(previous[-1].upper() if previous and previous[-1][:1].isalpha() else None)
+        elif text == ")" and len(clauses) > 1:
+            clauses.pop()
+            calls.pop()
+
+        if kind in ("string", "number") and _is_value(clauses[-1], calls[-1], previous):
+            params.append(_unquote(text) if kind == "string" else _number(text))
+            template.append("?")
+        else:
+            template.append(text)
+        previous = (previous + [text])[-2:]
+
+    if not params:
+        return None
+    return "".join(template), params
+
+def _is_value(clause, call, previous):
+    if clause not in VALUE_CLAUSES or call in LITERAL_CALLS:
+        return False
+    if previous and (previous[-1].upper() in LITERAL_PREFIXES or previous[-1].startswith("_")):
+        return False
+    # col->'$.path' and col->>'$.path' need the path as a literal.
+    return previous[-1:] != [">"] or previous[-2:-1] not in (["-"], [">"])
+
+def quote_literal(value):
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float, Decimal)):
+        return str(value)
+    escaped = str(value).replace("\\", "\\\\").replace("'", "''")
+    # _unquote kept the backslash in \% and \_; don't double it.
+    escaped = re.sub(r"\\\\([%_])", r"\\\1", escaped)
+    return f"'{escaped}'"
+
+def render(template, params):
+    """Plain SQL with params written back in as literals"""
+    values = iter(params)
+    return "".join(
+        quote_literal(next(values)) if m.group("other") == "?" else m.group(0)
+        for m in TOKEN.finditer(template)
+    )
+
+
+class StatementCache:
+    """Prepared cursors per pooled connection, LRU-bounded, for templates seen often enough"""
+
+    def __init__(self, max_per_connection=64, prepare_after=2, max_templates=10000):
+        self.max_per_connection = max_per_connection
+        self.prepare_after = prepare_after
+        self.max_templates = max_templates
+        self._statements = weakref.WeakKeyDictionary()
+        self._seen = OrderedDict()
+        self._unpreparable = set()
+        self._lock = threading.Lock()
+        self._stats = {"prepared": 0, "reused": 0, "evicted": 0, "unpreparable": 0}
+
+    def should_prepare(self, template):
+        with self._lock:
+            if template in self._unpreparable:
+                return False
+            seen = self._seen.pop(template, 0) + 1
+            self._seen[template] = seen
+            while len(self._seen) > self.max_templates:
+                self._seen.popitem(last=False)
+        return seen >= self.prepare_after
+
+    def cursor(self, connection, sql):
+        """(cursor, sql) to execute; pass this sql object back so the connector reuses the statement"""
+        with self._lock:
+            statements = self._statements.setdefault(connection, OrderedDict())
+            entry = statements.get(sql)
+            if entry is not None:
+                statements.move_to_end(sql)
+                self._stats["reused"] += 1
+                tracing.record("prepared_statement_reuses")
+                return entry
+        # Only the thread holding the connection touches its statements from here on.
+        entry = (connection.cursor(prepared=True), sql)
+        evicted = []
+        with self._lock:
+            statements[sql] = entry
+            self._stats["prepared"] += 1
+            while len(statements) > self.max_per_connection:
+                evicted.append(statements.popitem(last=False)[1][0])
+                self._stats["evicted"] += 1
+        for cursor in evicted:
+            _close(cursor)
+        return entry
+
+    def discard(self, connection, sql, template=None):
+        """Drop a statement after a failure; with template, stop preparing it at all"""
+        with self._lock:
+            entry = self._statements.get(connection, {}).pop(sql, None)
+            if template is not None:
+                self._unpreparable.add(template)
+                self._stats["unpreparable"] += 1
+        if entry is not None:
+            _close(entry[0])
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["templates"] = len(self._seen)
+            stats["connections"] = len(self._statements)
+            stats["open"] = sum(len(s) for s in self._statements.values())
+        return stats
+
+
+def _close(cursor):
+    try:
+        cursor.close()
+    except Exception:
+        pass
@@ -0,0 +1,202 @@
+"""Per-request stage timings and counters, exportable as JSON lines or Prometheus text.
+
+start_trace() opens a request; stage() and record() attach to whichever
+trace is current in the calling context (contextvars, so asyncio tasks and
+run_blocking threads keep their own). With TRACING_ENABLED off, stage()
+hands back a shared no-op context manager and record() returns at once.
+"""
+import contextvars
+import functools
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .config import TRACING_ENABLED, TRACE_LOG_PATH, METRICS_HOST
+
+_current = contextvars.ContextVar("nl2sql_trace", default=None)
+_noop = nullcontext()
+_lock = threading.Lock()
+_stage_totals = {}
+_counter_totals = {}
+_collectors = {}
+_trace_count = 0
+enabled = TRACING_ENABLED
+
+
+class Trace:
+    def __init__(self, name):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started_at = time.time()
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage_name, seconds):
+        with self._lock:
+            self.stages[stage_name] = self.stages.get(stage_name, 0.0) + seconds
+
+    def add(self, key, value):
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def to_dict(self, total_seconds):
+        with self._lock:
+            return {
+                "trace_id": self.trace_id,
+                "name": self.name,
+                "started_at": self.started_at,
+                "total_seconds": round(total_seconds, 6),
+                "stages": {name: round(seconds, 6) for name, seconds in self.stages.items()},
+                "counters": dict(self.counters)
+            }
+
+
+@contextmanager
+def start_trace(name):
+    """Open a request trace; yields the Trace (or None when tracing is off)"""
+    global _trace_count
+    if not enabled:
+        yield None
+        return
+    trace = Trace(name)
+    token = _current.set(trace)
+    started = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+        with _lock:
+            _trace_count += 1
+        _emit(trace.to_dict(time.perf_counter() - started))
+
+def stage(name):
+    if not enabled:
+        return _noop
+    return _timed_stage(name)
+
+@contextmanager
+def _timed_stage(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        trace = _current.get()
+        if trace is not None:
+            trace.add_stage(name, elapsed)
+        with _lock:
+            totals = _stage_totals.setdefault(name, [0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += elapsed
+            totals[2] = max(totals[2], elapsed)
+
+def traced(name):
+    """Decorator form of stage() for whole functions"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            with _timed_stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record(key, value=1):
+    if not enabled:
+        return
+    trace = _current.get()
+    if trace is not None:
+        trace.add(key, value)
+    with _lock:
+        _counter_totals[key] = _counter_totals.get(key, 0) + value
+
+def current_trace():
+    return _current.get()
+
+def format_trace(trace):
+    """One-line summary of a trace's stages and counters for CLI output"""
+    if trace is None:
+        return ""
+    with trace._lock:
+        stages = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in trace.stages.items())
+        counters = ", ".join(f"{key}={value}" for key, value in trace.counters.items())
+    return " | ".join(part for part in (stages, counters) if part)
+
+def register_collector(name, func):
+    """func() -> {stat: number}; exported as gauges on every scrape"""
+    _collectors[name] = func
+
+def _emit(trace_dict):
+    if not TRACE_LOG_PATH:
+        return
+    line = json.dumps(trace_dict, default=str)
+    with _lock:
+        with open(TRACE_LOG_PATH, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def get_metrics():
+    with _lock:
+        stages = {name: {"count": t[0], "sum_seconds": t[1], "max_seconds": t[2]} for name, t in _stage_totals.items()}
+        counters = dict(_counter_totals)
+        traces = _trace_count
+    components = {}
+    for name, func in list(_collectors.items()):
+        try:
+            components[name] = func()
+        except Exception as e:
+            print(f"Metrics collector {name} failed: {e}")
+    return {"traces": traces, "stages": stages, "counters": counters, "components": components}
+
+def render_prometheus():
+    metrics = get_metrics()
+    lines = [
+        "# TYPE nl2sql_traces_total counter",
+        f"nl2sql_traces_total {metrics['traces']}",
+        "# TYPE nl2sql_stage_seconds summary"
+    ]
+    for name, totals in sorted(metrics["stages"].items()):
+        lines.append(f'nl2sql_stage_seconds_count{{stage="{name}"}} {totals["count"]}')
+        lines.append(f'nl2sql_stage_seconds_sum{{stage="{name}"}} {totals["sum_seconds"]:.6f}')
+    lines.append("# TYPE nl2sql_stage_seconds_max gauge")
+    for name, totals in sorted(metrics["stages"].items()):
+        lines.append(f'nl2sql_stage_seconds_max{{stage="{name}"}} {totals["max_seconds"]:.6f}')
+    lines.append("# TYPE nl2sql_events_total counter")
+    for name, value in sorted(metrics["counters"].items()):
+        lines.append(f'nl2sql_events_total{{event="{name}"}} {value}')
+    lines.append("# TYPE nl2sql_component gauge")
+    for component, stats in sorted(metrics["components"].items()):
+        for stat, value in sorted(stats.items()):
+            if isinstance(value, bool):
+                value = int(value)
+            if isinstance(value, (int, float)):
+                lines.append(f'nl2sql_component{{component="{component}",stat="{stat}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port, host=METRICS_HOST):
+    """Serve /metrics in Prometheus text format from a daemon thread"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="nl2sql-metrics", daemon=True).start()
+    print(f"Metrics available at http://{host}:{port}/metrics")
+    return server
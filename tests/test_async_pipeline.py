@@ -0,0 +1,33 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src import async_pipeline, db_manager
+from src.query_control import CancelScope
+
+
+def test_timeout_cancels_even_when_every_worker_is_busy(monkeypatch):
+    killed = threading.Event()
+
+    def stuck_query(query, fetch_results=True):
+        # Stands in for a statement that only returns once KILL QUERY reaches it.
+        killed.wait(5)
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(async_pipeline, "_executor", executor)
+    monkeypatch.setattr(db_manager, "execute_query", stuck_query)
+    monkeypatch.setattr(CancelScope, "cancel", lambda scope: killed.set())
+    try:
+        assert asyncio.run(async_pipeline.execute_query("SELECT SLEEP(60)", timeout=0.05)) is False
+        assert killed.wait(1)
+    finally:
+        killed.set()
+        executor.shutdown(wait=True)
+
+
+def test_spent_budget_does_not_run_the_query(monkeypatch):
+    def unreachable(*args, **kwargs):
+        raise AssertionError("query ran with no time left")
+
+    monkeypatch.setattr(db_manager, "execute_query", unreachable)
+    assert asyncio.run(async_pipeline.execute_query("SELECT 1", timeout=0)) is False
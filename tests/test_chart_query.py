@@ -0,0 +1,36 @@
+import sqlite3
+
+import pandas as pd
+
+from src.chart_query import build_chart_query
+from src.config import CHART_MAX_POINTS
+
+BAR = {"chart_type": "bar", "x_axis": "label", "y_axis": "amount"}
+
+
+def run_bar_query(frame):
+    # SQLite has the window functions the rewrite needs, so it stands in for MySQL 8.
+    connection = sqlite3.connect(":memory:")
+    frame.to_sql("results", connection, index=False)
+    return pd.read_sql_query(build_chart_query("SELECT label, amount FROM results;", BAR, {"amount"}), connection)
+
+
+def test_bar_totals_keep_the_result_order():
+    months = ["Jan", "Feb", "Mar", "Apr"]
+    bars = run_bar_query(pd.DataFrame({"label": months * 2, "amount": [5, 50, 1, 20, 5, 0, 1, 0]}))
+    assert bars["label"].tolist() == months
+    assert bars["amount"].tolist() == [10, 50, 2, 20]
+
+
+def test_only_past_the_point_limit_are_the_largest_totals_kept():
+    rows = CHART_MAX_POINTS + 5
+    bars = run_bar_query(pd.DataFrame({"label": [f"k{i}" for i in range(rows)], "amount": range(rows)}))
+    assert len(bars) == CHART_MAX_POINTS
+    assert bars["label"].iloc[0] == "k5"
+    assert bars["amount"].is_monotonic_increasing
+
+
+def test_trailing_comment_does_not_swallow_the_wrapper():
+    sql = build_chart_query("SELECT label, amount FROM results -- by label", BAR, {"amount"})
+    assert "-- by label" not in sql
+    assert "(SELECT label, amount FROM results) AS chart_src" in sql
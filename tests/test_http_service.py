@@ -0,0 +1,20 @@
+import pandas as pd
+
+from src import http_service
+from src.http_service import NL2SQLService
+
+
+def test_execute_fetches_one_row_past_max_rows(monkeypatch):
+    executed = []
+
+    def fetch_dataframe(sql):
+        executed.append(sql)
+        return pd.DataFrame({"id": range(4)})
+
+    monkeypatch.setattr(http_service, "check_query", lambda sql: {"allowed": True, "sql": sql, "reason": ""})
+    monkeypatch.setattr(http_service, "fetch_dataframe", fetch_dataframe)
+    answer = NL2SQLService(coalesce=False).handle("execute", {"sql": "SELECT id FROM sales -- all of them", "max_rows": 3})
+
+    assert executed == ["SELECT * FROM (SELECT id FROM sales) AS limited LIMIT 4"]
+    assert answer["rows"] == [[0], [1], [2]]
+    assert answer["row_count"] == 3 and answer["truncated"]
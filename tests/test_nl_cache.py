@@ -0,0 +1,30 @@
+from src.nl_cache import NLQueryCache, question_shape
+
+
+def cache_with(question, sql):
+    cache = NLQueryCache(fuzzy_threshold=1)
+    cache.put(question, "fp", sql)
+    return cache
+
+
+def test_new_values_are_bound_into_the_template():
+    cache = cache_with("sales in Ohio for 2024", "SELECT * FROM sales WHERE state = 'Ohio' AND year = 2024")
+    match = cache.lookup("sales in Texas for 2023", "fp")
+    assert match["match"] == "template"
+    assert match["sql"] == "SELECT * FROM sales WHERE state = 'Texas' AND year = 2023"
+
+
+def test_one_value_filling_several_params_is_not_templated():
+    # The 3 in the question is the LIMIT; category 3 was the LLM's choice and must not change with it.
+    question = "top 3 toy products"
+    sql = "SELECT name FROM products WHERE category_id = 3 ORDER BY sales DESC LIMIT 3"
+    assert question_shape(question, [3, 3]) is None
+    assert cache_with(question, sql).lookup("top 5 toy products", "fp") is None
+
+
+def test_text_slots_keep_the_original_word_count_and_kind():
+    cache = cache_with("orders from New York", "SELECT * FROM orders WHERE city = 'New York'")
+    assert cache.lookup("orders from San Diego", "fp")["sql"] == "SELECT * FROM orders WHERE city = 'San Diego'"
+    # Neither a longer phrase nor a number can stand in for a two-word city.
+    assert cache.lookup("orders from the city of Los Angeles", "fp") is None
+    assert cache.lookup("orders from 42 17", "fp") is None
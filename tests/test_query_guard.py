@@ -0,0 +1,45 @@
+import pytest
+
+from src import query_guard
+from src.query_guard import check_query
+
+HUGE_PLAN = {"cost": 1e9, "rows_examined": 10 ** 9, "full_scans": ["sales"]}
+
+
+@pytest.fixture
+def explained(monkeypatch):
+    seen = []
+
+    def get_plan(sql):
+        seen.append(sql)
+        return HUGE_PLAN
+
+    monkeypatch.setattr(query_guard, "get_plan", get_plan)
+    return seen
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT id FROM sales -- every sale",
+    "SELECT id FROM sales; # every sale",
+    "SELECT id FROM sales /* every sale */ ;\n",
+])
+def test_auto_limit_is_not_commented_out(explained, sql):
+    decision = check_query(sql, max_rows_examined=1000, auto_limit=50)
+    assert decision["allowed"] and decision["rewritten"]
+    assert decision["sql"] == "SELECT id FROM sales LIMIT 50"
+
+
+def test_auto_limit_keeps_literals_and_hints(explained):
+    sql = "SELECT /*+ MAX_EXECUTION_TIME(5) */ id FROM sales WHERE note = '-- #'"
+    assert check_query(sql, max_rows_examined=1000, auto_limit=50)["sql"] == f"{sql} LIMIT 50"
+
+
+@pytest.mark.parametrize("sql", [
+    "(SELECT id FROM sales) UNION (SELECT id FROM archive)",
+    "/* report */ SELECT id FROM sales ORDER BY id",
+    "-- report\nSELECT id FROM sales ORDER BY id",
+])
+def test_parenthesized_and_commented_statements_are_checked(explained, sql):
+    decision = check_query(sql, max_rows_examined=1000, auto_limit=50)
+    assert explained == [sql]
+    assert not decision["allowed"]
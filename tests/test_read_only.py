@@ -0,0 +1,70 @@
+import pytest
+
+from src import db_manager, http_service
+from src.db_router import is_read_only, is_single_statement
+from src.http_service import NL2SQLService, ServiceError
+
+STACKED = [
+    "SELECT id FROM sales; DROP TABLE sales",
+    "SELECT id FROM sales;DROP TABLE sales;",
+    "SELECT id FROM sales -- trailing\n; DROP TABLE sales",
+    "SELECT 'a;b' FROM sales; TRUNCATE sales",
+    "SELECT id FROM sales /*!50000 ; DROP TABLE sales */",
+]
+
+
+@pytest.mark.parametrize("sql", STACKED)
+def test_stacked_statements_are_not_read_only(sql):
+    assert not is_single_statement(sql)
+    assert not is_read_only(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT id FROM sales",
+    "SELECT id FROM sales;",
+    "SELECT id, ';' AS sep FROM sales -- done;",
+    "SELECT /*+ MAX_EXECUTION_TIME(1000) */ id FROM sales",
+])
+def test_single_selects_are_read_only(sql):
+    assert is_read_only(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    "DROP TABLE sales",
+    "CREATE TABLE copy AS SELECT * FROM sales",
+    "GRANT SELECT ON sales TO reporter",
+    "WITH ids AS (SELECT id FROM sales) SELECT * FROM ids FOR SHARE",
+])
+def test_writes_ddl_and_locking_reads_need_the_primary(sql):
+    assert not is_read_only(sql)
+
+
+def test_service_rejects_stacked_statements_before_the_database(monkeypatch):
+    def unreachable(*args, **kwargs):
+        raise AssertionError("stacked statement reached the database")
+
+    monkeypatch.setattr(http_service, "check_query", unreachable)
+    monkeypatch.setattr(http_service, "fetch_dataframe", unreachable)
+    service = NL2SQLService(coalesce=False)
+    for sql in STACKED:
+        with pytest.raises(ServiceError) as error:
+            service.handle("execute", {"sql": sql})
+        assert error.value.status == 400
+
+
+def test_connections_are_opened_without_multi_statements(monkeypatch):
+    from mysql.connector.constants import ClientFlag
+
+    opened = {}
+
+    class Closed:
+        def is_connected(self):
+            return False
+
+    def connect(**kwargs):
+        opened.update(kwargs)
+        return Closed()
+
+    monkeypatch.setattr(db_manager.mysql.connector, "connect", connect)
+    db_manager.get_connection()
+    assert -ClientFlag.MULTI_STATEMENTS in opened["client_flags"]
@@ -0,0 +1,34 @@
+import pytest
+
+from src.result_cache import extract_read_tables
+from src.sql_stream import StreamingSQLParser, InvalidSQLStream
+
+
+def stream(sql, known_tables, chunk_size=7):
+    parser = StreamingSQLParser(known_tables=known_tables)
+    for i in range(0, len(sql), chunk_size):
+        parser.feed(sql[i:i + chunk_size])
+    return parser.finish()
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT EXTRACT(YEAR FROM order_date) AS year, SUM(amount) FROM orders GROUP BY year;",
+    "SELECT TRIM(LEADING '0' FROM code) FROM orders;",
+    "SELECT SUBSTRING(code FROM 2 FOR 3), POSITION('x' IN code) FROM orders;",
+    "SELECT SUBSTR(code FROM 2) FROM orders WHERE EXTRACT(MONTH FROM order_date) = 3;",
+])
+def test_from_inside_function_arguments_is_not_a_table(sql):
+    assert stream(sql, ["orders"]) == sql
+    assert extract_read_tables(sql) == {"orders"}
+
+
+def test_subqueries_inside_functions_are_still_checked():
+    sql = "SELECT COALESCE((SELECT MAX(amount) FROM refunds), 0) FROM orders;"
+    assert extract_read_tables(sql) == {"orders", "refunds"}
+    with pytest.raises(InvalidSQLStream, match="refunds"):
+        stream(sql, ["orders"])
+
+
+def test_unknown_table_is_rejected():
+    with pytest.raises(InvalidSQLStream, match="order_lines"):
+        stream("SELECT EXTRACT(YEAR FROM order_date) FROM order_lines;", ["orders"])